@@ -1,19 +1,23 @@
 import streamlit as st
-import openai
-import requests
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
-from urllib.parse import urljoin, urlparse
-import re
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
-import io
+import functools
+import os
+import secrets
 import time
-import json
-from typing import List, Dict, Optional
+from urllib.parse import urlparse
+from cache import DiskCache, LLM_CACHE_PATH
+from http_client import create_session
+from recording import cassette_from_env, cassette_http_client, install_cassette
+from jobs import ACTIVE_STATUSES, JobRegistry, add_warning, append_output, report_progress
+from sitemap import SitemapStore
+from tracing import METRICS, progress_plan, start_metrics_server, trace
+from content_brief import (
+    GENERATION_ERROR_MESSAGE,
+    SEODataEnhancer,
+    ContentBriefGenerator,
+    create_docx,
+    basic_keyword_analysis,
+    process_competitor_content
+)
 
 # Configurazione della pagina
 st.set_page_config(
@@ -75,756 +79,303 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class SEODataEnhancer:
-    def __init__(self, semrush_api_key: str = None, serper_api_key: str = None):
-        self.semrush_api_key = semrush_api_key
-        self.serper_api_key = serper_api_key
-        
-    def get_semrush_keyword_data(self, keyword: str, country: str = "IT") -> Dict:
-        """Ottiene dati dalle API di SEMrush per una keyword"""
-        if not self.semrush_api_key:
-            return {'status': 'error', 'message': 'SEMrush API key non configurata'}
-        
-        try:
-            url = "https://api.semrush.com/"
-            params = {
-                'type': 'phrase_organic',
-                'key': self.semrush_api_key,
-                'phrase': keyword,
-                'database': country.lower(),
-                'export_columns': 'Ph,Nq,Cp,Co,Nr,Td'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            lines = response.text.strip().split('\n')
-            if len(lines) > 1:
-                data = lines[1].split(';')
-                return {
-                    'status': 'success',
-                    'keyword': data[0] if len(data) > 0 else keyword,
-                    'search_volume': int(data[1]) if len(data) > 1 and data[1].isdigit() else 0,
-                    'cpc': float(data[2]) if len(data) > 2 and data[2].replace('.', '').isdigit() else 0,
-                    'competition': float(data[3]) if len(data) > 3 and data[3].replace('.', '').isdigit() else 0,
-                    'results_count': int(data[4]) if len(data) > 4 and data[4].isdigit() else 0,
-                    'trend': data[5] if len(data) > 5 else ''
-                }
-            else:
-                return {'status': 'no_data', 'keyword': keyword}
-                
-        except Exception as e:
-            return {'status': 'error', 'keyword': keyword, 'error': str(e)}
-    
-    def get_semrush_related_keywords(self, keyword: str, country: str = "IT", limit: int = 50) -> List[Dict]:
-        """Ottiene keyword correlate da SEMrush"""
-        if not self.semrush_api_key:
-            return []
-        
-        try:
-            url = "https://api.semrush.com/"
-            params = {
-                'type': 'phrase_related',
-                'key': self.semrush_api_key,
-                'phrase': keyword,
-                'database': country.lower(),
-                'export_columns': 'Ph,Nq,Cp,Co',
-                'display_limit': limit
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            lines = response.text.strip().split('\n')
-            related_keywords = []
-            
-            for line in lines[1:]:
-                data = line.split(';')
-                if len(data) >= 4:
-                    related_keywords.append({
-                        'keyword': data[0],
-                        'search_volume': int(data[1]) if data[1].isdigit() else 0,
-                        'cpc': float(data[2]) if data[2].replace('.', '').isdigit() else 0,
-                        'competition': float(data[3]) if data[3].replace('.', '').isdigit() else 0
-                    })
-            
-            return related_keywords
-            
-        except Exception as e:
-            st.warning(f"Errore nell'ottenimento keyword correlate SEMrush: {str(e)}")
-            return []
-    
-    def analyze_keyword_intent_patterns(self, related_keywords: List[Dict]) -> Dict:
-        """Analizza i pattern di intento nelle keyword correlate"""
-        intent_categories = {
-            'informational': [],
-            'navigational': [],
-            'transactional': [],
-            'commercial': []
-        }
-        
-        informational_patterns = ['come', 'cosa', 'quando', 'dove', 'perché', 'guida', 'tutorial', 'cos è', 'significa']
-        transactional_patterns = ['acquista', 'compra', 'prezzo', 'costo', 'offerta', 'sconto', 'migliore', 'recensioni']
-        commercial_patterns = ['confronto', 'vs', 'alternative', 'migliori', 'top', 'classifica', 'recensione']
-        navigational_patterns = ['sito', 'ufficiale', 'login', 'accesso', 'brand']
-        
-        for kw_data in related_keywords:
-            keyword = kw_data['keyword'].lower()
-            
-            if any(pattern in keyword for pattern in informational_patterns):
-                intent_categories['informational'].append(kw_data)
-            elif any(pattern in keyword for pattern in transactional_patterns):
-                intent_categories['transactional'].append(kw_data)
-            elif any(pattern in keyword for pattern in commercial_patterns):
-                intent_categories['commercial'].append(kw_data)
-            elif any(pattern in keyword for pattern in navigational_patterns):
-                intent_categories['navigational'].append(kw_data)
-            else:
-                if kw_data['cpc'] > 1.0 and kw_data['competition'] > 0.5:
-                    intent_categories['transactional'].append(kw_data)
-                elif kw_data['competition'] > 0.3:
-                    intent_categories['commercial'].append(kw_data)
-                else:
-                    intent_categories['informational'].append(kw_data)
-        
-        return intent_categories
-    
-    def extract_topic_clusters(self, related_keywords: List[Dict]) -> Dict:
-        """Estrae cluster tematici dalle keyword correlate"""
-        clusters = {}
-        
-        for kw_data in related_keywords:
-            keyword = kw_data['keyword'].lower()
-            words = keyword.split()
-            
-            for word in words:
-                if len(word) > 3 and word not in ['come', 'cosa', 'quando', 'dove', 'perché', 'migliore', 'migliori']:
-                    if word not in clusters:
-                        clusters[word] = []
-                    clusters[word].append(kw_data)
-        
-        filtered_clusters = {k: v for k, v in clusters.items() if len(v) >= 2}
-        
-        for cluster_name, keywords in filtered_clusters.items():
-            total_volume = sum(kw['search_volume'] for kw in keywords)
-            filtered_clusters[cluster_name] = {
-                'keywords': keywords,
-                'total_volume': total_volume,
-                'avg_competition': sum(kw['competition'] for kw in keywords) / len(keywords)
-            }
-        
-        return filtered_clusters
-    
-    def get_serper_search_data(self, query: str, country: str = "it") -> Dict:
-        """Ottiene dati SERP da Serper API con analisi avanzata"""
-        if not self.serper_api_key:
-            return {'status': 'error', 'message': 'Serper API key non configurata'}
-        
-        try:
-            url = "https://google.serper.dev/search"
-            payload = {
-                'q': query,
-                'gl': country,
-                'hl': 'it',
-                'num': 10
-            }
-            headers = {
-                'X-API-KEY': self.serper_api_key,
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(url, json=payload, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            people_also_ask = []
-            paa_intents = {'informational': [], 'commercial': [], 'transactional': []}
-            
-            if 'peopleAlsoAsk' in data:
-                for paa in data['peopleAlsoAsk']:
-                    question = paa.get('question', '')
-                    people_also_ask.append(question)
-                    
-                    q_lower = question.lower()
-                    if any(word in q_lower for word in ['come', 'cosa', 'quando', 'dove', 'perché']):
-                        paa_intents['informational'].append(question)
-                    elif any(word in q_lower for word in ['migliore', 'confronto', 'differenza', 'vs']):
-                        paa_intents['commercial'].append(question)
-                    elif any(word in q_lower for word in ['prezzo', 'costo', 'acquista', 'dove comprare']):
-                        paa_intents['transactional'].append(question)
-                    else:
-                        paa_intents['informational'].append(question)
-            
-            related_searches = []
-            if 'relatedSearches' in data:
-                for rs in data['relatedSearches']:
-                    related_searches.append(rs.get('query', ''))
-            
-            featured_snippet = None
-            snippet_analysis = {}
-            if 'answerBox' in data:
-                snippet_text = data['answerBox'].get('snippet', '')
-                featured_snippet = {
-                    'snippet': snippet_text,
-                    'title': data['answerBox'].get('title', ''),
-                    'link': data['answerBox'].get('link', '')
-                }
-                
-                snippet_analysis = {
-                    'word_count': len(snippet_text.split()),
-                    'has_list': '•' in snippet_text or '-' in snippet_text or any(char.isdigit() and '.' in snippet_text for char in snippet_text),
-                    'has_numbers': any(char.isdigit() for char in snippet_text),
-                    'structure_type': 'list' if ('•' in snippet_text or '-' in snippet_text) else 'paragraph',
-                    'starts_with_definition': snippet_text.lower().startswith(('è', 'sono', 'il', 'la', 'lo', 'una', 'un'))
-                }
-            
-            organic_results = []
-            domain_analysis = {}
-            
-            if 'organic' in data:
-                for result in data['organic'][:10]:
-                    domain = urlparse(result.get('link', '')).netloc
-                    
-                    organic_results.append({
-                        'position': result.get('position', 0),
-                        'title': result.get('title', ''),
-                        'link': result.get('link', ''),
-                        'snippet': result.get('snippet', ''),
-                        'domain': domain
-                    })
-                    
-                    if domain:
-                        domain_analysis[domain] = domain_analysis.get(domain, 0) + 1
-            
-            return {
-                'status': 'success',
-                'query': query,
-                'people_also_ask': people_also_ask,
-                'paa_intents': paa_intents,
-                'related_searches': related_searches,
-                'featured_snippet': featured_snippet,
-                'snippet_analysis': snippet_analysis,
-                'organic_results': organic_results,
-                'domain_analysis': domain_analysis,
-                'total_results': data.get('searchInformation', {}).get('totalResults', 0)
-            }
-            
-        except Exception as e:
-            return {'status': 'error', 'query': query, 'error': str(e)}
+# Risorse condivise tra rerun e sessioni: client HTTP/OpenAI, cache su disco e store sitemap
+@st.cache_resource
+def get_api_cache() -> DiskCache:
+    return DiskCache()
 
-class ContentBriefGenerator:
-    def __init__(self, api_key: str, seo_enhancer: SEODataEnhancer = None):
-        self.client = openai.OpenAI(api_key=api_key)
-        self.seo_enhancer = seo_enhancer or SEODataEnhancer()
-    
-    def analyze_competitor_content(self, competitors: List[Dict]) -> Dict:
-        """Analizza in profondità il contenuto dei competitor"""
-        analysis = {
-            'common_topics': {},
-            'content_gaps': [],
-            'structural_patterns': {},
-            'content_depth_analysis': {}
-        }
-        
-        for comp in competitors:
-            content = comp['content'].lower()
-            topic_keywords = []
-            words = content.split()
-            
-            for i, word in enumerate(words):
-                if len(word) > 4:
-                    context_before = words[max(0, i-3):i]
-                    context_after = words[i+1:min(len(words), i+4)]
-                    
-                    if any(ctx in ['importante', 'fondamentale', 'essenziale', 'principale', 'primo', 'migliore'] for ctx in context_before + context_after):
-                        topic_keywords.append(word)
-            
-            for topic in topic_keywords:
-                if topic not in analysis['common_topics']:
-                    analysis['common_topics'][topic] = 0
-                analysis['common_topics'][topic] += 1
-            
-            headings = comp.get('headings', '').split('\n')
-            heading_patterns = []
-            for heading in headings:
-                if heading.strip():
-                    h_text = heading.split(':', 1)[1].strip() if ':' in heading else heading
-                    
-                    if 'come' in h_text.lower():
-                        heading_patterns.append('how_to')
-                    elif 'cosa' in h_text.lower():
-                        heading_patterns.append('what_is')
-                    elif 'perché' in h_text.lower():
-                        heading_patterns.append('why')
-                    elif 'migliori' in h_text.lower() or 'top' in h_text.lower():
-                        heading_patterns.append('best_list')
-                    elif 'confronto' in h_text.lower() or 'vs' in h_text.lower():
-                        heading_patterns.append('comparison')
-            
-            for pattern in heading_patterns:
-                if pattern not in analysis['structural_patterns']:
-                    analysis['structural_patterns'][pattern] = 0
-                analysis['structural_patterns'][pattern] += 1
-            
-            paragraphs = comp.get('paragraphs', [])
-            analysis['content_depth_analysis'][f"competitor_{comp['competitor_number']}"] = {
-                'total_paragraphs': len(paragraphs),
-                'avg_paragraph_length': sum(len(p.split()) for p in paragraphs) / len(paragraphs) if paragraphs else 0,
-                'word_count': comp['word_count'],
-                'has_lists': 'lista' in content or 'elenco' in content or '•' in comp['content'],
-                'has_examples': 'esempio' in content or 'ad esempio' in content,
-                'technical_depth': content.count('tecnic') + content.count('specific') + content.count('dettagli')
-            }
-        
-        all_topics = set()
-        for comp in competitors:
-            words = comp['content'].lower().split()
-            comp_topics = [w for w in words if len(w) > 5]
-            all_topics.update(comp_topics)
-        
-        topic_coverage = {}
-        for topic in all_topics:
-            coverage_count = sum(1 for comp in competitors if topic in comp['content'].lower())
-            topic_coverage[topic] = coverage_count
-        
-        analysis['content_gaps'] = [
-            topic for topic, count in topic_coverage.items() 
-            if count == 1 and len(topic) > 6
-        ][:10]
-        
-        return analysis
-    
-    def extract_search_intent_insights(self, keyword_analysis: Dict) -> Dict:
-        """Estrae insight avanzati sull'intento di ricerca"""
-        insights = {
-            'primary_intent': 'informational',
-            'intent_distribution': {},
-            'content_suggestions': {},
-            'user_journey_stage': 'awareness',
-            'competition_level': 'medium'
-        }
-        
-        if keyword_analysis.get('semrush_data', {}).get('status') == 'success':
-            semrush = keyword_analysis['semrush_data']
-            
-            cpc = semrush.get('cpc', 0)
-            competition = semrush.get('competition', 0)
-            
-            if cpc > 2.0 and competition > 0.7:
-                insights['primary_intent'] = 'transactional'
-                insights['user_journey_stage'] = 'decision'
-            elif cpc > 1.0 and competition > 0.4:
-                insights['primary_intent'] = 'commercial'
-                insights['user_journey_stage'] = 'consideration'
-            else:
-                insights['primary_intent'] = 'informational'
-                insights['user_journey_stage'] = 'awareness'
-            
-            if competition > 0.8:
-                insights['competition_level'] = 'high'
-            elif competition > 0.4:
-                insights['competition_level'] = 'medium'
-            else:
-                insights['competition_level'] = 'low'
-        
-        if keyword_analysis.get('related_keywords'):
-            intent_patterns = keyword_analysis.get('intent_categories', {})
-            total_keywords = len(keyword_analysis['related_keywords'])
-            
-            if total_keywords > 0:
-                for intent, keywords in intent_patterns.items():
-                    insights['intent_distribution'][intent] = len(keywords) / total_keywords
-        
-        if keyword_analysis.get('serper_data', {}).get('paa_intents'):
-            paa_intents = keyword_analysis['serper_data']['paa_intents']
-            
-            insights['content_suggestions'] = {
-                'faq_section_needed': len(paa_intents.get('informational', [])) > 2,
-                'comparison_section_needed': len(paa_intents.get('commercial', [])) > 1,
-                'pricing_section_needed': len(paa_intents.get('transactional', [])) > 1,
-                'how_to_section_needed': any('come' in q.lower() for q in keyword_analysis['serper_data'].get('people_also_ask', []))
-            }
-        
-        return insights
-    
-    def get_sitemap_urls(self, sitemap_url: str) -> List[str]:
-        """Estrae le URL dalla sitemap"""
-        urls = []
-        processed_sitemaps = set()
-        
-        def process_sitemap(url: str):
-            if url in processed_sitemaps:
-                return
-            processed_sitemaps.add(url)
-            
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (compatible; SEO-Tool/1.0; +http://www.example.com/bot)'
-                }
-                response = requests.get(url, headers=headers, timeout=15)
-                response.raise_for_status()
-                
-                root = ET.fromstring(response.content)
-                namespaces = {
-                    'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9',
-                    'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9'
-                }
-                
-                sitemapindex = root.findall('.//ns:sitemap', namespaces)
-                if sitemapindex:
-                    for sitemap in sitemapindex[:10]:
-                        loc_elem = sitemap.find('ns:loc', namespaces)
-                        if loc_elem is not None:
-                            process_sitemap(loc_elem.text)
-                else:
-                    for url_elem in root.findall('.//ns:url', namespaces):
-                        loc_elem = url_elem.find('ns:loc', namespaces)
-                        if loc_elem is not None:
-                            urls.append(loc_elem.text)
-                            if len(urls) >= 100:
-                                break
-                
-            except ET.ParseError:
-                try:
-                    response = requests.get(url, headers=headers, timeout=15)
-                    text = response.text
-                    url_pattern = r'https?://[^\s<>"\']+(?:/[^\s<>"\']*)?'
-                    found_urls = re.findall(url_pattern, text)
-                    urls.extend(found_urls[:50])
-                except:
-                    pass
-                    
-            except Exception as e:
-                st.warning(f"Errore nell'elaborazione della sitemap {url}: {str(e)}")
-        
-        try:
-            process_sitemap(sitemap_url)
-            return list(set(urls))
-        except Exception as e:
-            st.error(f"Errore critico nell'estrazione della sitemap: {str(e)}")
-            return []
-    
-    def analyze_keywords_with_apis(self, keywords: str) -> Dict:
-        """Analizza le keyword usando SEMrush e Serper"""
-        keyword_list = [k.strip() for k in keywords.split(',') if k.strip()]
-        main_keyword = keyword_list[0] if keyword_list else ""
-        
-        semrush_data = {}
-        related_keywords = []
-        intent_categories = {}
-        topic_clusters = {}
-        
-        if main_keyword:
-            semrush_data = self.seo_enhancer.get_semrush_keyword_data(main_keyword)
-            if semrush_data.get('status') == 'success':
-                related_keywords = self.seo_enhancer.get_semrush_related_keywords(main_keyword, limit=50)
-                if related_keywords:
-                    intent_categories = self.seo_enhancer.analyze_keyword_intent_patterns(related_keywords)
-                    topic_clusters = self.seo_enhancer.extract_topic_clusters(related_keywords)
-        
-        serper_data = {}
-        if main_keyword:
-            serper_data = self.seo_enhancer.get_serper_search_data(main_keyword)
-        
-        return {
-            'main_keyword': main_keyword,
-            'all_keywords': keyword_list,
-            'semrush_data': semrush_data,
-            'related_keywords': related_keywords,
-            'intent_categories': intent_categories,
-            'topic_clusters': topic_clusters,
-            'serper_data': serper_data
-        }
-    
-    def generate_content_brief(self, data: Dict, keyword_analysis: Dict) -> str:
-        """Genera il content brief usando OpenAI"""
-        
-        competitor_insights = self.analyze_competitor_content(data['competitors'])
-        search_intent_insights = self.extract_search_intent_insights(keyword_analysis)
-        
-        competitor_data = ""
-        for comp in data['competitors']:
-            competitor_data += f"\n--- COMPETITOR {comp['competitor_number']} ---\n"
-            competitor_data += f"URL: {comp['url']}\n"
-            if comp['title'] != f"Competitor {comp['competitor_number']}":
-                competitor_data += f"Titolo: {comp['title']}\n"
-            if comp['meta_description']:
-                competitor_data += f"Meta Description: {comp['meta_description']}\n"
-            if comp['headings']:
-                competitor_data += f"Struttura titoli identificata:\n{comp['headings']}\n"
-            competitor_data += f"Numero parole: {comp['word_count']}\n"
-            competitor_data += f"Contenuto completo: {comp['content'][:3000]}...\n"
-        
-        competitor_analysis = f"""
-ANALISI AVANZATA COMPETITOR:
-- Topic più comuni: {', '.join(list(competitor_insights['common_topics'].keys())[:10])}
-- Pattern strutturali dominanti: {', '.join(competitor_insights['structural_patterns'].keys())}
-- Gap di contenuto identificati: {', '.join(competitor_insights['content_gaps'][:5])}
-- Profondità media contenuto: {sum(comp['word_count'] for comp in data['competitors']) / len(data['competitors']):.0f} parole
-"""
-        
-        semrush_info = ""
-        if keyword_analysis['semrush_data'].get('status') == 'success':
-            sd = keyword_analysis['semrush_data']
-            semrush_info = f"""
-DATI SEMRUSH KEYWORD PRINCIPALE "{keyword_analysis['main_keyword']}":
-- Volume di ricerca mensile: {sd.get('search_volume', 'N/A')}
-- CPC: €{sd.get('cpc', 'N/A')} (Indicatore intent: {'Transactional' if sd.get('cpc', 0) > 2 else 'Commercial' if sd.get('cpc', 0) > 1 else 'Informational'})
-- Competizione: {sd.get('competition', 'N/A')}/1.0 (Livello: {'Alto' if sd.get('competition', 0) > 0.7 else 'Medio' if sd.get('competition', 0) > 0.4 else 'Basso'})
-- Risultati totali: {sd.get('results_count', 'N/A')}
-"""
-        
-        related_kw_by_intent = ""
-        if keyword_analysis.get('intent_categories'):
-            for intent, keywords in keyword_analysis['intent_categories'].items():
-                if keywords:
-                    related_kw_by_intent += f"\nKEYWORD {intent.upper()}:\n"
-                    top_keywords = sorted(keywords, key=lambda x: x['search_volume'], reverse=True)[:5]
-                    for kw in top_keywords:
-                        related_kw_by_intent += f"- {kw['keyword']} (Vol: {kw['search_volume']}, Comp: {kw['competition']:.2f})\n"
-        
-        topic_clusters_info = ""
-        if keyword_analysis.get('topic_clusters'):
-            topic_clusters_info = "CLUSTER TEMATICI DA SEMRUSH:\n"
-            sorted_clusters = sorted(keyword_analysis['topic_clusters'].items(), 
-                                   key=lambda x: x[1]['total_volume'], reverse=True)[:5]
-            for cluster_name, cluster_data in sorted_clusters:
-                topic_clusters_info += f"- Tema '{cluster_name}': {cluster_data['total_volume']} vol. totale, {len(cluster_data['keywords'])} keyword\n"
-        
-        serper_info = ""
-        if keyword_analysis['serper_data'].get('status') == 'success':
-            sd = keyword_analysis['serper_data']
-            
-            if sd.get('people_also_ask'):
-                serper_info += "PEOPLE ALSO ASK DA GOOGLE (CLASSIFICATE PER INTENT):\n"
-                paa_intents = sd.get('paa_intents', {})
-                for intent, questions in paa_intents.items():
-                    if questions:
-                        serper_info += f"\n{intent.upper()}:\n"
-                        for q in questions[:3]:
-                            serper_info += f"- {q}\n"
-            
-            if sd.get('related_searches'):
-                serper_info += f"\nRICERCHE CORRELATE DA GOOGLE:\n"
-                for rs in sd['related_searches'][:5]:
-                    serper_info += f"- {rs}\n"
-            
-            if sd.get('featured_snippet'):
-                snippet_analysis = sd.get('snippet_analysis', {})
-                serper_info += f"\nFEATURED SNIPPET ATTUALE - ANALISI STRUTTURALE:\n"
-                serper_info += f"Titolo: {sd['featured_snippet']['title']}\n"
-                serper_info += f"Lunghezza: {snippet_analysis.get('word_count', 0)} parole\n"
-                serper_info += f"Tipo struttura: {snippet_analysis.get('structure_type', 'paragraph')}\n"
-                serper_info += f"Contiene liste: {'Sì' if snippet_analysis.get('has_list') else 'No'}\n"
-                serper_info += f"Contiene numeri: {'Sì' if snippet_analysis.get('has_numbers') else 'No'}\n"
-                serper_info += f"Snippet: {sd['featured_snippet']['snippet'][:200]}...\n"
-        
-        intent_insights = f"""
-ANALISI INTENTO DI RICERCA AVANZATA:
-- Intent principale: {search_intent_insights['primary_intent']}
-- Fase user journey: {search_intent_insights['user_journey_stage']}
-- Livello competizione: {search_intent_insights['competition_level']}
-- Distribuzione intent: {search_intent_insights.get('intent_distribution', {})}
-- Sezioni consigliate: {search_intent_insights.get('content_suggestions', {})}
-"""
-        
-        internal_urls = "\n".join(data['sitemap_urls'][:30]) if data['sitemap_urls'] else data.get('manual_urls', 'Nessuna URL interna disponibile')
-        
-        prompt = f"""
-Sei un esperto SEO content strategist e data analyst di alto livello, con una specializzazione nell'E-E-A-T (Expertise, Authoritativeness, Trustworthiness). Il tuo obiettivo è creare un content brief estremamente dettagliato e altamente actionable, utilizzando dati SEO reali e un'analisi approfondita dei competitor.
+@st.cache_resource
+def get_llm_cache() -> DiskCache:
+    return DiskCache(LLM_CACHE_PATH, max_size_bytes=200 * 1024 * 1024)
 
-INFORMAZIONI CLIENTE:
-- Brand: {data['brand']}
-- Sito web: {data['website']}
-- Argomento: {data['topic']}
-- Keyword principali: {data['keywords']}
-- Domande frequenti inserite: {data['faqs']}
-- Tone of voice: {', '.join(data['tone_of_voice'])}
+@st.cache_resource
+def get_sitemap_store() -> SitemapStore:
+    return SitemapStore()
 
+@st.cache_resource
+def get_metrics_server():
+    # Endpoint /metrics per Prometheus, attivo solo se è configurata la porta
+    port = os.environ.get('CONTENT_BRIEF_METRICS_PORT')
+    return start_metrics_server(int(port)) if port else None
 
-DATI STRATEGICI:
-Utilizza le seguenti informazioni per ottimizzare il brief:
-Informazioni SEMrush: {semrush_info}
-Keyword correlate per intent: {related_kw_by_intent}
-Cluster tematici: {topic_clusters_info}
-Analisi SERP: {serper_info}
-Approfondimenti sull’intento: {intent_insights}
-Analisi dei competitor: {competitor_analysis}
+@st.cache_resource
+def get_job_registry() -> JobRegistry:
+    return JobRegistry(max_workers=4)
 
-ANALISI DETTAGLIATA COMPETITOR:
-{competitor_data}
+def notify_warning(message: str):
+    # Nei job in background gli avvisi finiscono nel registro, altrimenti direttamente nella pagina
+    if not add_warning(message):
+        st.warning(message)
 
-URL INTERNE DISPONIBILI (per link interni):
-{internal_urls}
+def notify_error(message: str):
+    if not add_warning(message):
+        st.error(message)
 
-ISTRUZIONI SPECIFICHE:
-- Il brand "{data['brand']}" DEVE apparire nel meta title alla fine
-- Il brand "{data['brand']}" DEVE apparire nella meta description
-- Usa la capitalizzazione naturale italiana per tutte le intestazioni e i titoli. (prima lettera maiuscola il resto minuscolo, ad esempio 'Come Funziona il Mutuo INPS per Dipendenti Pubblici' NON va bene, andrebbe scritto così 'Come funziona il mutuo INPS per dipendenti pubblici')
-- Utilizza TUTTI i dati reali per creare suggerimenti specifici e actionable
-- Per ogni H2/H3 fornisci istruzioni DETTAGLIATE su cosa scrivere all'interno di quel paragrafo tramite degli elenchi puntati dettagliati
-- Identifica e capitalizza sulle lacune lasciate dai competitor per creare opportunità uniche e distinguibili.
-- Integra keyword correlate basate sugli intent specifici identificati.
-- Fornisci risposte mirate alle PAA (People Also Ask) in base all'intento di ricerca.
+@st.cache_resource
+def get_generator(openai_api_key: str, semrush_api_key: str, serper_api_key: str) -> ContentBriefGenerator:
+    # Con CONTENT_BRIEF_CASSETTE il traffico HTTP viene registrato/riprodotto da file
+    cassette = cassette_from_env()
+    session = install_cassette(create_session(), cassette) if cassette else None
+    seo_enhancer = SEODataEnhancer(semrush_api_key, serper_api_key, cache=get_api_cache(), session=session,
+                                   on_warning=notify_warning)
+    return ContentBriefGenerator(openai_api_key, seo_enhancer, sitemap_store=get_sitemap_store(),
+                                 on_warning=notify_warning, on_error=notify_error, llm_cache=get_llm_cache(),
+                                 http_client=cassette_http_client(cassette) if cassette else None)
 
-Genera un content brief che includa:
+# Fasi della pipeline memorizzate in base ai loro input: al rerun si ricalcola solo ciò che è cambiato.
+# Il generatore non entra nella chiave (parametro con underscore), le API key sì.
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_keyword_analysis(_generator: ContentBriefGenerator, keywords: str,
+                            semrush_api_key: str, serper_api_key: str) -> dict:
+    if semrush_api_key or serper_api_key:
+        return _generator.analyze_keywords_with_apis(keywords)
+    return basic_keyword_analysis(keywords)
 
-1. **STRATEGIA SEO DATA-DRIVEN AVANZATA**
-   - Strategia per fase user journey: {search_intent_insights['user_journey_stage']}
-   - Definisci la strategia per ciascuna fase del percorso dell'utente e dettagli su come superare i featured snippet attuali.
-   - Sfruttamento gap competitor identificati
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_sitemap_urls(_generator: ContentBriefGenerator, sitemap_url: str) -> list:
+    urls = _generator.get_sitemap_urls(sitemap_url)
+    if not urls:
+        # Le eccezioni non vengono memorizzate: una sitemap irraggiungibile si riprova al rerun successivo
+        raise ValueError(f"Nessuna URL estratta da {sitemap_url}")
+    return urls
 
-2. **META OTTIMIZZATI CON DATI REALI**
-   - Meta title (50-60 caratteri) ottimizzato per volume {keyword_analysis['semrush_data'].get('search_volume', 0)}
-   - Meta description che incorpora PAA ad alto search intent
-   - Keyword correlate strategiche da integrare
-
-3. **STRUTTURA CONTENUTO ESTREMAMENTE DETTAGLIATA**
-   
-   **H1 OTTIMIZZATO:**
-   - H1 specifico con keyword principale
-   - Giustificazione scelta basata su dati competitor
-   
-   **INTRODUZIONE STRATEGICA:**
-   - Cosa scrivere nei primi 2-3 paragrafi
-   - Come incorporare keyword principale naturalmente
-   - Hook basato su gap competitor identificati
-   - Elementi da includere
-   
-   **SEZIONI H2 CON ISTRUZIONI DETTAGLIATE:**
-   Per ogni H2 fornisci:
-   - Titolo H2 ottimizzato per keyword correlate specifiche
-   - 4-6 bullet point DETTAGLIATI su cosa scrivere in quel paragrafo
-   - Keyword correlate specifiche da integrare (con volumi di ricerca)
-   - PAA specifiche da rispondere in quella sezione
-   - Esempi concreti da includere
-   - Elementi aggiuntivi (liste, tabelle, immagini)
-   - Link interni coerenti con il contenuto partendo dalla Sitemap del sito con anchor text specifiche
-
-4. **STRATEGIA PEOPLE ALSO ASK AVANZATA**
-   Per ogni PAA da Google:
-   - In quale sezione H2/H3 rispondere
-   - Come strutturare la risposta (lunghezza, formato)
-   - Keyword correlate da includere nella risposta
-   - Opportunità per featured snippet
+@st.cache_data(show_spinner=False)
+def cached_process_competitors(competitor_data: list) -> list:
+    return [
+        process_competitor_content(
+            comp_data['manual_content'],
+            url=comp_data['url'],
+            title=comp_data['manual_title'],
+            meta_description=comp_data['manual_meta'],
+            competitor_number=comp_data['competitor_number']
+        )
+        for comp_data in competitor_data
+        if comp_data['manual_content'].strip()
+    ]
 
-5. **INTEGRAZIONE KEYWORD CORRELATE PER TOPIC CLUSTER**
-   Per ogni cluster tematico identificato:
-   - Dove integrare le keyword del cluster
-   - Densità ottimale basata su competition
-   - Long-tail opportunities ad alto volume
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_serp_competitors(_generator: ContentBriefGenerator, keyword_analysis: dict, limit: int,
+                            website: str, start_number: int) -> list:
+    own_domain = urlparse(website if '://' in website else f"https://{website}").netloc
+    competitors = _generator.fetch_serp_competitors(keyword_analysis, limit=limit, exclude_domains=[own_domain],
+                                                    start_number=start_number)
+    if not competitors:
+        # Come per la sitemap: un esito vuoto non viene memorizzato e si riprova al rerun successivo
+        raise ValueError("Nessun competitor scaricato dai risultati organici")
+    return competitors
 
-6. **STRATEGIA LINK INTERNI DATA-DRIVEN**
-   - Link del sito provenienti dalla sitemap basate su keyword correlate e volumi coerenti con il contenuto dell'articolo
-   - Anchor text ottimizzate per topic cluster
-   - Distribuzione strategica per massimizzare ranking
+@st.cache_data(show_spinner=False)
+def cached_clean_competitors(_generator: ContentBriefGenerator, competitors: list, topic: str, keywords: str) -> tuple:
+    return _generator.clean_competitor_content(competitors, topic, keywords)
 
-7. **ELEMENTI E-E-A-T SPECIFICI**
-   - Fonti autorevoli che competitor non usano
-   - Dati statistici più recenti
-   - Esempi pratici basati su ricerche correlate reali
-   - Authority signals da includere
+@st.cache_data(show_spinner=False)
+def cached_competitor_analysis(_generator: ContentBriefGenerator, competitors: list) -> dict:
+    return _generator.analyze_competitor_content(competitors)
 
-8. **PIANO IMPLEMENTAZIONE COPYWRITER**
-   - Checklist step-by-step per copywriter
-   - Metriche da raggiungere (lunghezza, keyword density)
-   - Elementi obbligatori per ogni sezione
-   - KPI di successo previsti
+def get_editor_id() -> str:
+    """Identificativo casuale dell'utente nella sessione Streamlit: basta per vedere e scaricare i suoi
+    job, quindi non finisce nell'URL (un link condiviso esporrebbe i brief di un altro editor)"""
+    if 'editor' in st.query_params:
+        del st.query_params['editor']
+    if 'editor_id' not in st.session_state:
+        st.session_state.editor_id = secrets.token_urlsafe(32)
+    return st.session_state.editor_id
 
-Questo content brief deve essere concepito in modo da permettere al copywriter di produrre contenuti chiaramente superiori rispetto alla concorrenza, utilizzando esclusivamente dati reali e analisi avanzate. Ogni suggerimento deve essere specifico, actionable e orientato ai dati forniti, garantendo così un approccio strategico e mirato alla creazione di contenuti di alta qualità.
-"""
+# Fasi della pipeline con la durata stimata (secondi) usata finché non ci sono misure reali
+BRIEF_STAGES = [
+    ('keyword_analysis', 4.0),
+    ('sitemap', 3.0),
+    ('competitor_fetch', 5.0),
+    ('competitor_analysis', 0.5),
+    ('prompt_build', 0.3),
+    ('llm.generate', 60.0)
+]
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "Sei un esperto SEO data analyst e content strategist che crea content brief estremamente dettagliati e actionable utilizzando dati reali di SEMrush, Serper e analisi competitor avanzate per garantire posizionamenti top su Google."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=4000,
-                temperature=0.3
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            st.error(f"Errore nella generazione del content brief: {str(e)}")
-            return "Errore nella generazione del contenuto."
+def run_brief_job(generator: ContentBriefGenerator, form: dict, semrush_api_key: str,
+                  serper_api_key: str, force_regenerate: bool) -> dict:
+    """Pipeline completa di un brief, eseguita in un worker del registro job"""
+    skipped = {name for name, enabled in (('sitemap', form['sitemap_url']),
+                                          ('competitor_fetch', form['fetch_competitors'])) if not enabled}
+    stages = [(name, seconds) for name, seconds in BRIEF_STAGES if name not in skipped]
+    plan = progress_plan(stages)
+    
+    with trace('brief', brand=form['brand'], topic=form['topic'][:60]) as brief_trace:
+        report_progress(plan['keyword_analysis'][0], "🔍 Analisi keyword...")
+        keyword_analysis = cached_keyword_analysis(generator, form['keywords'], semrush_api_key, serper_api_key)
+        
+        sitemap_urls = []
+        sitemap_error = False
+        if form['sitemap_url']:
+            report_progress(plan['sitemap'][0], "📡 Estrazione URL dalla sitemap...")
+            try:
+                sitemap_urls = cached_sitemap_urls(generator, form['sitemap_url'])
+            except ValueError:
+                sitemap_urls = []
+            if not sitemap_urls:
+                sitemap_error = True
+                notify_warning("⚠️ Impossibile accedere alla sitemap. Utilizzo URL manuali.")
+        if sitemap_error or form['manual_urls'].strip():
+            sitemap_urls.extend(url.strip() for url in form['manual_urls'].split('\n') if url.strip())
+        
+        competitors_processed = cached_process_competitors(form['competitor_data'])
+        if form['fetch_competitors']:
+            report_progress(plan['competitor_fetch'][0], "🌐 Download dei competitor dai risultati organici...")
+            start_number = max((comp['competitor_number'] for comp in form['competitor_data']), default=0) + 1
+            try:
+                competitors_processed = competitors_processed + cached_serp_competitors(
+                    generator, keyword_analysis, form['fetch_competitors'], form['website'], start_number
+                )
+            except ValueError:
+                notify_warning("⚠️ Nessun competitor scaricato automaticamente dai risultati organici.")
+        if not competitors_processed:
+            raise RuntimeError("Nessun competitor disponibile per l'analisi")
+        
+        report_progress(plan['competitor_analysis'][0], "📊 Elaborazione contenuti competitor...")
+        competitors_processed, dedup_report = cached_clean_competitors(generator, competitors_processed,
+                                                                               form['topic'], form['keywords'])
+        competitor_insights = cached_competitor_analysis(generator, competitors_processed)
+        
+        data = {
+            'brand': form['brand'],
+            'website': form['website'],
+            'topic': form['topic'],
+            'keywords': form['keywords'],
+            'faqs': form['faqs'],
+            'tone_of_voice': form['tone_of_voice'],
+            'competitors': competitors_processed,
+            'competitor_insights': competitor_insights,
+            'dedup_report': dedup_report,
+            'sitemap_urls': sitemap_urls,
+            'manual_urls': form['manual_urls']
+        }
+        
+        llm_start, llm_end = plan['llm.generate']
+        report_progress(plan['prompt_build'][0], "🤖 Generazione content brief con AI e dati SEO reali...")
+        expected_seconds = METRICS.mean_duration('llm.generate') or dict(BRIEF_STAGES)['llm.generate']
+        started = time.monotonic()
+        
+        def on_chunk(text: str):
+            # Avanzamento dentro la fase LLM stimato sulla durata media delle generazioni precedenti
+            fraction = min(0.95, (time.monotonic() - started) / expected_seconds)
+            report_progress(int(llm_start + (llm_end - llm_start) * fraction), "✍️ Scrittura del content brief...")
+            append_output(text)
+        
+        content_brief = generator.generate_content_brief(data, keyword_analysis, on_chunk=on_chunk,
+                                                         force_regenerate=force_regenerate, deduplicate=False)
+        if content_brief == GENERATION_ERROR_MESSAGE:
+            raise RuntimeError("Generazione OpenAI fallita")
+    
+    # Il DOCX non viene creato qui: lo genera il pulsante di download solo quando viene cliccato
+    return {
+        'content_brief': content_brief,
+        'brand': form['brand'],
+        'topic': form['topic'],
+        'file_name': f"content_brief_SEO_{form['brand']}_{form['topic'].replace(' ', '_')}.docx",
+        'keyword_analysis': keyword_analysis,
+        'competitors_count': len(competitors_processed),
+        'sitemap_urls_count': len(sitemap_urls),
+        'dedup_report': dedup_report,
+        'timings': [(record['span'], record['duration_ms']) for record in brief_trace.spans],
+        'api_cache_stats': generator.seo_enhancer.cache.stats(),
+        'llm_cache_stats': generator.llm_cache.stats()
+    }
 
-def create_docx(content: str, brand: str, topic: str) -> io.BytesIO:
-    """Crea un documento DOCX formattato con il content brief"""
-    doc = Document()
+def render_job_result(job: dict):
+    """Anteprima, download e riepilogo di un brief completato"""
+    result = job['result']
+    keyword_analysis = result['keyword_analysis']
     
-    sections = doc.sections
-    for section in sections:
-        section.top_margin = Inches(1)
-        section.bottom_margin = Inches(1)
-        section.left_margin = Inches(1)
-        section.right_margin = Inches(1)
+    if keyword_analysis['semrush_data'].get('status') == 'success':
+        semrush_data = keyword_analysis['semrush_data']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("📈 Volume ricerca", f"{semrush_data['search_volume']:,}")
+        with col2:
+            st.metric("💰 CPC", f"€{semrush_data['cpc']:.2f}")
+        with col3:
+            st.metric("⚔️ Competition", f"{semrush_data['competition']:.2f}")
+        with col4:
+            intent = 'Transactional' if semrush_data['cpc'] > 2 else 'Commercial' if semrush_data['cpc'] > 1 else 'Informational'
+            st.metric("🎯 Intent", intent)
     
-    title = doc.add_heading(f'Content brief SEO data-driven - {topic}', 0)
-    title_format = title.runs[0].font
-    title_format.name = 'Figtree'
-    title_format.size = Pt(20)
-    title_format.color.rgb = None
+    if keyword_analysis.get('intent_categories'):
+        intent_summary = [f"{intent}: {len(kws)} keyword" for intent, kws in keyword_analysis['intent_categories'].items() if kws]
+        if intent_summary:
+            st.info(f"📊 Distribuzione intent: {', '.join(intent_summary)}")
     
-    subtitle = doc.add_paragraph(f'Brand: {brand}')
-    subtitle_format = subtitle.runs[0].font
-    subtitle_format.name = 'Figtree'
-    subtitle_format.size = Pt(12)
-    subtitle_format.bold = True
+    with st.expander("👁️ Anteprima content brief", expanded=False):
+        st.markdown(result['content_brief'])
     
-    doc.add_paragraph("")
+    st.download_button(
+        label="📥 Scarica content brief SEO data-driven (DOCX)",
+        data=functools.partial(create_docx, result['content_brief'], result['brand'], result['topic']),
+        file_name=result['file_name'],
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        key=f"download_{job['id']}",
+        on_click='ignore',
+        use_container_width=True
+    )
     
-    lines = content.split('\n')
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("🔍 Competitor analizzati", result['competitors_count'])
+    with col2:
+        st.metric("🔗 URL interne trovate", result['sitemap_urls_count'])
+    with col3:
+        paa_count = len(keyword_analysis.get('serper_data', {}).get('people_also_ask', []))
+        st.metric("❓ PAA analizzate", paa_count)
+    with col4:
+        cluster_count = len(keyword_analysis.get('topic_clusters', {}))
+        st.metric("🎯 Topic cluster", cluster_count)
     
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            heading = doc.add_heading(line[2:], 1)
-            heading_format = heading.runs[0].font
-            heading_format.name = 'Figtree'
-            heading_format.size = Pt(17)
-            
-        elif line.startswith('## '):
-            heading = doc.add_heading(line[3:], 2)
-            heading_format = heading.runs[0].font
-            heading_format.name = 'Figtree'
-            heading_format.size = Pt(17)
-            
-        elif line.startswith('### '):
-            heading = doc.add_heading(line[4:], 3)
-            heading_format = heading.runs[0].font
-            heading_format.name = 'Figtree'
-            heading_format.size = Pt(17)
-            
-        elif line.startswith('**') and line.endswith('**'):
-            p = doc.add_paragraph()
-            run = p.add_run(line[2:-2])
-            run.font.name = 'Figtree'
-            run.font.size = Pt(11)
-            run.font.bold = True
-            
-        elif line.startswith('- ') or line.startswith('* '):
-            p = doc.add_paragraph(line[2:], style='List Bullet')
-            p.runs[0].font.name = 'Figtree'
-            p.runs[0].font.size = Pt(11)
-            
-        else:
-            if line:
-                p = doc.add_paragraph(line)
-                p.runs[0].font.name = 'Figtree'
-                p.runs[0].font.size = Pt(11)
+    api_stats = result['api_cache_stats']
+    llm_stats = result['llm_cache_stats']
+    st.caption(f"💾 Cache API: {api_stats['hits']} hit, {api_stats['misses']} miss, {api_stats['entries']} risposte salvate")
+    dedup = result['dedup_report']
+    st.caption(f"🧹 Pulizia competitor: {dedup['boilerplate']} paragrafi di boilerplate e "
+               f"{dedup['duplicate'] + dedup['cross_duplicate']} ripetuti rimossi, circa {dedup['tokens_saved']:,} token risparmiati")
+    st.caption(f"🤖 Cache brief: {llm_stats['hits']} hit, {llm_stats['misses']} miss, {llm_stats['entries']} brief salvati")
+    stage_names = {name for name, _ in BRIEF_STAGES}
+    timings = [f"{name} {duration_ms / 1000:.1f}s" for name, duration_ms in result['timings'] if name in stage_names]
+    if timings:
+        st.caption(f"⏱️ Tempi per fase: {', '.join(timings)}")
+
+def render_jobs(editor_id: str):
+    """Elenco dei brief dell'utente; si aggiorna da solo finché ci sono job in corso"""
+    registry = get_job_registry()
+    polling = any(job['status'] in ACTIVE_STATUSES for job in registry.list_jobs(editor_id))
     
-    doc_buffer = io.BytesIO()
-    doc.save(doc_buffer)
-    doc_buffer.seek(0)
+    @st.fragment(run_every=2 if polling else None)
+    def jobs_panel():
+        jobs = registry.list_jobs(editor_id)
+        if not jobs:
+            return
+        if polling and not any(job['status'] in ACTIVE_STATUSES for job in jobs):
+            # Tutti i job sono conclusi: un rerun completo ferma l'aggiornamento periodico
+            st.rerun()
+        
+        st.markdown('<h2 class="section-header">📋 I tuoi content brief</h2>', unsafe_allow_html=True)
+        for job in jobs:
+            icon = {'queued': '⏳', 'running': '🔄', 'done': '✅', 'failed': '❌'}[job['status']]
+            with st.container(border=True):
+                st.markdown(f"**{icon} {job['label']}**")
+                if job['status'] in ACTIVE_STATUSES:
+                    st.progress(job['progress'], text=job['message'])
+                    if job['partial']:
+                        with st.expander("✍️ Generazione in corso", expanded=True):
+                            st.markdown(job['partial'])
+                elif job['status'] == 'failed':
+                    st.error(f"❌ {job['error']}")
+                else:
+                    render_job_result(job)
+                for warning in job['warnings']:
+                    st.warning(warning)
+                if job['status'] not in ACTIVE_STATUSES:
+                    if st.button("🗑️ Rimuovi", key=f"remove_{job['id']}"):
+                        registry.remove(job['id'])
+                        st.rerun()
     
-    return doc_buffer
+    jobs_panel()
 
 def main():
     st.markdown('<h1 class="main-header">📝 Content Brief Generator Pro</h1>', unsafe_allow_html=True)
@@ -850,6 +401,13 @@ def main():
         else:
             st.info("💡 Aggiungi per PAA da Google")
         
+        st.markdown("#### 🏁 Competitor")
+        # Fuori dal form: cambiando il numero i campi si aggiornano subito
+        manual_competitors = st.number_input(
+            "Competitor da inserire a mano", min_value=1, max_value=10, value=3,
+            help="Campi per incollare o caricare le pagine competitor; con Serper se ne possono aggiungere altri dai risultati organici"
+        )
+        
         st.markdown("---")
         st.markdown("### 🚀 Miglioramenti")
         st.markdown("""
@@ -865,8 +423,9 @@ def main():
         st.info("👈 Inserisci almeno la OpenAI API Key nella sidebar per iniziare")
         return
     
-    seo_enhancer = SEODataEnhancer(semrush_api_key, serper_api_key)
-    generator = ContentBriefGenerator(openai_api_key, seo_enhancer)
+    get_metrics_server()
+    generator = get_generator(openai_api_key, semrush_api_key, serper_api_key)
+    editor_id = get_editor_id()
     
     with st.form("content_brief_form"):
         st.markdown('<h2 class="section-header">📋 Informazioni cliente</h2>', unsafe_allow_html=True)
@@ -903,27 +462,48 @@ def main():
         manual_urls = st.text_area("📎 URL interne manuali", placeholder="https://www.sito.it/pagina1\nhttps://www.sito.it/pagina2", height=100)
         
         st.markdown('<h3 class="section-header">🔍 Analisi competitor</h3>', unsafe_allow_html=True)
-        st.markdown('<div class="info-box">🎯 <strong>Inserimento manuale obbligatorio</strong>: Incolla il contenuto testuale completo di ogni competitor per un\'analisi più precisa e affidabile</div>', unsafe_allow_html=True)
+        st.markdown('<div class="info-box">🎯 Incolla il contenuto testuale completo di ogni competitor, oppure il codice HTML della pagina (anche come file) per ricavare la vera struttura dei titoli H1-H6, elenchi e tabelle. Con Serper configurato i primi risultati organici possono essere scaricati automaticamente</div>', unsafe_allow_html=True)
+        
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            auto_fetch = st.checkbox(
+                "🌐 Scarica automaticamente i competitor dai risultati organici di Google",
+                disabled=not serper_api_key,
+                help="Richiede la Serper API key. Le pagine vengono scaricate in parallelo e se ne estrae il contenuto principale; si aggiungono ai competitor inseriti a mano"
+            )
+        with col2:
+            fetch_limit = st.number_input("Numero di risultati", min_value=1, max_value=10, value=3, disabled=not serper_api_key)
+        fetch_competitors = int(fetch_limit) if auto_fetch and serper_api_key else 0
+        
         
         competitor_data = []
-        for i in range(3):
+        for i in range(int(manual_competitors)):
             st.markdown(f"**📊 Competitor {i+1}**")
             
             url = st.text_input(f"🌐 URL Competitor {i+1} (opzionale)", key=f"comp_url_{i}", placeholder="https://competitor.example.com/articolo", help="Solo per riferimento nel brief")
             
             manual_content = st.text_area(
-                f"📝 Contenuto testuale completo Competitor {i+1} *", 
+                f"📝 Contenuto testuale completo Competitor {i+1}", 
                 key=f"comp_content_{i}", 
-                placeholder="Incolla qui tutto il contenuto testuale della pagina competitor (titoli, paragrafi, liste, etc.)",
+                placeholder="Incolla qui tutto il contenuto testuale della pagina competitor (titoli, paragrafi, liste, etc.) oppure il suo codice HTML",
                 height=200,
-                help="Copia e incolla tutto il testo della pagina competitor per un'analisi completa"
+                help="Copia e incolla tutto il testo della pagina competitor per un'analisi completa. Con l'HTML (Ctrl+U nel browser) titoli, elenchi e tabelle vengono riconosciuti esattamente"
+            )
+            uploaded_page = st.file_uploader(
+                f"📎 Oppure carica la pagina salvata Competitor {i+1}",
+                type=['html', 'htm', 'txt'],
+                key=f"comp_file_{i}",
+                help="File HTML salvato dal browser (Salva pagina con nome) o testo"
             )
+            if uploaded_page is not None:
+                # I byte vanno al parser così com'erano: la codifica si ricava dal meta charset della pagina
+                manual_content = uploaded_page.getvalue()
             
             col1, col2 = st.columns(2)
             with col1:
-                comp_title = st.text_input(f"📋 Title tag Competitor {i+1}", key=f"comp_title_{i}", placeholder="Title tag della pagina competitor")
+                comp_title = st.text_input(f"📋 Title tag Competitor {i+1}", key=f"comp_title_{i}", placeholder="Title tag della pagina competitor", help="Se vuoto e il contenuto è HTML, viene letto dal tag <title>")
             with col2:
-                comp_meta = st.text_input(f"📄 Meta description Competitor {i+1}", key=f"comp_meta_{i}", placeholder="Meta description della pagina")
+                comp_meta = st.text_input(f"📄 Meta description Competitor {i+1}", key=f"comp_meta_{i}", placeholder="Meta description della pagina", help="Se vuota e il contenuto è HTML, viene letta dal meta tag description")
             
             if manual_content.strip():
                 competitor_data.append({
@@ -937,169 +517,39 @@ def main():
         if competitor_data:
             st.success(f"✅ {len(competitor_data)} competitor pronti per l'analisi")
         
+        force_regenerate = st.checkbox(
+            "♻️ Forza rigenerazione",
+            help="Ignora il brief salvato in cache per input identici e richiama OpenAI"
+        )
+        
         submitted = st.form_submit_button("🚀 Genera content brief con dati SEO reali", use_container_width=True)
     
     if submitted:
         if not all([brand, website, topic, keywords]):
             st.error("❌ Compila tutti i campi obbligatori: Brand, Website, Argomento e Keywords")
-            return
-        
-        if not competitor_data:
-            st.error("❌ Inserisci il contenuto di almeno un competitor per procedere con l'analisi")
-            return
-        
-        valid_competitors_count = len([c for c in competitor_data if c['manual_content'].strip()])
-        if valid_competitors_count == 0:
-            st.error("❌ Inserisci il contenuto testuale di almeno un competitor")
-            return
-        
-        with st.spinner("🔄 Generazione del content brief con dati SEO reali..."):
-            progress_bar = st.progress(0)
-            
-            if semrush_api_key or serper_api_key:
-                st.info("🔍 Analisi keyword avanzata con SEMrush e Serper...")
-                keyword_analysis = generator.analyze_keywords_with_apis(keywords)
-                progress_bar.progress(15)
-                
-                if keyword_analysis['semrush_data'].get('status') == 'success':
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("📈 Volume ricerca", f"{keyword_analysis['semrush_data']['search_volume']:,}")
-                    with col2:
-                        st.metric("💰 CPC", f"€{keyword_analysis['semrush_data']['cpc']:.2f}")
-                    with col3:
-                        st.metric("⚔️ Competition", f"{keyword_analysis['semrush_data']['competition']:.2f}")
-                    with col4:
-                        intent = 'Transactional' if keyword_analysis['semrush_data']['cpc'] > 2 else 'Commercial' if keyword_analysis['semrush_data']['cpc'] > 1 else 'Informational'
-                        st.metric("🎯 Intent", intent)
-                
-                if keyword_analysis.get('topic_clusters'):
-                    st.success(f"✅ Identificati {len(keyword_analysis['topic_clusters'])} cluster tematici")
-                
-                if keyword_analysis.get('serper_data', {}).get('people_also_ask'):
-                    paa_count = len(keyword_analysis['serper_data']['people_also_ask'])
-                    st.success(f"✅ Analizzate {paa_count} People Also Ask con classificazione intent")
-                
-                if keyword_analysis.get('intent_categories'):
-                    intent_summary = []
-                    for intent, kws in keyword_analysis['intent_categories'].items():
-                        if kws:
-                            intent_summary.append(f"{intent}: {len(kws)} keyword")
-                    if intent_summary:
-                        st.info(f"📊 Distribuzione intent: {', '.join(intent_summary)}")
-            else:
-                st.info("📊 Analisi keyword base (senza API esterne)...")
-                keyword_analysis = {
-                    'main_keyword': keywords.split(',')[0].strip(), 
-                    'semrush_data': {}, 
-                    'serper_data': {},
-                    'intent_categories': {},
-                    'topic_clusters': {}
-                }
-                progress_bar.progress(15)
-            
-            st.info("📡 Estrazione URL dalla sitemap...")
-            sitemap_urls = []
-            sitemap_error = False
-            
-            if sitemap_url:
-                sitemap_urls = generator.get_sitemap_urls(sitemap_url)
-                if not sitemap_urls:
-                    sitemap_error = True
-                    st.warning("⚠️ Impossibile accedere alla sitemap. Utilizzo URL manuali.")
-            
-            if sitemap_error or manual_urls.strip():
-                manual_url_list = [url.strip() for url in manual_urls.split('\n') if url.strip()]
-                sitemap_urls.extend(manual_url_list)
-            
-            progress_bar.progress(35)
-            
-            st.info("📊 Elaborazione contenuti competitor inseriti manualmente...")
-            competitors_processed = []
-            
-            for comp_data in competitor_data:
-                if comp_data['manual_content'].strip():
-                    content = comp_data['manual_content']
-                    word_count = len(content.split())
-                    
-                    headings = []
-                    lines = content.split('\n')
-                    for line in lines:
-                        line = line.strip()
-                        if (line.isupper() and len(line) > 10) or \
-                           (line.startswith(('1.', '2.', '3.', '4.', '5.', '•', '-')) and len(line) > 15) or \
-                           (len(line) < 100 and line.endswith((':', '?')) and len(line) > 10):
-                            headings.append(line)
-                    
-                    processed_data = {
-                        'url': comp_data['url'],
-                        'title': comp_data['manual_title'] or f"Competitor {comp_data['competitor_number']}",
-                        'meta_description': comp_data['manual_meta'],
-                        'meta_keywords': "",
-                        'headings': '\n'.join(headings[:15]),
-                        'content': content,
-                        'paragraphs': content.split('\n\n')[:10],
-                        'lists': [],
-                        'word_count': word_count,
-                        'status': 'manual',
-                        'competitor_number': comp_data['competitor_number']
-                    }
-                    competitors_processed.append(processed_data)
-            
-            valid_competitors = competitors_processed
-            progress_bar.progress(75)
-            
-            st.info("📊 Preparazione dati per analisi E-E-A-T...")
-            data = {
+        elif not competitor_data and not fetch_competitors:
+            st.error("❌ Inserisci il contenuto testuale di almeno un competitor, oppure attiva il download automatico dai risultati organici")
+        else:
+            form = {
                 'brand': brand,
                 'website': website,
                 'topic': topic,
                 'keywords': keywords,
                 'faqs': faqs,
                 'tone_of_voice': tone_of_voice,
-                'competitors': valid_competitors,
-                'sitemap_urls': sitemap_urls,
-                'manual_urls': manual_urls
+                'sitemap_url': sitemap_url,
+                'manual_urls': manual_urls,
+                'competitor_data': competitor_data,
+                'fetch_competitors': fetch_competitors
             }
-            progress_bar.progress(85)
-            
-            st.info("🤖 Generazione content brief con AI e dati SEO reali...")
-            content_brief = generator.generate_content_brief(data, keyword_analysis)
-            progress_bar.progress(95)
-            
-            st.info("📄 Creazione documento DOCX...")
-            docx_buffer = create_docx(content_brief, brand, topic)
-            progress_bar.progress(100)
-            
-            st.success("✅ Content brief SEO data-driven generato con successo!")
-        
-        st.markdown('<h2 class="section-header">📋 Content brief SEO data-driven generato</h2>', unsafe_allow_html=True)
-        
-        with st.expander("👁️ Anteprima content brief", expanded=True):
-            st.markdown(content_brief)
-        
-        st.download_button(
-            label="📥 Scarica content brief SEO data-driven (DOCX)",
-            data=docx_buffer.getvalue(),
-            file_name=f"content_brief_SEO_{brand}_{topic.replace(' ', '_')}.docx",
-            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            use_container_width=True
-        )
-        
-        st.markdown('<h3 class="section-header">📊 Riepilogo analisi completa</h3>', unsafe_allow_html=True)
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("🔍 Competitor analizzati", len(valid_competitors))
-        with col2:
-            st.metric("🔗 URL interne trovate", len(sitemap_urls))
-        with col3:
-            paa_count = len(keyword_analysis.get('serper_data', {}).get('people_also_ask', []))
-            st.metric("❓ PAA analizzate", paa_count)
-        with col4:
-            cluster_count = len(keyword_analysis.get('topic_clusters', {}))
-            st.metric("🎯 Topic cluster", cluster_count)
-
+            get_job_registry().submit(
+                editor_id, f"{brand} · {topic[:60]}", run_brief_job,
+                generator, form, semrush_api_key, serper_api_key, force_regenerate
+            )
+            st.success("✅ Brief aggiunto alla coda: puoi continuare a lavorare o accodarne altri")
+    
+    render_jobs(editor_id)
+    
         # Footer
     st.markdown("---")
     st.markdown("""
@@ -0,0 +1,270 @@
+"""Generazione headless di content brief in batch da un file CSV o JSONL di job.
+
+Esempio:
+    python batch.py piano_editoriale.csv --output briefs.zip --workers 8
+
+Le API key si passano da riga di comando o tramite le variabili d'ambiente
+OPENAI_API_KEY, SEMRUSH_API_KEY e SERPER_API_KEY.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from cache import DiskCache, LLM_CACHE_PATH
+from http_client import create_session
+from recording import CASSETTE_MODES, Cassette, FaultProfile, cassette_http_client, install_cassette
+from sitemap import SitemapStore
+from tracing import trace
+from content_brief import (
+    GENERATION_ERROR_MESSAGE,
+    SEODataEnhancer,
+    ContentBriefGenerator,
+    create_docx,
+    basic_keyword_analysis,
+    process_competitor_content
+)
+
+logger = logging.getLogger(__name__)
+
+COMPETITOR_COLUMN_PATTERN = re.compile(r'^competitor_(\d+)_(url|content|file|title|meta)$')
+
+
+def _split_list(value) -> List[str]:
+    """Accetta una lista o una stringa separata da virgole o barre verticali"""
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in re.split(r'[|,]', value or '') if v.strip()]
+
+
+def _competitors_from_columns(row: Dict) -> List[Dict]:
+    """Ricostruisce la lista competitor dalle colonne CSV competitor_<n>_<campo>"""
+    competitors: Dict[int, Dict] = {}
+    for column, value in row.items():
+        match = COMPETITOR_COLUMN_PATTERN.match(column or '')
+        if match and value:
+            competitors.setdefault(int(match.group(1)), {})[match.group(2)] = value
+    return [competitors[number] for number in sorted(competitors)]
+
+
+def load_jobs(path: str) -> List[Dict]:
+    """Legge i job da CSV o JSONL normalizzandoli nello stesso formato"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for index, row in enumerate(rows, start=1):
+        competitors = row.get('competitors') or _competitors_from_columns(row)
+        for competitor in competitors:
+            if competitor.get('file') and not competitor.get('content'):
+                file_path = competitor['file']
+                if not os.path.isabs(file_path):
+                    file_path = os.path.join(base_dir, file_path)
+                # Byte grezzi: per le pagine HTML la codifica si ricava dal meta charset
+                with open(file_path, 'rb') as f:
+                    competitor['content'] = f.read()
+
+        jobs.append({
+            'id': str(row.get('id') or index),
+            'brand': row.get('brand', ''),
+            'website': row.get('website', ''),
+            'topic': row.get('topic', ''),
+            'keywords': row.get('keywords', ''),
+            'faqs': row.get('faqs', ''),
+            'tone_of_voice': _split_list(row.get('tone_of_voice')) or ['Professionale'],
+            'sitemap_url': row.get('sitemap_url', ''),
+            'manual_urls': row.get('manual_urls', ''),
+            'competitors': [c for c in competitors if (c.get('content') or '').strip()],
+            'fetch_competitors': int(row.get('fetch_competitors') or 0)
+        })
+    return jobs
+
+
+def docx_filename(job: Dict) -> str:
+    """Nome file DOCX univoco e sicuro per il job"""
+    name = f"{job['id']}_content_brief_SEO_{job['brand']}_{job['topic']}"
+    name = re.sub(r'[^\w\-]+', '_', name, flags=re.UNICODE).strip('_')
+    return f"{name[:150]}.docx"
+
+
+def _generate_to_file(generator: ContentBriefGenerator, data: Dict, keyword_analysis: Dict,
+                      stream_dir: str, job_id: str, force_regenerate: bool = False) -> str:
+    """Genera in streaming scrivendo i frammenti su disco; il file .md compare solo a generazione completa"""
+    os.makedirs(stream_dir, exist_ok=True)
+    final_path = os.path.join(stream_dir, f"{job_id}.md")
+    partial_path = final_path + '.part'
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        def write_chunk(text: str):
+            f.write(text)
+            f.flush()
+        content_brief = generator.generate_content_brief(data, keyword_analysis, on_chunk=write_chunk,
+                                                         force_regenerate=force_regenerate, deduplicate=False)
+    if content_brief != GENERATION_ERROR_MESSAGE:
+        os.replace(partial_path, final_path)
+    return content_brief
+
+
+def prepare_job(job: Dict, generator: ContentBriefGenerator, use_apis: bool) -> Tuple[Dict, Dict]:
+    """Esegue le fasi precedenti alla chiamata LLM e restituisce (data, keyword_analysis)"""
+    if not all([job['brand'], job['website'], job['topic'], job['keywords']]):
+        raise ValueError("Campi obbligatori mancanti: brand, website, topic, keywords")
+    if not job['competitors'] and not (use_apis and job['fetch_competitors']):
+        raise ValueError("Nessun contenuto competitor fornito")
+
+    if use_apis:
+        keyword_analysis = generator.analyze_keywords_with_apis(job['keywords'])
+    else:
+        keyword_analysis = basic_keyword_analysis(job['keywords'])
+
+    sitemap_urls = generator.get_sitemap_urls(job['sitemap_url']) if job['sitemap_url'] else []
+    sitemap_urls.extend(url.strip() for url in job['manual_urls'].split('\n') if url.strip())
+
+    competitors = [
+        process_competitor_content(
+            competitor['content'],
+            url=competitor.get('url') or f"Competitor {number}",
+            title=competitor.get('title', ''),
+            meta_description=competitor.get('meta', ''),
+            competitor_number=number
+        )
+        for number, competitor in enumerate(job['competitors'], start=1)
+    ]
+    if use_apis and job['fetch_competitors']:
+        own_domain = urlparse(job['website'] if '://' in job['website'] else f"https://{job['website']}").netloc
+        competitors.extend(generator.fetch_serp_competitors(keyword_analysis, limit=job['fetch_competitors'],
+                                                            exclude_domains=[own_domain],
+                                                            start_number=len(competitors) + 1))
+        if not competitors:
+            raise ValueError("Nessun competitor scaricato dai risultati organici")
+    competitors, dedup_report = generator.clean_competitor_content(competitors, job['topic'], job['keywords'])
+
+    data = {
+        'brand': job['brand'],
+        'website': job['website'],
+        'topic': job['topic'],
+        'keywords': job['keywords'],
+        'faqs': job['faqs'],
+        'tone_of_voice': job['tone_of_voice'],
+        'competitors': competitors,
+        'dedup_report': dedup_report,
+        'sitemap_urls': sitemap_urls,
+        'manual_urls': job['manual_urls']
+    }
+    return data, keyword_analysis
+
+
+def run_job(job: Dict, generator: ContentBriefGenerator, use_apis: bool,
+            stream_dir: Optional[str] = None, force_regenerate: bool = False) -> Tuple[str, bytes]:
+    """Esegue l'intera pipeline per un job e restituisce (brief, DOCX)"""
+    with trace('brief', job_id=job['id']):
+        data, keyword_analysis = prepare_job(job, generator, use_apis)
+        if stream_dir:
+            content_brief = _generate_to_file(generator, data, keyword_analysis, stream_dir, job['id'], force_regenerate)
+        else:
+            content_brief = generator.generate_content_brief(data, keyword_analysis, force_regenerate=force_regenerate,
+                                                             deduplicate=False)
+        if content_brief == GENERATION_ERROR_MESSAGE:
+            raise RuntimeError("Generazione OpenAI fallita")
+
+        return content_brief, create_docx(content_brief, job['brand'], job['topic']).getvalue()
+
+
+def _run_timed(job: Dict, generator: ContentBriefGenerator, use_apis: bool, stream_dir: Optional[str] = None,
+               force_regenerate: bool = False) -> Tuple[float, Optional[bytes], Optional[str]]:
+    """Esegue un job misurandone la durata effettiva (esclusa l'attesa in coda)"""
+    started = time.monotonic()
+    try:
+        _, docx_bytes = run_job(job, generator, use_apis, stream_dir, force_regenerate)
+        return time.monotonic() - started, docx_bytes, None
+    except Exception as e:
+        return time.monotonic() - started, None, str(e)
+
+
+def run_batch(jobs: List[Dict], output_path: str, generator: ContentBriefGenerator,
+              use_apis: bool, workers: int = 4, stream_dir: Optional[str] = None,
+              force_regenerate: bool = False) -> List[Dict]:
+    """Esegue i job su un pool di worker e scrive uno zip con i DOCX e il manifest"""
+    manifest = []
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_run_timed, job, generator, use_apis, stream_dir, force_regenerate): job
+            for job in jobs
+        }
+
+        # Lo zip viene scritto solo da questo thread, man mano che i job terminano
+        for future in as_completed(futures):
+            job = futures[future]
+            seconds, docx_bytes, error = future.result()
+            entry = {'id': job['id'], 'brand': job['brand'], 'topic': job['topic']}
+            if error is None:
+                filename = docx_filename(job)
+                archive.writestr(filename, docx_bytes)
+                entry.update({'status': 'done', 'file': filename})
+                logger.info("Job %s completato in %.1fs", job['id'], seconds)
+            else:
+                entry.update({'status': 'failed', 'error': error})
+                logger.error("Job %s fallito: %s", job['id'], error)
+            entry['seconds'] = round(seconds, 2)
+            manifest.append(entry)
+
+        order = {job['id']: position for position, job in enumerate(jobs)}
+        manifest.sort(key=lambda item: order[item['id']])
+        archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera content brief in batch da un file CSV/JSONL di job")
+    parser.add_argument('jobs', help="File CSV o JSONL con un job per riga")
+    parser.add_argument('--output', default='content_briefs.zip', help="Zip di output con DOCX e manifest")
+    parser.add_argument('--workers', type=int, default=4, help="Numero di brief generati in parallelo")
+    parser.add_argument('--stream-dir', help="Cartella dove scrivere in streaming il markdown di ogni brief")
+    parser.add_argument('--cassette', help="File cassette per registrare o riprodurre il traffico HTTP")
+    parser.add_argument('--cassette-mode', choices=CASSETTE_MODES, default='once')
+    parser.add_argument('--faults', help="Profilo JSON di latenza/errori da iniettare in riproduzione")
+    parser.add_argument('--force-regenerate', action='store_true',
+                        help="Ignora i brief in cache e richiama sempre OpenAI")
+    parser.add_argument('--openai-key', default=os.environ.get('OPENAI_API_KEY'))
+    parser.add_argument('--semrush-key', default=os.environ.get('SEMRUSH_API_KEY'))
+    parser.add_argument('--serper-key', default=os.environ.get('SERPER_API_KEY'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if not args.openai_key:
+        parser.error("OpenAI API key mancante (--openai-key o OPENAI_API_KEY)")
+
+    session, http_client = None, None
+    if args.cassette:
+        cassette = Cassette(args.cassette, args.cassette_mode, FaultProfile.load(args.faults) if args.faults else None)
+        session = install_cassette(create_session(), cassette)
+        http_client = cassette_http_client(cassette)
+
+    seo_enhancer = SEODataEnhancer(args.semrush_key, args.serper_key, cache=DiskCache(), session=session)
+    generator = ContentBriefGenerator(args.openai_key, seo_enhancer, sitemap_store=SitemapStore(),
+                                      llm_cache=DiskCache(LLM_CACHE_PATH, max_size_bytes=200 * 1024 * 1024),
+                                      http_client=http_client)
+    jobs = load_jobs(args.jobs)
+    manifest = run_batch(jobs, args.output, generator, bool(args.semrush_key or args.serper_key),
+                         args.workers, args.stream_dir, args.force_regenerate)
+
+    failed = sum(1 for entry in manifest if entry['status'] == 'failed')
+    logger.info("%d brief generati, %d falliti -> %s", len(manifest) - failed, failed, args.output)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
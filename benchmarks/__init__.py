@@ -0,0 +1 @@
+"""Benchmark delle funzioni CPU-bound della pipeline (vedi run.py)"""
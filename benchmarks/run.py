@@ -0,0 +1,201 @@
+"""Benchmark delle funzioni CPU-bound della pipeline, con confronto rispetto a una baseline salvata.
+
+Esempi (dalla radice del repository):
+    python -m benchmarks.run                       # tutti i casi, confronto con baseline.json
+    python -m benchmarks.run --filter sitemap      # solo i casi che contengono 'sitemap'
+    python -m benchmarks.run --update-baseline     # salva i risultati come nuova baseline
+    python -m benchmarks.run --check               # exit code 1 se un caso è più lento della tolleranza
+    python benchmarks/run.py                       # equivalente a python -m benchmarks.run
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+if __package__ in (None, ''):
+    # Eseguito come script (python benchmarks/run.py): la radice del repository non è in sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic
+from content_brief import ContentBriefGenerator, SEODataEnhancer, create_docx, process_competitor_content
+from sitemap import parse_sitemap
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+COMPETITOR_WORDS = [1_000, 20_000, 200_000]
+# Prima pagina SERP scaricata per intero: (pagine, parole per pagina)
+SERP_PAGES = [(10, 10_000)]
+KEYWORD_ROWS = [50, 5_000, 100_000]
+SITEMAP_URLS = [100, 5_000, 50_000]
+BRIEF_SECTIONS = [10, 50, 200]
+BRIEF_PAGES = [50]
+# Documenti di un batch (brief tipici di ~5 pagine), come in batch.py con un piano editoriale
+BRIEF_BATCH = [200]
+
+# Ogni caso: (nome, preparazione dei dati non misurata, funzione misurata)
+Case = Tuple[str, Callable[[], tuple], Callable]
+
+
+def _competitors(words: int) -> List[Dict]:
+    # Tre competitor che insieme arrivano al numero di parole indicato
+    return [
+        process_competitor_content(synthetic.competitor_text(words // 3, seed=number), f"https://competitor{number}.it",
+                                   competitor_number=number)
+        for number in range(1, 4)
+    ]
+
+
+def _serp_competitors(pages: int, words: int) -> List[Dict]:
+    return [
+        process_competitor_content(synthetic.competitor_text(words, seed=number), f"https://competitor{number}.it",
+                                   competitor_number=number)
+        for number in range(1, pages + 1)
+    ]
+
+
+def _create_docx_batch(briefs: List[str]) -> int:
+    return sum(len(create_docx(brief, 'Brand', 'Mutuo prima casa').getbuffer()) for brief in briefs)
+
+
+def build_cases() -> List[Case]:
+    generator = ContentBriefGenerator('benchmark')
+    enhancer = SEODataEnhancer()
+    cases: List[Case] = []
+    for words in COMPETITOR_WORDS:
+        cases.append((f"process_competitor_content[{words}w]",
+                      lambda words=words: (synthetic.competitor_text(words), 'https://competitor.it'),
+                      process_competitor_content))
+        cases.append((f"process_competitor_content_html[{words}w]",
+                      lambda words=words: (synthetic.competitor_html(words), 'https://competitor.it'),
+                      process_competitor_content))
+        cases.append((f"clean_competitor_content[{words}w]",
+                      lambda words=words: (_competitors(words),),
+                      generator.clean_competitor_content))
+        cases.append((f"analyze_competitor_content[{words}w]",
+                      lambda words=words: (_competitors(words),),
+                      generator.analyze_competitor_content))
+    for pages, words in SERP_PAGES:
+        cases.append((f"clean_competitor_content[{pages}x{words}w]",
+                      lambda pages=pages, words=words: (_serp_competitors(pages, words),),
+                      generator.clean_competitor_content))
+        cases.append((f"analyze_competitor_content[{pages}x{words}w]",
+                      lambda pages=pages, words=words: (_serp_competitors(pages, words),),
+                      generator.analyze_competitor_content))
+    for rows in KEYWORD_ROWS:
+        cases.append((f"analyze_keyword_intent_patterns[{rows}kw]",
+                      lambda rows=rows: (synthetic.related_keywords(rows),),
+                      enhancer.analyze_keyword_intent_patterns))
+        cases.append((f"extract_topic_clusters[{rows}kw]",
+                      lambda rows=rows: (synthetic.related_keywords(rows),),
+                      enhancer.extract_topic_clusters))
+    for urls in SITEMAP_URLS:
+        cases.append((f"parse_sitemap[{urls}url]",
+                      lambda urls=urls: (synthetic.sitemap_xml(urls),),
+                      parse_sitemap))
+        cases.append((f"parse_sitemap_gzip[{urls}url]",
+                      lambda urls=urls: (synthetic.sitemap_xml(urls, compress=True),),
+                      parse_sitemap))
+    for sections in BRIEF_SECTIONS:
+        cases.append((f"create_docx[{sections}sez]",
+                      lambda sections=sections: (synthetic.brief_markdown(sections), 'Brand', 'Mutuo prima casa'),
+                      create_docx))
+    for pages in BRIEF_PAGES:
+        cases.append((f"create_docx[{pages}pag]",
+                      lambda pages=pages: (synthetic.brief_pages(pages), 'Brand', 'Mutuo prima casa'),
+                      create_docx))
+    for documents in BRIEF_BATCH:
+        cases.append((f"create_docx_batch[{documents}doc]",
+                      lambda documents=documents: ([synthetic.brief_pages(5, seed=seed) for seed in range(documents)],),
+                      _create_docx_batch))
+    return cases
+
+
+def measure(setup: Callable[[], tuple], fn: Callable, repeat: int) -> Dict:
+    """Tempo mediano e minimo su `repeat` esecuzioni più il picco di memoria di un'esecuzione separata"""
+    args = setup()
+    fn(*args)  # riscaldamento: cache di regex, matcher, import pigri
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+
+    # tracemalloc rallenta l'esecuzione: il picco si misura a parte
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_s': round(statistics.median(timings), 6),
+        'min_s': round(min(timings), 6),
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def format_row(name: str, result: Dict, baseline: Optional[Dict], tolerance: float) -> Tuple[str, bool]:
+    """Riga di report; restituisce anche se il caso è una regressione rispetto alla baseline"""
+    row = f"{name:<45} {result['median_s'] * 1000:>10.2f} ms {result['peak_kb']:>12.1f} KB"
+    if not baseline:
+        return row + "   (nessuna baseline)", False
+    time_ratio = result['median_s'] / baseline['median_s'] if baseline['median_s'] else 1.0
+    memory_ratio = result['peak_kb'] / baseline['peak_kb'] if baseline['peak_kb'] else 1.0
+    regression = time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance
+    row += f"   tempo x{time_ratio:.2f}  memoria x{memory_ratio:.2f}"
+    return row + ("   ⚠️ REGRESSIONE" if regression else ""), regression
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark delle funzioni di analisi del content brief")
+    parser.add_argument('--filter', default='', help="Esegue solo i casi il cui nome contiene questo testo")
+    parser.add_argument('--repeat', type=int, default=5, help="Esecuzioni misurate per caso")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="Salva i risultati come nuova baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Peggioramento ammesso (0.25 = +25%%)")
+    parser.add_argument('--check', action='store_true', help="Exit code 1 in caso di regressioni")
+    parser.add_argument('--output', help="Scrive il report anche su file")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    lines = [f"{'caso':<45} {'mediana':>13} {'picco memoria':>15}"]
+    regressions = 0
+    for name, setup, fn in build_cases():
+        if args.filter not in name:
+            continue
+        results[name] = measure(setup, fn, args.repeat)
+        row, regression = format_row(name, results[name], baseline.get(name), args.tolerance)
+        regressions += regression
+        lines.append(row)
+        print(row, flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+        print(f"Baseline aggiornata: {args.baseline}")
+
+    if regressions:
+        print(f"{regressions} casi oltre la tolleranza del {args.tolerance:.0%} rispetto alla baseline")
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Dati sintetici in italiano, deterministici, per i benchmark."""
+import gzip
+import random
+from typing import Dict, List
+
+WORDS = (
+    "mutuo casa tasso interesse fisso variabile banca rata prestito giovani acquisto prima garanzia "
+    "consap notaio perizia immobile surroga rinegoziazione spread euribor durata anni importo reddito "
+    "famiglia contratto documenti requisiti agevolazioni detrazioni fiscali assicurazione polizza "
+    "preammortamento ipoteca valore finanziamento consulente confronto offerta simulazione calcolo "
+    "risparmio costi spese istruttoria estinzione anticipata penale dipendenti pubblici pensionati"
+).split()
+STOPWORDS = "il la di e che per con un una del della nel sono come cosa quando dove perché anche più".split()
+QUESTION_STARTS = ["Come", "Cosa", "Quando", "Dove", "Perché", "Quanto costa", "Qual è"]
+KEYWORD_PREFIXES = ["", "come", "cosa è", "migliori", "prezzo", "confronto", "recensioni", "sito ufficiale",
+                    "guida", "offerta", "quando", "dove"]
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    words = [rng.choice(WORDS) if rng.random() < 0.6 else rng.choice(STOPWORDS) for _ in range(length)]
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + '.'
+
+
+def competitor_text(words: int, seed: int = 1) -> str:
+    """Testo di un competitor con titoli, domande, elenchi e paragrafi, di circa `words` parole"""
+    rng = random.Random(seed)
+    blocks = []
+    count = 0
+    while count < words:
+        kind = rng.random()
+        if kind < 0.08:
+            block = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))).upper()
+        elif kind < 0.16:
+            block = f"{rng.choice(QUESTION_STARTS)} {' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))}?"
+        elif kind < 0.26:
+            block = '\n'.join(f"- {_sentence(rng, rng.randint(5, 12))}" for _ in range(rng.randint(3, 6)))
+        else:
+            block = ' '.join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 6)))
+        blocks.append(block)
+        count += len(block.split())
+    return '\n\n'.join(blocks)
+
+
+def competitor_html(words: int, seed: int = 1) -> str:
+    """Pagina HTML completa di un competitor (menu, script, titoli, paragrafi, elenchi, tabelle, footer)"""
+    rng = random.Random(seed)
+    menu = ''.join(f'<li><a href="/{word}/">{word.capitalize()}</a></li>' for word in rng.sample(WORDS, 12))
+    body = []
+    count = 0
+    while count < words:
+        kind = rng.random()
+        if kind < 0.1:
+            text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))).capitalize()
+            level = rng.choice([2, 2, 3, 4])
+            body.append(f'<h{level} class="title">{text}</h{level}>')
+        elif kind < 0.2:
+            items = [_sentence(rng, rng.randint(5, 12)) for _ in range(rng.randint(3, 6))]
+            text = ' '.join(items)
+            body.append('<ul class="list">' + ''.join(f'<li><span>{item}</span></li>' for item in items) + '</ul>')
+        elif kind < 0.24:
+            cells = [[rng.choice(WORDS), str(rng.randint(10, 5000)), f"{rng.uniform(1, 5):.2f}%"]
+                     for _ in range(rng.randint(3, 8))]
+            text = ' '.join(' '.join(row) for row in cells)
+            body.append('<table><tr><th>Voce</th><th>Importo</th><th>Tasso</th></tr>'
+                        + ''.join('<tr>' + ''.join(f'<td>{cell}</td>' for cell in row) + '</tr>' for row in cells)
+                        + '</table>')
+        else:
+            text = ' '.join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 6)))
+            body.append(f'<div class="text"><p>{text.replace(". ", ". <strong>", 1)}</strong></p></div>')
+        count += len(text.split())
+    return (
+        '<!DOCTYPE html><html lang="it"><head><meta charset="utf-8"><title>Mutuo prima casa | Competitor</title>'
+        '<meta name="description" content="Guida completa al mutuo prima casa">'
+        '<script>window.dataLayer = window.dataLayer || [];</script><style>.title{font-weight:bold}</style></head>'
+        f'<body><header><nav><ul>{menu}</ul></nav></header><main><article><h1>Mutuo prima casa</h1>'
+        + '\n'.join(body)
+        + '</article></main><footer><p>© Competitor S.p.A.</p></footer></body></html>'
+    )
+
+
+def related_keywords(rows: int, seed: int = 2) -> List[Dict]:
+    """Keyword correlate nel formato restituito da SEMrush phrase_related"""
+    rng = random.Random(seed)
+    keywords = []
+    for _ in range(rows):
+        body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        prefix = rng.choice(KEYWORD_PREFIXES)
+        keywords.append({
+            'keyword': f"{prefix} {body}".strip(),
+            'search_volume': rng.choice([10, 20, 50, 90, 140, 320, 880, 1900, 5400]),
+            'cpc': round(rng.uniform(0, 4), 2),
+            'competition': round(rng.random(), 2)
+        })
+    return keywords
+
+
+def sitemap_xml(urls: int, seed: int = 3, compress: bool = False) -> bytes:
+    """Sitemap urlset con `urls` URL e lastmod, opzionalmente gzip"""
+    rng = random.Random(seed)
+    entries = []
+    for number in range(urls):
+        slug = '-'.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))
+        entries.append(
+            f"<url><loc>https://www.esempio.it/{rng.choice(['blog', 'guide', 'mutui'])}/{slug}-{number}/</loc>"
+            f"<lastmod>2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}</lastmod></url>"
+        )
+    content = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        + '\n'.join(entries) + '\n</urlset>\n'
+    ).encode('utf-8')
+    return gzip.compress(content) if compress else content
+
+
+def brief_markdown(sections: int, seed: int = 4) -> str:
+    """Output LLM lungo in markdown: titoli, elenchi puntati e numerati, tabelle, grassetti e paragrafi"""
+    rng = random.Random(seed)
+    lines = ["# Content brief: mutuo prima casa", ""]
+    for number in range(1, sections + 1):
+        lines.append(f"## {number}. {rng.choice(QUESTION_STARTS)} {' '.join(rng.choice(WORDS) for _ in range(4))}")
+        for sub in range(rng.randint(1, 3)):
+            lines.append(f"### {number}.{sub + 1} {' '.join(rng.choice(WORDS) for _ in range(5)).capitalize()}")
+            for _ in range(rng.randint(3, 6)):
+                lines.append(f"- **{rng.choice(WORDS).capitalize()}:** {_sentence(rng, rng.randint(8, 16))}")
+            words = _sentence(rng, rng.randint(20, 40)).split()
+            words[1] = f"*{words[1]}*"
+            lines.append(' '.join(words))
+            lines.append("")
+        if number % 3 == 0:
+            lines += [f"{step}. {_sentence(rng, rng.randint(6, 12))}" for step in range(1, rng.randint(3, 6))]
+            lines.append("")
+        if number % 5 == 0:
+            lines += ["| Keyword | Volume | Intento |", "|---|---:|---|"]
+            lines += [f"| {' '.join(rng.choice(WORDS) for _ in range(3))} | {rng.randint(10, 5000)} | "
+                      f"{rng.choice(['informativo', 'commerciale', 'transazionale'])} |" for _ in range(rng.randint(4, 8))]
+            lines.append("")
+    return '\n'.join(lines)
+
+
+def brief_pages(pages: int, words_per_page: int = 450, seed: int = 4) -> str:
+    """Brief markdown di circa `pages` pagine Word (~450 parole a pagina)"""
+    words_per_section = len(brief_markdown(20, seed).split()) / 20
+    return brief_markdown(max(1, round(pages * words_per_page / words_per_section)), seed)
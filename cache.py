@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.environ.get('CONTENT_BRIEF_CACHE_DIR', '.cache')
+# File separato per le generazioni LLM, così i brief non spingono fuori le risposte API
+LLM_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, 'llm_cache.sqlite')
+
+# TTL in secondi per endpoint: i dati SEMrush cambiano lentamente, la SERP più spesso
+DEFAULT_TTLS = {
+    'semrush_phrase_organic': 7 * 24 * 3600,
+    'semrush_phrase_related': 7 * 24 * 3600,
+    'serper_search': 24 * 3600,
+    # Le generazioni LLM dipendono solo dal prompt: scadono dopo 30 giorni (o prima, se rimosse per spazio)
+    'llm_brief': 30 * 24 * 3600,
+}
+
+
+class DiskCache:
+    """Cache persistente su SQLite con TTL per endpoint ed eviction LRU per dimensione"""
+
+    def __init__(self, path: str = None, max_size_bytes: int = 50 * 1024 * 1024,
+                 default_ttl: int = 24 * 3600, ttls: Dict[str, int] = None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, 'api_cache.sqlite')
+        self.max_size_bytes = max_size_bytes
+        self.default_ttl = default_ttl
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(namespace: str, **parts) -> str:
+        """Costruisce una chiave stabile da endpoint e parametri della richiesta"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Restituisce il valore in cache se presente e non scaduto, altrimenti None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: int = None):
+        """Salva un valore serializzabile in JSON applicando il TTL dell'endpoint"""
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode('utf-8'))
+        if size > self.max_size_bytes:
+            return
+        ttl = ttl if ttl is not None else self.ttls.get(namespace, self.default_ttl)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, serialized, size, now + ttl, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Rimuove le voci scadute e poi le meno usate finché la cache rientra nel limite"""
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        to_delete = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC"):
+            to_delete.append((key,))
+            total -= size
+            if total <= self.max_size_bytes:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+
+    def stats(self) -> Dict:
+        """Restituisce contatori hit/miss e occupazione della cache"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            'hits': sum(self.hits.values()),
+            'misses': sum(self.misses.values()),
+            'hits_by_endpoint': dict(self.hits),
+            'misses_by_endpoint': dict(self.misses),
+            'entries': entries,
+            'size_bytes': size
+        }
+
+    def clear(self):
+        """Svuota completamente la cache"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
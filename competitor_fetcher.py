@@ -0,0 +1,193 @@
+"""Recupero automatico delle pagine dei primi risultati organici (Serper) come competitor.
+
+Le pagine vengono scaricate in parallelo con un pool limitato, al massimo una richiesta alla volta
+per host e un intervallo minimo tra richieste allo stesso host, nel rispetto di robots.txt. Il body
+è letto in streaming fino a un tetto di byte e passato al parser della struttura (contenuto principale).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib import robotparser
+from urllib.parse import urlparse
+
+import requests
+
+from http_client import get_session
+from tracing import bind_context, set_span_attributes, traced
+
+FETCH_USER_AGENT = 'Mozilla/5.0 (compatible; SEO-Tool/1.0; +http://www.example.com/bot)'
+FETCH_HEADERS = {
+    'User-Agent': FETCH_USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,text/plain;q=0.8',
+    'Accept-Language': 'it-IT,it;q=0.9,en;q=0.5'
+}
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+# Oltre questa dimensione il resto della pagina viene ignorato (il contenuto principale sta all'inizio)
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+CHUNK_BYTES = 64 * 1024
+ROBOTS_MAX_BYTES = 256 * 1024
+# Pagine con meno parole utili (paywall, pagine di consenso, errori soft) vengono scartate
+MIN_WORDS = 150
+
+
+class _HostGate:
+    """Limita le richieste contemporanee per host e distanzia quelle successive"""
+
+    def __init__(self, per_host: int, min_interval: float):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+
+    def acquire(self, host: str):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(self.per_host))
+        semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host: str):
+        self._semaphores[host].release()
+
+
+class CompetitorFetcher:
+    """Scarica in parallelo le pagine competitor con cortesia per host, tetto di byte e tempo massimo"""
+
+    def __init__(self, session: Optional[requests.Session] = None, max_workers: int = 5, per_host: int = 1,
+                 min_host_interval: float = 1.0, max_bytes: int = MAX_PAGE_BYTES, timeout: float = 10.0,
+                 deadline: float = 30.0, respect_robots: bool = True):
+        self.session = session or get_session()
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.deadline = deadline
+        self.respect_robots = respect_robots
+        self.errors: List[Dict] = []
+        self._gate = _HostGate(per_host, min_host_interval)
+        self._robots: Dict[str, Optional[robotparser.RobotFileParser]] = {}
+        self._robots_lock = threading.Lock()
+
+    def _read_capped(self, response: requests.Response, limit: int) -> Tuple[bytes, bool]:
+        """Legge il body in streaming fino a `limit` byte; restituisce anche se è stato troncato"""
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(CHUNK_BYTES):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                return b''.join(chunks)[:limit], True
+        return b''.join(chunks), False
+
+    def _robots_for(self, scheme: str, host: str) -> Optional[robotparser.RobotFileParser]:
+        """robots.txt dell'host, letto una volta per fetcher; None (tutto consentito) se assente o non raggiungibile.
+
+        Come in RFC 9309 e in urllib.robotparser, 401/403 e gli errori 5xx vietano l'intero host.
+        """
+        with self._robots_lock:
+            if host in self._robots:
+                return self._robots[host]
+        parser = None
+        try:
+            response = self.session.get(f"{scheme}://{host}/robots.txt", headers=FETCH_HEADERS,
+                                        timeout=self.timeout, stream=True)
+            try:
+                if response.status_code == 200:
+                    body, _ = self._read_capped(response, ROBOTS_MAX_BYTES)
+                    parser = robotparser.RobotFileParser()
+                    parser.parse(body.decode('utf-8', errors='replace').splitlines())
+                elif response.status_code in (401, 403) or response.status_code >= 500:
+                    parser = robotparser.RobotFileParser()
+                    parser.disallow_all = True
+            finally:
+                response.close()
+        except requests.RequestException:
+            parser = None
+        with self._robots_lock:
+            self._robots.setdefault(host, parser)
+        return parser
+
+    @traced('competitor_fetch.page')
+    def fetch_page(self, url: str) -> Dict:
+        """Scarica una pagina: restituisce url finale, body (eventualmente troncato), charset e content type"""
+        parts = urlparse(url)
+        host = parts.netloc.lower()
+        set_span_attributes(url=url)
+        self._gate.acquire(host)
+        try:
+            if self.respect_robots:
+                robots = self._robots_for(parts.scheme, host)
+                if robots is not None and not robots.can_fetch(FETCH_USER_AGENT, url):
+                    set_span_attributes(result='robots_disallowed')
+                    raise PermissionError("Pagina esclusa da robots.txt")
+
+            response = self.session.get(url, headers=FETCH_HEADERS, timeout=self.timeout, stream=True)
+            try:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type and content_type not in HTML_CONTENT_TYPES:
+                    raise ValueError(f"Contenuto non HTML ({content_type})")
+                body, truncated = self._read_capped(response, self.max_bytes)
+            finally:
+                response.close()
+        finally:
+            self._gate.release(host)
+
+        set_span_attributes(result='fetched', http_status=response.status_code, bytes=len(body), truncated=truncated)
+        # Il charset dell'header vale solo se dichiarato: altrimenti decide il meta charset della pagina
+        declared = 'charset=' in response.headers.get('Content-Type', '').lower()
+        return {
+            'url': response.url or url,
+            'content': body,
+            'encoding': response.encoding if declared else None,
+            'content_type': content_type,
+            'truncated': truncated
+        }
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, Dict]:
+        """Scarica le URL in parallelo entro il tempo massimo; gli errori finiscono in self.errors"""
+        self.errors = []
+        urls = list(dict.fromkeys(urls))
+        pages: Dict[str, Dict] = {}
+        if not urls:
+            return pages
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {executor.submit(bind_context(self.fetch_page), url): url for url in urls}
+        try:
+            done, not_done = wait(futures, timeout=self.deadline)
+            for future in done:
+                url = futures[future]
+                try:
+                    pages[url] = future.result()
+                except Exception as e:
+                    self.errors.append({'url': url, 'error': str(e)})
+            for future in not_done:
+                future.cancel()
+                self.errors.append({'url': futures[future], 'error': f'Tempo massimo di {self.deadline}s superato'})
+        finally:
+            executor.shutdown(wait=False)
+        return pages
+
+
+def select_organic_urls(organic_results: List[Dict], limit: int, exclude_domains: Iterable[str] = ()) -> List[Dict]:
+    """Primi `limit` risultati organici scaricabili, escludendo i domini indicati (es. il sito del brand)"""
+    excluded = {domain.lower().removeprefix('www.') for domain in exclude_domains if domain}
+    selected = []
+    for result in organic_results:
+        parts = urlparse(result.get('link', ''))
+        domain = parts.netloc.lower().removeprefix('www.')
+        if parts.scheme not in ('http', 'https') or not domain or domain in excluded:
+            continue
+        if parts.path.lower().endswith(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip')):
+            continue
+        selected.append(result)
+        if len(selected) >= limit:
+            break
+    return selected
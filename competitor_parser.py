@@ -0,0 +1,281 @@
+"""Struttura dei contenuti competitor: titoli H1-H6, paragrafi, elenchi e tabelle.
+
+L'HTML (incollato o caricato) viene letto con lxml in un solo passaggio sull'albero; il testo
+semplice con un'unica espressione regolare compilata, riga per riga, nello stesso passaggio.
+"""
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from lxml import etree
+
+# Sottoalberi senza contenuto editoriale: rimossi prima della visita
+SKIPPED_TAGS = ('head', 'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'footer', 'aside')
+# I <form> si rimuovono solo senza titoli né paragrafi: le pagine ASP.NET WebForms racchiudono tutto il body in un form
+FORM_CONTENT_XPATH = etree.XPath('boolean(.//h1 | .//h2 | .//h3 | .//h4 | .//h5 | .//h6 | .//p | .//article | .//main)')
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+# Ruolo dei tag nella visita; i tag assenti (span, a, strong...) sono inline e non spezzano il testo
+BLOCK, HEADING, ITEM, CELL, LIST, TABLE, ROW, BREAK = range(8)
+TAG_ROLES = {
+    **{tag: BLOCK for tag in ('p', 'div', 'section', 'article', 'main', 'header', 'blockquote', 'pre', 'figure',
+                              'figcaption', 'address', 'dl', 'dt', 'dd', 'details', 'summary', 'center', 'hr',
+                              'caption', 'body')},
+    **{tag: HEADING for tag in HEADING_TAGS},
+    'li': ITEM, 'td': CELL, 'th': CELL, 'ul': LIST, 'ol': LIST, 'table': TABLE, 'tr': ROW, 'br': BREAK
+}
+
+# Quota minima del testo della pagina che <main>/<article> deve contenere per sostituire il body
+MAIN_CONTENT_MIN_SHARE = 0.3
+
+HTML_SNIFF_PATTERN = re.compile(
+    rb'<(?:!doctype\s+html|html|head|body|h[1-6]|p|div|article|section|ul|ol|li|table)[\s>/]', re.IGNORECASE
+)
+# Una riga di testo semplice: titolo markdown, voce puntata, voce numerata o testo.
+# Quantificatori greedy: con quelli lazy il motore riprova la fine riga a ogni carattere (10 volte più lento)
+LINE_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'(?P<hashes>#{1,6})[ \t]+(?P<heading>[^\n]*)'
+    r'|[-•*+▪◦·–][ \t]+(?P<bullet>[^\n]*)'
+    r'|\d{1,3}[.)][ \t]+(?P<numbered>[^\n]*)'
+    r'|(?P<line>[^\n]*)'
+    r')$',
+    re.MULTILINE
+)
+CLOSING_HASHES_PATTERN = re.compile(r'(?:^|[ \t]+)#+[ \t]*$')
+
+
+def looks_like_html(content: Union[str, bytes]) -> bool:
+    """True se l'inizio del contenuto contiene tag HTML strutturali"""
+    head = content[:4096]
+    if isinstance(head, str):
+        head = head.encode('utf-8', errors='ignore')
+    return bool(HTML_SNIFF_PATTERN.search(head))
+
+
+def _empty_structure(content_format: str) -> Dict:
+    return {
+        'format': content_format,
+        'title': '',
+        'meta_description': '',
+        'headings': [],
+        'paragraphs': [],
+        'lists': [],
+        'tables': [],
+        'text': ''
+    }
+
+
+def _main_content(root):
+    """Elemento <main>, <article> o role=main con più testo, se contiene buona parte del testo della pagina"""
+    candidates = root.xpath('//main | //article | //*[@role="main"]')
+    if not candidates:
+        return root
+    # string-length senza normalize-space: gli spazi pesano poco sulla proporzione e si evita una copia del testo
+    lengths = [element.xpath('string-length(string(.))') for element in candidates]
+    best_length = max(lengths)
+    if best_length < MAIN_CONTENT_MIN_SHARE * root.xpath('string-length(string(.))'):
+        return root
+    return candidates[lengths.index(best_length)]
+
+
+def parse_html(content: Union[str, bytes], encoding: Optional[str] = None, main_content: bool = True) -> Dict:
+    """Titoli, paragrafi, elenchi e tabelle di una pagina HTML con una sola visita dell'albero lxml.
+
+    Con `main_content` la visita si limita al contenuto principale (<main>/<article>) quando lo si
+    riconosce; `encoding` è il charset dichiarato dall'header HTTP, se noto.
+    """
+    if isinstance(content, str):
+        # lxml rifiuta le stringhe con dichiarazione di encoding: si passa dai byte
+        content = content.encode('utf-8')
+        encoding = 'utf-8'
+    structure = _empty_structure('html')
+    try:
+        root = etree.fromstring(content, etree.HTMLParser(remove_comments=True, remove_pis=True,
+                                                          encoding=encoding))
+    except (etree.ParserError, ValueError):
+        root = None
+    if root is None:
+        return structure
+
+    title = root.find('.//title')
+    if title is not None:
+        structure['title'] = ' '.join(''.join(title.itertext()).split())
+    for meta in root.iter('meta'):
+        if (meta.get('name') or '').lower() == 'description':
+            structure['meta_description'] = ' '.join((meta.get('content') or '').split())
+            break
+    for form in root.iter('form'):
+        if not FORM_CONTENT_XPATH(form):
+            form.tag = 'skipped-form'
+    etree.strip_elements(root, *SKIPPED_TAGS, 'skipped-form', with_tail=False)
+    walk_root = _main_content(root) if main_content else root
+
+    headings, paragraphs, lists, tables = (structure[key] for key in ('headings', 'paragraphs', 'lists', 'tables'))
+    # Voci ed elenchi occupano il loro posto all'apertura, così gli elenchi annidati restano in ordine
+    blocks: List[Optional[str]] = []
+    parts: List[str] = []
+    # Contenitori aperti (titolo, voce, cella): [ruolo, testi, posizione della voce]
+    containers: List[list] = []
+    open_lists: List[List[Optional[str]]] = []
+    open_rows: List[List[str]] = []
+    open_tables: List[List[List[str]]] = []
+
+    def cut():
+        # Il testo accumulato finisce nel contenitore aperto o, se non ce ne sono, in un paragrafo
+        text = ' '.join(''.join(parts).split())
+        parts.clear()
+        if text:
+            if containers:
+                containers[-1][1].append(text)
+            else:
+                paragraphs.append(text)
+                blocks.append(text)
+
+    for event, element in etree.iterwalk(walk_root, events=('start', 'end')):
+        role = TAG_ROLES.get(element.tag)
+        if event == 'start':
+            if role == BREAK:
+                parts.append(' ')
+            elif role is not None:
+                if parts:
+                    cut()
+                if role == ITEM:
+                    position = None
+                    if open_lists:
+                        position = (len(open_lists[-1]), len(blocks))
+                        open_lists[-1].append(None)
+                        blocks.append(None)
+                    containers.append([ITEM, [], position])
+                elif role == HEADING or role == CELL:
+                    containers.append([role, [], None])
+                elif role == LIST:
+                    open_lists.append([])
+                    lists.append(open_lists[-1])
+                elif role == TABLE:
+                    open_tables.append([])
+                    tables.append(open_tables[-1])
+                elif role == ROW:
+                    open_rows.append([])
+            if element.text:
+                parts.append(element.text)
+            continue
+
+        if role is not None and role != BREAK:
+            if parts:
+                cut()
+            if (role == HEADING or role == ITEM or role == CELL) and containers:
+                _, texts, position = containers.pop()
+                text = ' '.join(texts)
+                if text:
+                    if role == HEADING:
+                        headings.append((HEADING_TAGS[element.tag], text))
+                        blocks.append(text)
+                    elif role == CELL and open_rows:
+                        open_rows[-1].append(text)
+                    elif position is not None:
+                        open_lists[-1][position[0]] = text
+                        blocks[position[1]] = f"- {text}"
+                    else:
+                        paragraphs.append(text)
+                        blocks.append(text)
+            elif role == LIST and open_lists:
+                open_lists.pop()
+            elif role == ROW and open_rows:
+                row = open_rows.pop()
+                if row and open_tables:
+                    open_tables[-1].append(row)
+                    blocks.append(' | '.join(row))
+            elif role == TABLE and open_tables:
+                open_tables.pop()
+        if element.tail:
+            parts.append(element.tail)
+    if parts:
+        cut()
+
+    if walk_root is not root and not any(level == 1 for level, _ in headings):
+        # L'H1 sta spesso nell'intestazione della pagina, fuori da <article>
+        h1 = root.find('.//h1')
+        text = ' '.join(''.join(h1.itertext()).split()) if h1 is not None else ''
+        if text:
+            headings.insert(0, (1, text))
+            blocks.insert(0, text)
+
+    structure['lists'] = [items for items in ([item for item in items if item] for items in lists) if items]
+    structure['tables'] = [rows for rows in tables if rows]
+    structure['text'] = '\n'.join(block for block in blocks if block)
+    return structure
+
+
+def _guessed_heading_level(line: str) -> Optional[int]:
+    # Euristiche per il testo copiato dal browser: righe in maiuscolo, domande, righe brevi che terminano con ':'
+    if len(line) <= 10:
+        return None
+    if line.isupper() or (len(line) < 100 and line.endswith('?')):
+        return 2
+    if len(line) < 100 and line.endswith(':'):
+        return 3
+    return None
+
+
+def parse_text(content: str) -> Dict:
+    """Titoli (markdown o stimati), paragrafi ed elenchi da testo semplice in un solo passaggio regex"""
+    structure = _empty_structure('text')
+    headings, paragraphs, lists = structure['headings'], structure['paragraphs'], structure['lists']
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    paragraph: List[str] = []
+    current_list: Optional[Tuple[str, List[str]]] = None
+
+    def close_paragraph():
+        if paragraph:
+            paragraphs.append(' '.join(paragraph))
+            paragraph.clear()
+
+    for match in LINE_PATTERN.finditer(content):
+        # lastgroup è il gruppo dell'alternativa riconosciuta: heading, bullet, numbered o line
+        kind = match.lastgroup
+        text = match.group(kind).rstrip()
+        if kind == 'line':
+            if not text:
+                # Riga vuota: chiude il paragrafo, ma non l'elenco (voci separate da righe vuote)
+                close_paragraph()
+                continue
+            level = _guessed_heading_level(text)
+            if level is None:
+                current_list = None
+                paragraph.append(text)
+                continue
+        close_paragraph()
+        if kind == 'heading' or kind == 'line':
+            current_list = None
+            if kind == 'heading':
+                text = CLOSING_HASHES_PATTERN.sub('', text)
+            if text:
+                headings.append((len(match.group('hashes')) if kind == 'heading' else level, text))
+        else:
+            if current_list is None or current_list[0] != kind:
+                current_list = (kind, [])
+                lists.append(current_list[1])
+            current_list[1].append(text)
+    close_paragraph()
+
+    structure['text'] = content
+    return structure
+
+
+def parse_competitor_content(content: Union[str, bytes], encoding: Optional[str] = None) -> Dict:
+    """Struttura del contenuto di un competitor, scegliendo il parser HTML o quello per testo semplice"""
+    if looks_like_html(content):
+        structure = parse_html(content, encoding)
+        if structure['text']:
+            return structure
+        if isinstance(content, bytes):
+            # HTML senza testo estraibile: si analizza il testo grezzo
+            content = content.decode(encoding or 'utf-8', errors='replace')
+    elif isinstance(content, bytes):
+        content = content.decode(encoding or 'utf-8', errors='replace')
+    return parse_text(content)
+
+
+def format_headings(headings: List[Tuple[int, str]], limit: Optional[int] = None) -> str:
+    """Titoli nel formato 'H2: testo', uno per riga"""
+    return '\n'.join(f"H{level}: {text}" for level, text in headings[:limit])
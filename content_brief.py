@@ -0,0 +1,1036 @@
+import logging
+import openai
+import requests
+from urllib.parse import urlparse
+import io
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Callable, Iterator, List, Dict, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from cache import DiskCache
+from competitor_fetcher import MIN_WORDS as FETCH_MIN_WORDS, CompetitorFetcher, select_organic_urls
+from competitor_parser import format_headings, parse_competitor_content
+from content_dedup import deduplicate_competitors
+from docx_renderer import render_docx
+from http_client import get_session
+from sitemap import SitemapCrawler, SitemapStore
+from link_ranker import LinkIndex, rank_internal_links
+from intent_matcher import get_matcher
+from prompt_budget import PromptSection, estimate_tokens, fit_sections, log_budget_report
+from tracing import bind_context, set_span_attributes, traced
+from text_analysis import (DEFAULT_TOPIC_TRIGGERS, find_content_gaps, find_trigger_context_words, rank_topics,
+                           tokenize_words)
+
+logger = logging.getLogger(__name__)
+
+# Timeout (secondi) per singola chiamata nell'analisi keyword concorrente
+DEFAULT_API_CALL_TIMEOUTS = {
+    'semrush_organic': 15,
+    'semrush_related': 15,
+    'serper': 15
+}
+
+# Numero massimo di URL interne pertinenti passate al prompt
+INTERNAL_LINKS_LIMIT = 30
+
+# Budget di token del prompt (system + utente) e tetto per il contenuto di ogni competitor
+PROMPT_TOKEN_BUDGET = 12000
+COMPETITOR_CONTENT_MAX_TOKENS = 1500
+# Titoli (H1-H6) di ogni competitor riportati nella struttura passata al prompt
+COMPETITOR_HEADINGS_LIMIT = 30
+# Topic di consenso e distintivi (n-grammi TF-IDF) calcolati sui competitor
+COMPETITOR_TOPICS_LIMIT = 15
+
+# Testo restituito da generate_content_brief quando la chiamata OpenAI fallisce
+GENERATION_ERROR_MESSAGE = "Errore nella generazione del contenuto."
+
+BRIEF_MODEL = "gpt-4o"
+BRIEF_MAX_TOKENS = 4000
+BRIEF_TEMPERATURE = 0.3
+BRIEF_SYSTEM_PROMPT = "Sei un esperto SEO data analyst e content strategist che crea content brief estremamente dettagliati e actionable utilizzando dati reali di SEMrush, Serper e analisi competitor avanzate per garantire posizionamenti top su Google."
+
+class BriefGenerationError(Exception):
+    """Errore durante la generazione in streaming; conserva il testo già ricevuto"""
+    
+    def __init__(self, message: str, partial_text: str = ''):
+        super().__init__(message)
+        self.partial_text = partial_text
+
+def _get_script_run_ctx():
+    """Recupera il contesto di esecuzione Streamlit del thread corrente, se Streamlit è in uso"""
+    if 'streamlit' not in sys.modules:
+        return None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx()
+    except ImportError:
+        return None
+
+def _attach_script_run_ctx(ctx):
+    """Propaga il contesto Streamlit ai thread worker così che st.warning funzioni"""
+    if ctx is None:
+        return
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+    add_script_run_ctx(threading.current_thread(), ctx)
+
+class SEODataEnhancer:
+    def __init__(self, semrush_api_key: str = None, serper_api_key: str = None, cache: Optional[DiskCache] = None,
+                 session: Optional[requests.Session] = None, language: str = 'it',
+                 on_warning: Optional[Callable[[str], None]] = None):
+        self.semrush_api_key = semrush_api_key
+        self.serper_api_key = serper_api_key
+        self.cache = cache
+        self.session = session or get_session()
+        self.language = language
+        self.on_warning = on_warning or logger.warning
+    
+    def _cache_get(self, namespace: str, **parts):
+        """Legge una risposta API dalla cache, se configurata"""
+        if not self.cache:
+            return None, None
+        key = DiskCache.make_key(namespace, **parts)
+        return key, self.cache.get(namespace, key)
+    
+    def _cache_set(self, namespace: str, key: Optional[str], value):
+        """Salva una risposta API nella cache, se configurata"""
+        if self.cache and key:
+            self.cache.set(namespace, key, value)
+        
+    @traced('semrush.phrase_organic')
+    def get_semrush_keyword_data(self, keyword: str, country: str = "IT") -> Dict:
+        """Ottiene dati dalle API di SEMrush per una keyword"""
+        if not self.semrush_api_key:
+            return {'status': 'error', 'message': 'SEMrush API key non configurata'}
+        
+        cache_key, cached = self._cache_get('semrush_phrase_organic', phrase=keyword.lower(), database=country.lower())
+        set_span_attributes(cache='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+        
+        try:
+            url = "https://api.semrush.com/"
+            params = {
+                'type': 'phrase_organic',
+                'key': self.semrush_api_key,
+                'phrase': keyword,
+                'database': country.lower(),
+                'export_columns': 'Ph,Nq,Cp,Co,Nr,Td'
+            }
+            
+            response = self.session.get(url, params=params, timeout=10)
+            set_span_attributes(http_status=response.status_code, bytes=len(response.content))
+            response.raise_for_status()
+            
+            lines = response.text.strip().split('\n')
+            if len(lines) > 1:
+                data = lines[1].split(';')
+                result = {
+                    'status': 'success',
+                    'keyword': data[0] if len(data) > 0 else keyword,
+                    'search_volume': int(data[1]) if len(data) > 1 and data[1].isdigit() else 0,
+                    'cpc': float(data[2]) if len(data) > 2 and data[2].replace('.', '').isdigit() else 0,
+                    'competition': float(data[3]) if len(data) > 3 and data[3].replace('.', '').isdigit() else 0,
+                    'results_count': int(data[4]) if len(data) > 4 and data[4].isdigit() else 0,
+                    'trend': data[5] if len(data) > 5 else ''
+                }
+            else:
+                result = {'status': 'no_data', 'keyword': keyword}
+            
+            self._cache_set('semrush_phrase_organic', cache_key, result)
+            return result
+                
+        except Exception as e:
+            return {'status': 'error', 'keyword': keyword, 'error': str(e)}
+    
+    @traced('semrush.phrase_related')
+    def get_semrush_related_keywords(self, keyword: str, country: str = "IT", limit: int = 50) -> List[Dict]:
+        """Ottiene keyword correlate da SEMrush"""
+        if not self.semrush_api_key:
+            return []
+        
+        cache_key, cached = self._cache_get('semrush_phrase_related', phrase=keyword.lower(), database=country.lower(), limit=limit)
+        set_span_attributes(cache='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+        
+        try:
+            url = "https://api.semrush.com/"
+            params = {
+                'type': 'phrase_related',
+                'key': self.semrush_api_key,
+                'phrase': keyword,
+                'database': country.lower(),
+                'export_columns': 'Ph,Nq,Cp,Co',
+                'display_limit': limit
+            }
+            
+            response = self.session.get(url, params=params, timeout=10)
+            set_span_attributes(http_status=response.status_code, bytes=len(response.content))
+            response.raise_for_status()
+            
+            lines = response.text.strip().split('\n')
+            related_keywords = []
+            
+            for line in lines[1:]:
+                data = line.split(';')
+                if len(data) >= 4:
+                    related_keywords.append({
+                        'keyword': data[0],
+                        'search_volume': int(data[1]) if data[1].isdigit() else 0,
+                        'cpc': float(data[2]) if data[2].replace('.', '').isdigit() else 0,
+                        'competition': float(data[3]) if data[3].replace('.', '').isdigit() else 0
+                    })
+            
+            self._cache_set('semrush_phrase_related', cache_key, related_keywords)
+            return related_keywords
+            
+        except Exception as e:
+            self.on_warning(f"Errore nell'ottenimento keyword correlate SEMrush: {str(e)}")
+            return []
+    
+    def analyze_keyword_intent_patterns(self, related_keywords: List[Dict]) -> Dict:
+        """Analizza i pattern di intento nelle keyword correlate"""
+        intent_categories = {
+            'informational': [],
+            'navigational': [],
+            'transactional': [],
+            'commercial': []
+        }
+        
+        matcher = get_matcher('keyword_intent', self.language)
+        
+        for kw_data in related_keywords:
+            intent = matcher.classify(kw_data['keyword'])
+            
+            if intent:
+                intent_categories[intent].append(kw_data)
+            else:
+                if kw_data['cpc'] > 1.0 and kw_data['competition'] > 0.5:
+                    intent_categories['transactional'].append(kw_data)
+                elif kw_data['competition'] > 0.3:
+                    intent_categories['commercial'].append(kw_data)
+                else:
+                    intent_categories['informational'].append(kw_data)
+        
+        return intent_categories
+    
+    def extract_topic_clusters(self, related_keywords: List[Dict]) -> Dict:
+        """Estrae cluster tematici dalle keyword correlate"""
+        clusters = {}
+        
+        for kw_data in related_keywords:
+            keyword = kw_data['keyword'].lower()
+            words = keyword.split()
+            
+            for word in words:
+                if len(word) > 3 and word not in ['come', 'cosa', 'quando', 'dove', 'perché', 'migliore', 'migliori']:
+                    if word not in clusters:
+                        clusters[word] = []
+                    clusters[word].append(kw_data)
+        
+        filtered_clusters = {k: v for k, v in clusters.items() if len(v) >= 2}
+        
+        for cluster_name, keywords in filtered_clusters.items():
+            total_volume = sum(kw['search_volume'] for kw in keywords)
+            filtered_clusters[cluster_name] = {
+                'keywords': keywords,
+                'total_volume': total_volume,
+                'avg_competition': sum(kw['competition'] for kw in keywords) / len(keywords)
+            }
+        
+        return filtered_clusters
+    
+    @traced('serper.search')
+    def get_serper_search_data(self, query: str, country: str = "it") -> Dict:
+        """Ottiene dati SERP da Serper API con analisi avanzata"""
+        if not self.serper_api_key:
+            return {'status': 'error', 'message': 'Serper API key non configurata'}
+        
+        cache_key, cached = self._cache_get('serper_search', q=query.lower(), gl=country.lower(), hl='it', num=10)
+        set_span_attributes(cache='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+        
+        try:
+            url = "https://google.serper.dev/search"
+            payload = {
+                'q': query,
+                'gl': country,
+                'hl': 'it',
+                'num': 10
+            }
+            headers = {
+                'X-API-KEY': self.serper_api_key,
+                'Content-Type': 'application/json'
+            }
+            
+            response = self.session.post(url, json=payload, headers=headers, timeout=10)
+            set_span_attributes(http_status=response.status_code, bytes=len(response.content))
+            response.raise_for_status()
+            
+            data = response.json()
+            
+            people_also_ask = []
+            paa_intents = {'informational': [], 'commercial': [], 'transactional': []}
+            
+            if 'peopleAlsoAsk' in data:
+                paa_matcher = get_matcher('paa_intent', self.language)
+                for paa in data['peopleAlsoAsk']:
+                    question = paa.get('question', '')
+                    people_also_ask.append(question)
+                    
+                    paa_intents[paa_matcher.classify(question, default='informational')].append(question)
+            
+            related_searches = []
+            if 'relatedSearches' in data:
+                for rs in data['relatedSearches']:
+                    related_searches.append(rs.get('query', ''))
+            
+            featured_snippet = None
+            snippet_analysis = {}
+            if 'answerBox' in data:
+                snippet_text = data['answerBox'].get('snippet', '')
+                featured_snippet = {
+                    'snippet': snippet_text,
+                    'title': data['answerBox'].get('title', ''),
+                    'link': data['answerBox'].get('link', '')
+                }
+                
+                snippet_analysis = {
+                    'word_count': len(snippet_text.split()),
+                    'has_list': '•' in snippet_text or '-' in snippet_text or any(char.isdigit() and '.' in snippet_text for char in snippet_text),
+                    'has_numbers': any(char.isdigit() for char in snippet_text),
+                    'structure_type': 'list' if ('•' in snippet_text or '-' in snippet_text) else 'paragraph',
+                    'starts_with_definition': snippet_text.lower().startswith(('è', 'sono', 'il', 'la', 'lo', 'una', 'un'))
+                }
+            
+            organic_results = []
+            domain_analysis = {}
+            
+            if 'organic' in data:
+                for result in data['organic'][:10]:
+                    domain = urlparse(result.get('link', '')).netloc
+                    
+                    organic_results.append({
+                        'position': result.get('position', 0),
+                        'title': result.get('title', ''),
+                        'link': result.get('link', ''),
+                        'snippet': result.get('snippet', ''),
+                        'domain': domain
+                    })
+                    
+                    if domain:
+                        domain_analysis[domain] = domain_analysis.get(domain, 0) + 1
+            
+            result = {
+                'status': 'success',
+                'query': query,
+                'people_also_ask': people_also_ask,
+                'paa_intents': paa_intents,
+                'related_searches': related_searches,
+                'featured_snippet': featured_snippet,
+                'snippet_analysis': snippet_analysis,
+                'organic_results': organic_results,
+                'domain_analysis': domain_analysis,
+                'total_results': data.get('searchInformation', {}).get('totalResults', 0)
+            }
+            
+            self._cache_set('serper_search', cache_key, result)
+            return result
+            
+        except Exception as e:
+            return {'status': 'error', 'query': query, 'error': str(e)}
+
+class ContentBriefGenerator:
+    def __init__(self, api_key: str, seo_enhancer: SEODataEnhancer = None, session: Optional[requests.Session] = None,
+                 sitemap_store: Optional[SitemapStore] = None, on_warning: Optional[Callable[[str], None]] = None,
+                 on_error: Optional[Callable[[str], None]] = None, llm_cache: Optional[DiskCache] = None,
+                 http_client=None):
+        # http_client permette di sostituire il trasporto OpenAI (es. cassette di registrazione/riproduzione)
+        self.client = openai.OpenAI(api_key=api_key, http_client=http_client) if http_client else openai.OpenAI(api_key=api_key)
+        self.on_warning = on_warning or logger.warning
+        self.on_error = on_error or logger.error
+        self.seo_enhancer = seo_enhancer or SEODataEnhancer(session=session, on_warning=self.on_warning)
+        self.session = session or self.seo_enhancer.session
+        self.sitemap_store = sitemap_store
+        self.llm_cache = llm_cache
+        self._link_index = None
+        self.topic_triggers = DEFAULT_TOPIC_TRIGGERS
+        self.topic_context_window = 3
+        self.topic_limit = COMPETITOR_TOPICS_LIMIT
+        self.prompt_token_budget = PROMPT_TOKEN_BUDGET
+        self.competitor_content_max_tokens = COMPETITOR_CONTENT_MAX_TOKENS
+    
+    @traced('competitor_analysis')
+    def analyze_competitor_content(self, competitors: List[Dict]) -> Dict:
+        """Analizza in profondità il contenuto dei competitor (quanti se ne vuole, es. tutta la prima pagina SERP)"""
+        analysis = {
+            'common_topics': {},
+            'content_gaps': [],
+            'consensus_topics': [],
+            'distinctive_topics': [],
+            'structural_patterns': {},
+            'content_depth_analysis': {}
+        }
+        
+        heading_matcher = get_matcher('heading_pattern', self.seo_enhancer.language)
+        
+        for comp in competitors:
+            content = comp['content'].lower()
+            topic_keywords = find_trigger_context_words(
+                content.split(), triggers=self.topic_triggers, window=self.topic_context_window, min_length=5
+            )
+            
+            for topic in topic_keywords:
+                if topic not in analysis['common_topics']:
+                    analysis['common_topics'][topic] = 0
+                analysis['common_topics'][topic] += 1
+            
+            headings = comp.get('headings', '').split('\n')
+            heading_patterns = []
+            for heading in headings:
+                if heading.strip():
+                    h_text = heading.split(':', 1)[1].strip() if ':' in heading else heading
+                    
+                    pattern = heading_matcher.classify(h_text)
+                    if pattern:
+                        heading_patterns.append(pattern)
+            
+            for pattern in heading_patterns:
+                if pattern not in analysis['structural_patterns']:
+                    analysis['structural_patterns'][pattern] = 0
+                analysis['structural_patterns'][pattern] += 1
+            
+            paragraphs = comp.get('paragraphs', [])
+            analysis['content_depth_analysis'][f"competitor_{comp['competitor_number']}"] = {
+                'total_paragraphs': len(paragraphs),
+                'avg_paragraph_length': sum(len(p.split()) for p in paragraphs) / len(paragraphs) if paragraphs else 0,
+                'word_count': comp['word_count'],
+                'has_lists': bool(comp.get('lists')) or 'lista' in content or 'elenco' in content or '•' in comp['content'],
+                'has_tables': bool(comp.get('tables')),
+                'has_examples': 'esempio' in content or 'ad esempio' in content,
+                'technical_depth': content.count('tecnic') + content.count('specific') + content.count('dettagli')
+            }
+        
+        competitor_tokens = [Counter(tokenize_words(comp['content'])) for comp in competitors]
+        analysis['content_gaps'] = find_content_gaps(competitor_tokens, min_length=7, limit=10)
+        
+        # Unigrammi, bigrammi e trigrammi pesati TF-IDF su tutti i competitor in un'unica matrice sparsa
+        topics = rank_topics([comp['content'] for comp in competitors], limit=self.topic_limit)
+        numbers = [comp['competitor_number'] for comp in competitors]
+        for kind in ('consensus', 'distinctive'):
+            for topic in topics[kind]:
+                topic['competitors'] = [numbers[index] for index in topic.pop('documents')]
+            analysis[f'{kind}_topics'] = topics[kind]
+        set_span_attributes(competitors=len(competitors), consensus_topics=len(topics['consensus']),
+                            distinctive_topics=len(topics['distinctive']))
+        
+        return analysis
+    
+    @traced('competitor_dedup')
+    def clean_competitor_content(self, competitors: List[Dict], topic: str = '',
+                                 keywords: str = '') -> Tuple[List[Dict], Dict]:
+        """Rimuove boilerplate e paragrafi ripetuti dai competitor; restituisce anche il report dei token risparmiati"""
+        cleaned, report = deduplicate_competitors(competitors, self.seo_enhancer.language,
+                                                  topic_terms=[topic, *keywords.split(',')])
+        set_span_attributes(**report)
+        logger.info("Pulizia competitor: %d paragrafi di boilerplate, %d ripetuti, circa %d token risparmiati",
+                    report['boilerplate'], report['duplicate'] + report['cross_duplicate'], report['tokens_saved'])
+        return cleaned, report
+    
+    def extract_search_intent_insights(self, keyword_analysis: Dict) -> Dict:
+        """Estrae insight avanzati sull'intento di ricerca"""
+        insights = {
+            'primary_intent': 'informational',
+            'intent_distribution': {},
+            'content_suggestions': {},
+            'user_journey_stage': 'awareness',
+            'competition_level': 'medium'
+        }
+        
+        if keyword_analysis.get('semrush_data', {}).get('status') == 'success':
+            semrush = keyword_analysis['semrush_data']
+            
+            cpc = semrush.get('cpc', 0)
+            competition = semrush.get('competition', 0)
+            
+            if cpc > 2.0 and competition > 0.7:
+                insights['primary_intent'] = 'transactional'
+                insights['user_journey_stage'] = 'decision'
+            elif cpc > 1.0 and competition > 0.4:
+                insights['primary_intent'] = 'commercial'
+                insights['user_journey_stage'] = 'consideration'
+            else:
+                insights['primary_intent'] = 'informational'
+                insights['user_journey_stage'] = 'awareness'
+            
+            if competition > 0.8:
+                insights['competition_level'] = 'high'
+            elif competition > 0.4:
+                insights['competition_level'] = 'medium'
+            else:
+                insights['competition_level'] = 'low'
+        
+        if keyword_analysis.get('related_keywords'):
+            intent_patterns = keyword_analysis.get('intent_categories', {})
+            total_keywords = len(keyword_analysis['related_keywords'])
+            
+            if total_keywords > 0:
+                for intent, keywords in intent_patterns.items():
+                    insights['intent_distribution'][intent] = len(keywords) / total_keywords
+        
+        if keyword_analysis.get('serper_data', {}).get('paa_intents'):
+            paa_intents = keyword_analysis['serper_data']['paa_intents']
+            
+            insights['content_suggestions'] = {
+                'faq_section_needed': len(paa_intents.get('informational', [])) > 2,
+                'comparison_section_needed': len(paa_intents.get('commercial', [])) > 1,
+                'pricing_section_needed': len(paa_intents.get('transactional', [])) > 1,
+                'how_to_section_needed': any('come' in q.lower() for q in keyword_analysis['serper_data'].get('people_also_ask', []))
+            }
+        
+        return insights
+    
+    @traced('sitemap')
+    def get_sitemap_urls(self, sitemap_url: str, max_urls: int = 5000, max_workers: int = 8, deadline: float = 30.0) -> List[str]:
+        """Estrae le URL dalla sitemap"""
+        crawler = SitemapCrawler(self.session, max_workers=max_workers, max_urls=max_urls, deadline=deadline,
+                                 store=self.sitemap_store)
+        try:
+            urls = crawler.crawl(sitemap_url)
+        except Exception as e:
+            self.on_error(f"Errore critico nell'estrazione della sitemap: {str(e)}")
+            return []
+        
+        for error in crawler.errors:
+            self.on_warning(f"Errore nell'elaborazione della sitemap {error['url']}: {error['error']}")
+        set_span_attributes(urls=len(urls), errors=len(crawler.errors), **crawler.stats)
+        return urls
+    
+    @traced('competitor_fetch')
+    def fetch_serp_competitors(self, keyword_analysis: Dict, limit: int = 3, exclude_domains: List[str] = (),
+                               start_number: int = 1, max_workers: int = 5, deadline: float = 30.0) -> List[Dict]:
+        """Scarica e struttura le pagine dei primi risultati organici di Serper come competitor"""
+        organic_results = keyword_analysis.get('serper_data', {}).get('organic_results', [])
+        # Qualche risultato di riserva per sostituire le pagine non scaricabili o troppo povere
+        candidates = select_organic_urls(organic_results, limit * 2, exclude_domains)
+        if not candidates:
+            set_span_attributes(pages=0)
+            return []
+        
+        fetcher = CompetitorFetcher(self.session, max_workers=max_workers, deadline=deadline)
+        pages = fetcher.fetch_all(result['link'] for result in candidates)
+        for error in fetcher.errors:
+            self.on_warning(f"Impossibile scaricare il competitor {error['url']}: {error['error']}")
+        
+        competitors = []
+        for result in candidates:
+            page = pages.get(result['link'])
+            if page is None:
+                continue
+            competitor_number = start_number + len(competitors)
+            competitor = process_competitor_content(page['content'], page['url'], competitor_number=competitor_number,
+                                                    encoding=page['encoding'], status='fetched')
+            if competitor['word_count'] < FETCH_MIN_WORDS:
+                self.on_warning(f"Competitor {page['url']} scartato: solo {competitor['word_count']} parole estratte")
+                continue
+            if competitor['title'] == f"Competitor {competitor_number}":
+                competitor['title'] = result.get('title') or competitor['title']
+            competitor['serp_position'] = result.get('position', 0)
+            competitors.append(competitor)
+            if len(competitors) >= limit:
+                break
+        
+        set_span_attributes(pages=len(competitors), candidates=len(candidates), errors=len(fetcher.errors),
+                            bytes=sum(len(page['content']) for page in pages.values()))
+        return competitors
+    
+    def _get_link_index(self, urls: List[str]) -> LinkIndex:
+        """Riusa l'indice delle URL interne finché la lista di URL non cambia"""
+        key = hash(tuple(urls))
+        entry = self._link_index
+        if entry is None or entry[0] != key:
+            entry = (key, LinkIndex(urls))
+            self._link_index = entry
+        return entry[1]
+    
+    @traced('keyword_analysis')
+    def analyze_keywords_with_apis(self, keywords: str, concurrent: bool = True, timeouts: Optional[Dict[str, float]] = None) -> Dict:
+        """Analizza le keyword usando SEMrush e Serper"""
+        keyword_list = [k.strip() for k in keywords.split(',') if k.strip()]
+        main_keyword = keyword_list[0] if keyword_list else ""
+        
+        semrush_data = {}
+        related_keywords = []
+        intent_categories = {}
+        topic_clusters = {}
+        serper_data = {}
+        
+        if main_keyword and concurrent:
+            semrush_data, related_keywords, serper_data = self._fetch_keyword_data_concurrently(main_keyword, timeouts)
+        elif main_keyword:
+            semrush_data = self.seo_enhancer.get_semrush_keyword_data(main_keyword)
+            if semrush_data.get('status') == 'success':
+                related_keywords = self.seo_enhancer.get_semrush_related_keywords(main_keyword, limit=50)
+            serper_data = self.seo_enhancer.get_serper_search_data(main_keyword)
+        
+        if related_keywords:
+            intent_categories = self.seo_enhancer.analyze_keyword_intent_patterns(related_keywords)
+            topic_clusters = self.seo_enhancer.extract_topic_clusters(related_keywords)
+        
+        return {
+            'main_keyword': main_keyword,
+            'all_keywords': keyword_list,
+            'semrush_data': semrush_data,
+            'related_keywords': related_keywords,
+            'intent_categories': intent_categories,
+            'topic_clusters': topic_clusters,
+            'serper_data': serper_data
+        }
+    
+    def _fetch_keyword_data_concurrently(self, main_keyword: str, timeouts: Optional[Dict[str, float]] = None):
+        """Esegue in parallelo la catena SEMrush (organic -> related) e la ricerca Serper"""
+        call_timeouts = dict(DEFAULT_API_CALL_TIMEOUTS)
+        if timeouts:
+            call_timeouts.update(timeouts)
+        
+        script_ctx = _get_script_run_ctx()
+        executor = ThreadPoolExecutor(max_workers=2, initializer=_attach_script_run_ctx, initargs=(script_ctx,))
+        try:
+            started_at = time.monotonic()
+            organic_future = executor.submit(bind_context(self.seo_enhancer.get_semrush_keyword_data), main_keyword)
+            serper_future = executor.submit(bind_context(self.seo_enhancer.get_serper_search_data), main_keyword)
+            
+            def remaining(timeout: float, since: float) -> float:
+                return max(0.0, timeout - (time.monotonic() - since))
+            
+            try:
+                semrush_data = organic_future.result(timeout=remaining(call_timeouts['semrush_organic'], started_at))
+            except FuturesTimeoutError:
+                semrush_data = {'status': 'error', 'keyword': main_keyword, 'error': f"Timeout SEMrush dopo {call_timeouts['semrush_organic']}s"}
+            
+            related_keywords = []
+            if semrush_data.get('status') == 'success':
+                related_started_at = time.monotonic()
+                related_future = executor.submit(bind_context(self.seo_enhancer.get_semrush_related_keywords),
+                                                 main_keyword, limit=50)
+                try:
+                    related_keywords = related_future.result(timeout=remaining(call_timeouts['semrush_related'], related_started_at))
+                except FuturesTimeoutError:
+                    related_keywords = []
+            
+            try:
+                serper_data = serper_future.result(timeout=remaining(call_timeouts['serper'], started_at))
+            except FuturesTimeoutError:
+                serper_data = {'status': 'error', 'query': main_keyword, 'error': f"Timeout Serper dopo {call_timeouts['serper']}s"}
+        finally:
+            # Non attendiamo le chiamate andate in timeout: il risultato viene scartato
+            executor.shutdown(wait=False)
+        
+        return semrush_data, related_keywords, serper_data
+    
+    @traced('prompt_build')
+    def build_brief_messages(self, data: Dict, keyword_analysis: Dict, deduplicate: bool = True) -> List[Dict]:
+        """Costruisce i messaggi (system + prompt utente) per la generazione del brief.
+
+        Con `deduplicate=False` i competitor di `data` sono considerati già ripuliti da clean_competitor_content
+        (es. memorizzati dalla UI tra un rerun e l'altro); l'analisi competitor può arrivare già calcolata.
+        """
+        competitors = data['competitors']
+        if deduplicate:
+            competitors = self.clean_competitor_content(competitors, data['topic'], data['keywords'])[0]
+        competitor_insights = data.get('competitor_insights') or self.analyze_competitor_content(competitors)
+        search_intent_insights = self.extract_search_intent_insights(keyword_analysis)
+        
+        competitor_headers = []
+        for comp in competitors:
+            header = f"\n--- COMPETITOR {comp['competitor_number']} ---\n"
+            header += f"URL: {comp['url']}\n"
+            if comp['title'] != f"Competitor {comp['competitor_number']}":
+                header += f"Titolo: {comp['title']}\n"
+            if comp['meta_description']:
+                header += f"Meta Description: {comp['meta_description']}\n"
+            if comp['headings']:
+                header += f"Struttura titoli identificata:\n{comp['headings']}\n"
+            header += f"Numero parole: {comp['word_count']}\n"
+            competitor_headers.append(header)
+        
+        # Senza competitor (nessuna pagina incollata né scaricata) la media vale 0 invece di dividere per zero
+        average_words = sum(comp['word_count'] for comp in competitors) / len(competitors) if competitors else 0
+        competitor_analysis = f"""
+ANALISI AVANZATA COMPETITOR:
+- Topic più comuni: {', '.join(list(competitor_insights['common_topics'].keys())[:10])}
+- Topic di consenso (competitor che li trattano su {len(competitors)}): {', '.join(f"{topic['topic']} ({topic['coverage']})" for topic in competitor_insights['consensus_topics'][:10])}
+- Pattern strutturali dominanti: {', '.join(competitor_insights['structural_patterns'].keys())}
+- Gap di contenuto identificati: {', '.join(competitor_insights['content_gaps'][:5])}
+- Topic distintivi di pochi competitor: {', '.join(f"{topic['topic']} (competitor {', '.join(map(str, topic['competitors']))})" for topic in competitor_insights['distinctive_topics'][:8])}
+- Profondità media contenuto: {average_words:.0f} parole
+"""
+        
+        semrush_info = ""
+        if keyword_analysis['semrush_data'].get('status') == 'success':
+            sd = keyword_analysis['semrush_data']
+            semrush_info = f"""
+DATI SEMRUSH KEYWORD PRINCIPALE "{keyword_analysis['main_keyword']}":
+- Volume di ricerca mensile: {sd.get('search_volume', 'N/A')}
+- CPC: €{sd.get('cpc', 'N/A')} (Indicatore intent: {'Transactional' if sd.get('cpc', 0) > 2 else 'Commercial' if sd.get('cpc', 0) > 1 else 'Informational'})
+- Competizione: {sd.get('competition', 'N/A')}/1.0 (Livello: {'Alto' if sd.get('competition', 0) > 0.7 else 'Medio' if sd.get('competition', 0) > 0.4 else 'Basso'})
+- Risultati totali: {sd.get('results_count', 'N/A')}
+"""
+        
+        related_kw_by_intent = ""
+        if keyword_analysis.get('intent_categories'):
+            for intent, keywords in keyword_analysis['intent_categories'].items():
+                if keywords:
+                    related_kw_by_intent += f"\nKEYWORD {intent.upper()}:\n"
+                    top_keywords = sorted(keywords, key=lambda x: x['search_volume'], reverse=True)[:5]
+                    for kw in top_keywords:
+                        related_kw_by_intent += f"- {kw['keyword']} (Vol: {kw['search_volume']}, Comp: {kw['competition']:.2f})\n"
+        
+        topic_clusters_info = ""
+        if keyword_analysis.get('topic_clusters'):
+            topic_clusters_info = "CLUSTER TEMATICI DA SEMRUSH:\n"
+            sorted_clusters = sorted(keyword_analysis['topic_clusters'].items(), 
+                                   key=lambda x: x[1]['total_volume'], reverse=True)[:5]
+            for cluster_name, cluster_data in sorted_clusters:
+                topic_clusters_info += f"- Tema '{cluster_name}': {cluster_data['total_volume']} vol. totale, {len(cluster_data['keywords'])} keyword\n"
+        
+        serper_info = ""
+        if keyword_analysis['serper_data'].get('status') == 'success':
+            sd = keyword_analysis['serper_data']
+            
+            if sd.get('people_also_ask'):
+                serper_info += "PEOPLE ALSO ASK DA GOOGLE (CLASSIFICATE PER INTENT):\n"
+                paa_intents = sd.get('paa_intents', {})
+                for intent, questions in paa_intents.items():
+                    if questions:
+                        serper_info += f"\n{intent.upper()}:\n"
+                        for q in questions[:3]:
+                            serper_info += f"- {q}\n"
+            
+            if sd.get('related_searches'):
+                serper_info += f"\nRICERCHE CORRELATE DA GOOGLE:\n"
+                for rs in sd['related_searches'][:5]:
+                    serper_info += f"- {rs}\n"
+            
+            if sd.get('featured_snippet'):
+                snippet_analysis = sd.get('snippet_analysis', {})
+                serper_info += f"\nFEATURED SNIPPET ATTUALE - ANALISI STRUTTURALE:\n"
+                serper_info += f"Titolo: {sd['featured_snippet']['title']}\n"
+                serper_info += f"Lunghezza: {snippet_analysis.get('word_count', 0)} parole\n"
+                serper_info += f"Tipo struttura: {snippet_analysis.get('structure_type', 'paragraph')}\n"
+                serper_info += f"Contiene liste: {'Sì' if snippet_analysis.get('has_list') else 'No'}\n"
+                serper_info += f"Contiene numeri: {'Sì' if snippet_analysis.get('has_numbers') else 'No'}\n"
+                serper_info += f"Snippet: {sd['featured_snippet']['snippet'][:200]}...\n"
+        
+        intent_insights = f"""
+ANALISI INTENTO DI RICERCA AVANZATA:
+- Intent principale: {search_intent_insights['primary_intent']}
+- Fase user journey: {search_intent_insights['user_journey_stage']}
+- Livello competizione: {search_intent_insights['competition_level']}
+- Distribuzione intent: {search_intent_insights.get('intent_distribution', {})}
+- Sezioni consigliate: {search_intent_insights.get('content_suggestions', {})}
+"""
+        
+        if data['sitemap_urls']:
+            relevant_urls = rank_internal_links(
+                data['sitemap_urls'],
+                main_keyword=keyword_analysis.get('main_keyword', ''),
+                keywords=[k.strip() for k in data['keywords'].split(',') if k.strip()],
+                topic=data['topic'],
+                related_keywords=keyword_analysis.get('related_keywords', []),
+                top_n=INTERNAL_LINKS_LIMIT,
+                index=self._get_link_index(data['sitemap_urls'])
+            )
+            internal_urls = "\n".join(relevant_urls)
+        else:
+            internal_urls = data.get('manual_urls', 'Nessuna URL interna disponibile')
+        
+        # Sezioni riducibili, dalla più sacrificabile: contenuto competitor, link interni, cluster...
+        budget_sections = [
+            PromptSection('competitor_content', [comp['content'] for comp in competitors], priority=1,
+                          kind='texts', min_item_tokens=200, max_item_tokens=self.competitor_content_max_tokens),
+            PromptSection('internal_urls', internal_urls.split('\n'), priority=2, min_items=10),
+            PromptSection('competitor_headers', competitor_headers, priority=3, kind='texts', min_item_tokens=60),
+            PromptSection('topic_clusters', topic_clusters_info.split('\n'), priority=4, min_items=2),
+            PromptSection('related_keywords', related_kw_by_intent.split('\n'), priority=5, min_items=3),
+            PromptSection('serper', serper_info.split('\n'), priority=6, min_items=3),
+        ]
+        
+        def render(sections: Dict[str, List[str]]) -> str:
+            competitor_data = ""
+            for number, comp in enumerate(competitors):
+                headers = sections['competitor_headers']
+                contents = sections['competitor_content']
+                competitor_data += headers[number] if number < len(headers) else ''
+                content = contents[number] if number < len(contents) else ''
+                truncated = len(content) < len(comp['content'])
+                competitor_data += f"Contenuto completo: {content}{'...' if truncated else ''}\n"
+            
+            return self._render_brief_prompt(
+                data, keyword_analysis, search_intent_insights,
+                semrush_info=semrush_info,
+                related_kw_by_intent='\n'.join(sections['related_keywords']),
+                topic_clusters_info='\n'.join(sections['topic_clusters']),
+                serper_info='\n'.join(sections['serper']),
+                intent_insights=intent_insights,
+                competitor_analysis=competitor_analysis,
+                competitor_data=competitor_data,
+                internal_urls='\n'.join(sections['internal_urls'])
+            )
+        
+        fixed_tokens = estimate_tokens(BRIEF_SYSTEM_PROMPT) + estimate_tokens(
+            render({section.name: [] for section in budget_sections})
+        )
+        kept, report = fit_sections(budget_sections, self.prompt_token_budget, fixed_tokens)
+        prompt = render(kept)
+        estimated_tokens = estimate_tokens(BRIEF_SYSTEM_PROMPT) + estimate_tokens(prompt)
+        log_budget_report(report, estimated_tokens, self.prompt_token_budget)
+        set_span_attributes(estimated_tokens=estimated_tokens, trimmed_sections=len(report))
+        
+        return [
+            {"role": "system", "content": BRIEF_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _render_brief_prompt(self, data: Dict, keyword_analysis: Dict, search_intent_insights: Dict,
+                             semrush_info: str, related_kw_by_intent: str, topic_clusters_info: str,
+                             serper_info: str, intent_insights: str, competitor_analysis: str,
+                             competitor_data: str, internal_urls: str) -> str:
+        """Compone il prompt utente a partire dalle sezioni già preparate"""
+        return f"""
+Sei un esperto SEO content strategist e data analyst di alto livello, con una specializzazione nell'E-E-A-T (Expertise, Authoritativeness, Trustworthiness). Il tuo obiettivo è creare un content brief estremamente dettagliato e altamente actionable, utilizzando dati SEO reali e un'analisi approfondita dei competitor.
+
+INFORMAZIONI CLIENTE:
+- Brand: {data['brand']}
+- Sito web: {data['website']}
+- Argomento: {data['topic']}
+- Keyword principali: {data['keywords']}
+- Domande frequenti inserite: {data['faqs']}
+- Tone of voice: {', '.join(data['tone_of_voice'])}
+
+
+DATI STRATEGICI:
+Utilizza le seguenti informazioni per ottimizzare il brief:
+Informazioni SEMrush: {semrush_info}
+Keyword correlate per intent: {related_kw_by_intent}
+Cluster tematici: {topic_clusters_info}
+Analisi SERP: {serper_info}
+Approfondimenti sull’intento: {intent_insights}
+Analisi dei competitor: {competitor_analysis}
+
+ANALISI DETTAGLIATA COMPETITOR:
+{competitor_data}
+
+URL INTERNE DISPONIBILI (per link interni):
+{internal_urls}
+
+ISTRUZIONI SPECIFICHE:
+- Il brand "{data['brand']}" DEVE apparire nel meta title alla fine
+- Il brand "{data['brand']}" DEVE apparire nella meta description
+- Usa la capitalizzazione naturale italiana per tutte le intestazioni e i titoli. (prima lettera maiuscola il resto minuscolo, ad esempio 'Come Funziona il Mutuo INPS per Dipendenti Pubblici' NON va bene, andrebbe scritto così 'Come funziona il mutuo INPS per dipendenti pubblici')
+- Utilizza TUTTI i dati reali per creare suggerimenti specifici e actionable
+- Per ogni H2/H3 fornisci istruzioni DETTAGLIATE su cosa scrivere all'interno di quel paragrafo tramite degli elenchi puntati dettagliati
+- Identifica e capitalizza sulle lacune lasciate dai competitor per creare opportunità uniche e distinguibili.
+- Integra keyword correlate basate sugli intent specifici identificati.
+- Fornisci risposte mirate alle PAA (People Also Ask) in base all'intento di ricerca.
+
+Genera un content brief che includa:
+
+1. **STRATEGIA SEO DATA-DRIVEN AVANZATA**
+   - Strategia per fase user journey: {search_intent_insights['user_journey_stage']}
+   - Definisci la strategia per ciascuna fase del percorso dell'utente e dettagli su come superare i featured snippet attuali.
+   - Sfruttamento gap competitor identificati
+
+2. **META OTTIMIZZATI CON DATI REALI**
+   - Meta title (50-60 caratteri) ottimizzato per volume {keyword_analysis['semrush_data'].get('search_volume', 0)}
+   - Meta description che incorpora PAA ad alto search intent
+   - Keyword correlate strategiche da integrare
+
+3. **STRUTTURA CONTENUTO ESTREMAMENTE DETTAGLIATA**
+   
+   **H1 OTTIMIZZATO:**
+   - H1 specifico con keyword principale
+   - Giustificazione scelta basata su dati competitor
+   
+   **INTRODUZIONE STRATEGICA:**
+   - Cosa scrivere nei primi 2-3 paragrafi
+   - Come incorporare keyword principale naturalmente
+   - Hook basato su gap competitor identificati
+   - Elementi da includere
+   
+   **SEZIONI H2 CON ISTRUZIONI DETTAGLIATE:**
+   Per ogni H2 fornisci:
+   - Titolo H2 ottimizzato per keyword correlate specifiche
+   - 4-6 bullet point DETTAGLIATI su cosa scrivere in quel paragrafo
+   - Keyword correlate specifiche da integrare (con volumi di ricerca)
+   - PAA specifiche da rispondere in quella sezione
+   - Esempi concreti da includere
+   - Elementi aggiuntivi (liste, tabelle, immagini)
+   - Link interni coerenti con il contenuto partendo dalla Sitemap del sito con anchor text specifiche
+
+4. **STRATEGIA PEOPLE ALSO ASK AVANZATA**
+   Per ogni PAA da Google:
+   - In quale sezione H2/H3 rispondere
+   - Come strutturare la risposta (lunghezza, formato)
+   - Keyword correlate da includere nella risposta
+   - Opportunità per featured snippet
+
+5. **INTEGRAZIONE KEYWORD CORRELATE PER TOPIC CLUSTER**
+   Per ogni cluster tematico identificato:
+   - Dove integrare le keyword del cluster
+   - Densità ottimale basata su competition
+   - Long-tail opportunities ad alto volume
+
+6. **STRATEGIA LINK INTERNI DATA-DRIVEN**
+   - Link del sito provenienti dalla sitemap basate su keyword correlate e volumi coerenti con il contenuto dell'articolo
+   - Anchor text ottimizzate per topic cluster
+   - Distribuzione strategica per massimizzare ranking
+
+7. **ELEMENTI E-E-A-T SPECIFICI**
+   - Fonti autorevoli che competitor non usano
+   - Dati statistici più recenti
+   - Esempi pratici basati su ricerche correlate reali
+   - Authority signals da includere
+
+8. **PIANO IMPLEMENTAZIONE COPYWRITER**
+   - Checklist step-by-step per copywriter
+   - Metriche da raggiungere (lunghezza, keyword density)
+   - Elementi obbligatori per ogni sezione
+   - KPI di successo previsti
+
+Questo content brief deve essere concepito in modo da permettere al copywriter di produrre contenuti chiaramente superiori rispetto alla concorrenza, utilizzando esclusivamente dati reali e analisi avanzate. Ogni suggerimento deve essere specifico, actionable e orientato ai dati forniti, garantendo così un approccio strategico e mirato alla creazione di contenuti di alta qualità.
+"""
+    
+    def _llm_cache_key(self, messages: List[Dict]) -> str:
+        """Chiave della generazione: hash di modello, messaggi e parametri di campionamento"""
+        return DiskCache.make_key(
+            'llm_brief', model=BRIEF_MODEL, messages=messages,
+            temperature=BRIEF_TEMPERATURE, max_tokens=BRIEF_MAX_TOKENS
+        )
+    
+    def stream_content_brief(self, data: Dict, keyword_analysis: Dict,
+                             messages: Optional[List[Dict]] = None, deduplicate: bool = True) -> Iterator[str]:
+        """Genera il content brief in streaming restituendo i frammenti di testo man mano che arrivano"""
+        messages = messages or self.build_brief_messages(data, keyword_analysis, deduplicate)
+        received = []
+        try:
+            stream = self.client.chat.completions.create(
+                model=BRIEF_MODEL,
+                messages=messages,
+                max_tokens=BRIEF_MAX_TOKENS,
+                temperature=BRIEF_TEMPERATURE,
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            for chunk in stream:
+                usage = getattr(chunk, 'usage', None)
+                if usage:
+                    set_span_attributes(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    received.append(text)
+                    yield text
+        except Exception as e:
+            raise BriefGenerationError(str(e), ''.join(received)) from e
+    
+    def generate_content_brief(self, data: Dict, keyword_analysis: Dict,
+                               on_chunk: Optional[Callable[[str], None]] = None,
+                               force_regenerate: bool = False, deduplicate: bool = True) -> str:
+        """Genera il content brief usando OpenAI, riusando la generazione in cache se la richiesta è identica"""
+        messages = self.build_brief_messages(data, keyword_analysis, deduplicate)
+        cache_key = self._llm_cache_key(messages) if self.llm_cache else None
+        if cache_key and not force_regenerate:
+            cached = self.llm_cache.get('llm_brief', cache_key)
+            if cached is not None:
+                if on_chunk is not None:
+                    on_chunk(cached)
+                return cached
+        
+        try:
+            content = self._complete_brief(data, keyword_analysis, messages, on_chunk)
+        except BriefGenerationError as e:
+            if on_chunk is not None:
+                self.on_error(
+                    f"Errore nella generazione del content brief dopo {len(e.partial_text)} caratteri ricevuti: {str(e)}"
+                )
+            else:
+                self.on_error(f"Errore nella generazione del content brief: {str(e)}")
+            return GENERATION_ERROR_MESSAGE
+        
+        if cache_key and content:
+            self.llm_cache.set('llm_brief', cache_key, content)
+        return content
+    
+    @traced('llm.generate')
+    def _complete_brief(self, data: Dict, keyword_analysis: Dict, messages: List[Dict],
+                        on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        """Chiamata OpenAI, in streaming se è indicato on_chunk; in caso di errore solleva BriefGenerationError"""
+        set_span_attributes(model=BRIEF_MODEL, streaming=on_chunk is not None)
+        if on_chunk is not None:
+            chunks = []
+            for text in self.stream_content_brief(data, keyword_analysis, messages=messages):
+                chunks.append(text)
+                on_chunk(text)
+            content = ''.join(chunks)
+        else:
+            try:
+                response = self.client.chat.completions.create(
+                    model=BRIEF_MODEL,
+                    messages=messages,
+                    max_tokens=BRIEF_MAX_TOKENS,
+                    temperature=BRIEF_TEMPERATURE
+                )
+                content = response.choices[0].message.content
+            except Exception as e:
+                raise BriefGenerationError(str(e)) from e
+            usage = getattr(response, 'usage', None)
+            if usage:
+                set_span_attributes(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        
+        set_span_attributes(bytes=len(content.encode('utf-8')) if content else 0)
+        return content
+
+def basic_keyword_analysis(keywords: str) -> Dict:
+    """Analisi keyword minima quando SEMrush e Serper non sono configurati"""
+    return {
+        'main_keyword': keywords.split(',')[0].strip(), 
+        'semrush_data': {}, 
+        'serper_data': {},
+        'intent_categories': {},
+        'topic_clusters': {}
+    }
+
+def process_competitor_content(content: Union[str, bytes], url: str, title: str = '', meta_description: str = '',
+                               competitor_number: int = 1, encoding: Optional[str] = None,
+                               status: str = 'manual') -> Dict:
+    """Struttura il contenuto di un competitor (testo incollato o HTML) in titoli, paragrafi, elenchi e tabelle"""
+    structure = parse_competitor_content(content, encoding)
+    text = structure['text']
+    
+    return {
+        'url': url,
+        'title': title or structure['title'] or f"Competitor {competitor_number}",
+        'meta_description': meta_description or structure['meta_description'],
+        'meta_keywords': "",
+        'headings': format_headings(structure['headings'], COMPETITOR_HEADINGS_LIMIT),
+        'content': text,
+        'paragraphs': structure['paragraphs'],
+        'lists': structure['lists'],
+        'tables': structure['tables'],
+        'word_count': len(text.split()),
+        'status': status,
+        'content_format': structure['format'],
+        'competitor_number': competitor_number
+    }
+
+@traced('create_docx')
+def create_docx(content: str, brand: str, topic: str) -> io.BytesIO:
+    """Crea un documento DOCX formattato con il content brief"""
+    doc_buffer = io.BytesIO(render_docx(content, brand, topic))
+    set_span_attributes(bytes=len(doc_buffer.getbuffer()))
+    return doc_buffer
@@ -0,0 +1,207 @@
+"""Rimozione di boilerplate e paragrafi ripetuti (anche quasi identici) dai contenuti competitor.
+
+Ogni paragrafo di almeno PARAGRAPH_MIN_WORDS parole diventa un insieme di shingle di parole e una firma
+MinHash calcolata con NumPy su tutti i paragrafi insieme. Le firme sono indicizzate per bande (LSH):
+il confronto con i paragrafi già visti costa un accesso a dizionario per banda, quindi l'intero
+passaggio resta lineare nel testo complessivo.
+"""
+import re
+from itertools import chain, count
+from typing import Dict, Iterable, List, Pattern, Set, Tuple
+
+import numpy as np
+
+from prompt_budget import estimate_tokens
+from text_analysis import STOPWORDS, tokenize_words
+
+SHINGLE_WORDS = 3
+# Righe più corte (titoli, voci di elenco, righe di tabella) sono struttura: solo il filtro boilerplate
+PARAGRAPH_MIN_WORDS = 8
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 32
+# Quota di valori MinHash uguali oltre la quale due paragrafi sono considerati duplicati (≈ Jaccard)
+DUPLICATE_THRESHOLD = 0.6
+# Oltre questa lunghezza un paragrafo che cita cookie o newsletter è contenuto, non un banner
+BOILERPLATE_MAX_WORDS = 40
+# Quota minima delle parole piene della riga coperta dalle frasi del lessico boilerplate
+BOILERPLATE_MIN_SHARE = 0.5
+
+# Frasi tipiche di banner, menu e piè di pagina, per lingua: contano solo se occupano gran parte della riga
+BOILERPLATE_PHRASES: Dict[str, List[str]] = {
+    'it': [
+        # cookie e privacy
+        'cookie policy', 'utilizza cookie', 'utilizza i cookie', 'utilizziamo cookie', 'utilizziamo i cookie',
+        'usiamo i cookie', 'cookie tecnici', 'cookie di profilazione', 'accetta tutti', 'rifiuta tutti',
+        'gestisci preferenze', 'privacy policy', 'informativa privacy', 'informativa sulla privacy',
+        # piè di pagina
+        'tutti i diritti riservati', 'p.iva', 'partita iva', 'copyright', '©', 'note legali',
+        'termini e condizioni', 'mappa del sito',
+        # newsletter e social
+        'iscriviti alla newsletter', 'iscriviti alla nostra newsletter', 'ricevi la newsletter',
+        'condividi su', 'condividi questo articolo', 'seguici su',
+        # navigazione
+        'vai al contenuto', 'salta al contenuto', 'torna su', 'torna alla home', 'leggi anche', 'leggi di più',
+        'leggi tutto', 'continua a leggere', 'articoli correlati', 'potrebbe interessarti',
+        'ti potrebbe interessare',
+    ]
+}
+
+_BAND_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+# Seme fisso e id delle parole in ordine di apparizione: stesso input, stessi paragrafi scartati in ogni processo
+_random = np.random.default_rng(7)
+_SHINGLE_WEIGHTS = _random.integers(1, 2 ** 63, size=SHINGLE_WORDS, dtype=np.uint64) | np.uint64(1)
+_MULTIPLIERS = _random.integers(1, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_INCREMENTS = _random.integers(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_BAND_WEIGHTS = _random.integers(1, 2 ** 63, size=_BAND_ROWS, dtype=np.uint64) | np.uint64(1)
+_MIX = np.uint64(0xbf58476d1ce4e5b9)
+
+_boilerplate_patterns: Dict[str, Pattern] = {}
+
+
+def _boilerplate_pattern(language: str) -> Pattern:
+    """Regex (compilata una sola volta per lingua) delle frasi boilerplate, con confini di parola"""
+    if language not in _boilerplate_patterns:
+        phrases = BOILERPLATE_PHRASES.get(language) or BOILERPLATE_PHRASES['it']
+        # Le frasi più lunghe prima: a parità di posizione viene riconosciuta la frase più lunga
+        alternatives = sorted((r'\s+'.join(map(re.escape, phrase.split())) for phrase in phrases), key=len, reverse=True)
+        _boilerplate_patterns[language] = re.compile(r'(?<!\w)(?:' + '|'.join(alternatives) + r')(?!\w)')
+    return _boilerplate_patterns[language]
+
+
+def _minhash_signatures(paragraph_words: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Firme MinHash dei paragrafi con almeno PARAGRAPH_MIN_WORDS parole: (indici dei paragrafi, firme)"""
+    lengths = np.fromiter((len(words) for words in paragraph_words), dtype=np.int64, count=len(paragraph_words))
+    shingle_counts = np.where(lengths >= PARAGRAPH_MIN_WORDS, lengths - SHINGLE_WORDS + 1, 0)
+    indexed = np.flatnonzero(shingle_counts)
+    if not len(indexed):
+        return indexed, np.empty((0, MINHASH_PERMUTATIONS), dtype=np.uint64)
+
+    # Id univoco per parola: setdefault con un contatore tiene l'id della prima occorrenza (ciclo tutto in C)
+    vocabulary: Dict[str, int] = {}
+    word_ids = np.fromiter(map(vocabulary.setdefault, chain.from_iterable(paragraph_words), count()),
+                           dtype=np.uint64, count=int(lengths.sum()))
+    # Shingle = combinazione pesata (aritmetica modulo 2^64) di SHINGLE_WORDS parole consecutive, poi rimescolata
+    total = len(word_ids) - SHINGLE_WORDS + 1
+    shingles = np.zeros(total, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        shingles += word_ids[offset:offset + total] * _SHINGLE_WEIGHTS[offset]
+    shingles ^= shingles >> np.uint64(31)
+    shingles *= _MIX
+    shingles ^= shingles >> np.uint64(29)
+    # Si tengono solo gli shingle che non attraversano il confine tra due paragrafi
+    ends = np.cumsum(lengths)
+    owners = np.repeat(np.arange(len(lengths)), lengths)[:total]
+    shingles = shingles[(np.arange(total) + SHINGLE_WORDS <= ends[owners]) & (shingle_counts[owners] > 0)]
+
+    # Permutazioni multiply-shift: i 32 bit alti di a*x+b; il minimo per paragrafo è la firma.
+    # Una permutazione alla volta, così la memoria resta proporzionale agli shingle e non a shingle x permutazioni
+    group_starts = np.concatenate(([0], np.cumsum(shingle_counts[indexed])[:-1]))
+    signatures = np.empty((len(indexed), MINHASH_PERMUTATIONS), dtype=np.uint64)
+    permuted = np.empty_like(shingles)
+    for column in range(MINHASH_PERMUTATIONS):
+        np.multiply(shingles, _MULTIPLIERS[column], out=permuted)
+        permuted += _INCREMENTS[column]
+        permuted >>= np.uint64(32)
+        signatures[:, column] = np.minimum.reduceat(permuted, group_starts)
+    return indexed, signatures
+
+
+def _content_words(words: Iterable[str]) -> List[str]:
+    return [word for word in words if word not in STOPWORDS and len(word) > 2]
+
+
+def _is_boilerplate(line: str, words: List[str], pattern: Pattern, topic_terms: Set[str], repeated: bool) -> bool:
+    """Riga di banner/menu/piè di pagina: frase del lessico che occupa gran parte della riga, o ripetuta
+    tra le pagine; mai se condivide parole con argomento e keyword del brief (es. 'partita iva')"""
+    if len(words) > BOILERPLATE_MAX_WORDS or topic_terms.intersection(words):
+        return False
+    matched = pattern.findall(line.lower())
+    if not matched:
+        return False
+    if repeated:
+        return True
+    content = _content_words(words)
+    matched_words = sum(len(_content_words(tokenize_words(phrase))) for phrase in matched)
+    return not content or matched_words >= BOILERPLATE_MIN_SHARE * len(content)
+
+
+def deduplicate_competitors(competitors: List[Dict], language: str = 'it',
+                            topic_terms: Iterable[str] = ()) -> Tuple[List[Dict], Dict]:
+    """Toglie dal contenuto dei competitor boilerplate e paragrafi già visti, nello stesso o in un altro competitor.
+
+    Restituisce i competitor ripuliti (nuovi dizionari) e un report con i paragrafi scartati e i token risparmiati.
+    Il word count e i paragrafi di ogni pagina perdono boilerplate e ripetizioni interne; il contenuto passato
+    ad analisi e prompt perde anche i paragrafi già presenti in un competitor precedente.
+    `topic_terms` (parole di argomento e keyword) protegge dal filtro boilerplate le righe che le contengono.
+    """
+    pattern = _boilerplate_pattern(language)
+    topic_terms = set(_content_words(word for term in topic_terms for word in tokenize_words(term)))
+    lines_by_competitor = [comp['content'].split('\n') for comp in competitors]
+    owners = [(position, number) for position, lines in enumerate(lines_by_competitor) for number in range(len(lines))]
+    paragraph_words = [tokenize_words(line) for lines in lines_by_competitor for line in lines]
+    indexed, signatures = _minhash_signatures(paragraph_words)
+    signature_rows = dict(zip(indexed.tolist(), range(len(indexed))))
+    # Chiave di ogni banda: combinazione delle sue righe, calcolata per tutte le firme in una volta
+    band_keys = (signatures.reshape(len(signatures), LSH_BANDS, _BAND_ROWS) * _BAND_WEIGHTS).sum(axis=2).tolist()
+    # Righe identiche presenti in più pagine (il classico piè di pagina o banner di un CMS comune)
+    line_keys = [' '.join(words) for words in paragraph_words]
+    line_pages: Dict[str, Set[int]] = {}
+    for index, key in enumerate(line_keys):
+        if key:
+            line_pages.setdefault(key, set()).add(owners[index][0])
+
+    # Per ogni banda: chiave della banda -> riga della firma del primo paragrafo tenuto
+    buckets: List[Dict[int, int]] = [{} for _ in range(LSH_BANDS)]
+    # Esito per paragrafo: None (tenuto), 'boilerplate', 'duplicate' (stesso competitor), 'cross_duplicate'
+    verdicts: List[List] = [[None] * len(lines) for lines in lines_by_competitor]
+    for index, words in enumerate(paragraph_words):
+        position, number = owners[index]
+        if not words:
+            continue
+        if _is_boilerplate(lines_by_competitor[position][number], words, pattern, topic_terms,
+                           len(line_pages[line_keys[index]]) > 1):
+            verdicts[position][number] = 'boilerplate'
+            continue
+        row = signature_rows.get(index)
+        if row is None:
+            continue
+        signature = signatures[row]
+        match = None
+        for band, key in enumerate(band_keys[row]):
+            candidate = buckets[band].get(key)
+            if candidate is not None and np.mean(signatures[candidate] == signature) >= DUPLICATE_THRESHOLD:
+                match = candidate
+                break
+        if match is None:
+            for band, key in enumerate(band_keys[row]):
+                buckets[band].setdefault(key, row)
+            continue
+        original_position = owners[indexed[match]][0]
+        verdicts[position][number] = 'duplicate' if original_position == position else 'cross_duplicate'
+
+    report = {'paragraphs': len(paragraph_words), 'boilerplate': 0, 'duplicate': 0, 'cross_duplicate': 0,
+              'tokens_before': 0, 'tokens_after': 0}
+    cleaned = []
+    for comp, lines, verdict in zip(competitors, lines_by_competitor, verdicts):
+        content = '\n'.join(line for line, reason in zip(lines, verdict) if reason is None)
+        page_lines = [line for line, reason in zip(lines, verdict) if reason is None or reason == 'cross_duplicate']
+        dropped = {line for line, reason in zip(lines, verdict) if reason == 'boilerplate'}
+        paragraphs = []
+        seen = set()
+        for paragraph in comp.get('paragraphs', []):
+            if paragraph not in dropped and paragraph not in seen:
+                seen.add(paragraph)
+                paragraphs.append(paragraph)
+        for reason in verdict:
+            if reason is not None:
+                report[reason] += 1
+        report['tokens_before'] += estimate_tokens(comp['content'])
+        report['tokens_after'] += estimate_tokens(content)
+        cleaned.append({
+            **comp,
+            'content': content,
+            'paragraphs': paragraphs,
+            'word_count': sum(len(line.split()) for line in page_lines)
+        })
+    report['tokens_saved'] = report['tokens_before'] - report['tokens_after']
+    return cleaned, report
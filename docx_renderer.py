@@ -0,0 +1,320 @@
+"""Rendering del content brief markdown in DOCX a partire da un template con stili Figtree predefiniti.
+
+Il template (margini, font e dimensioni di titoli, elenchi e tabelle) viene costruito una sola volta
+per processo e riletto dai byte in memoria per ogni documento: i paragrafi ricevono solo l'id dello
+stile, senza impostare font e dimensione run per run. `CONTENT_BRIEF_DOCX_TEMPLATE` permette di usare
+un template aziendale, purché definisca gli stili elencati in TEMPLATE_STYLES.
+"""
+import io
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
+from docx.shared import Inches, Pt
+from lxml import etree
+
+FONT_NAME = 'Figtree'
+CODE_FONT_NAME = 'Consolas'
+CODE_STYLE = 'Brief Code'
+DOCX_TEMPLATE_PATH = os.environ.get('CONTENT_BRIEF_DOCX_TEMPLATE')
+
+# Stile del template -> dimensione in punti (None: dimensione del template di python-docx)
+TEMPLATE_STYLES = {
+    'Normal': 11,
+    'Title': 20,
+    'Subtitle': 12,
+    'Heading 1': 17,
+    'Heading 2': 17,
+    'Heading 3': 17,
+    'Heading 4': 13,
+    'Heading 5': 13,
+    'Heading 6': 13,
+    'List Bullet': None,
+    'List Bullet 2': None,
+    'List Bullet 3': None,
+    'List Number': None,
+    'List Number 2': None,
+    'List Number 3': None,
+    'Quote': None,
+    'Table Grid': None
+}
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+BULLET_PATTERN = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+NUMBERED_PATTERN = re.compile(r'^(\s*)\d{1,3}[.)]\s+(.*)$')
+QUOTE_PATTERN = re.compile(r'^>\s?(.*)$')
+RULE_PATTERN = re.compile(r'^(?:-{3,}|\*{3,}|_{3,})$')
+TABLE_SEPARATOR_PATTERN = re.compile(r'^\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?$')
+TABLE_CELL_PATTERN = re.compile(r'(?<!\\)\|')
+# Enfasi inline: l'ordine delle alternative conta (*** prima di **, ** prima di *)
+INLINE_PATTERN = re.compile(
+    r'\*\*\*(?P<bold_italic>.+?)\*\*\*'
+    r'|\*\*(?P<bold>.+?)\*\*'
+    r'|__(?P<bold_alt>.+?)__'
+    r'|\*(?P<italic>[^*\s](?:[^*]*[^*\s])?)\*'
+    r'|(?<![\w])_(?P<italic_alt>[^_\s](?:[^_]*[^_\s])?)_(?![\w])'
+    r'|`(?P<code>[^`]+)`'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)'
+)
+
+# Tag WordprocessingML usati per costruire paragrafi e run
+W_P, W_PPR, W_PSTYLE = qn('w:p'), qn('w:pPr'), qn('w:pStyle')
+W_NUMPR, W_ILVL, W_NUMID = qn('w:numPr'), qn('w:ilvl'), qn('w:numId')
+W_R, W_RPR, W_RSTYLE, W_T = qn('w:r'), qn('w:rPr'), qn('w:rStyle'), qn('w:t')
+W_B, W_I, W_VAL = qn('w:b'), qn('w:i'), qn('w:val')
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# (testo, grassetto, corsivo, codice)
+Span = Tuple[str, bool, bool, bool]
+
+_template_lock = threading.Lock()
+_template: Optional[Tuple[bytes, Dict[str, str], Optional[int]]] = None
+
+
+def parse_inline(text: str, bold: bool = False, italic: bool = False) -> List[Span]:
+    """Divide una riga markdown in run con grassetto, corsivo e codice; i link diventano 'testo (url)'"""
+    spans: List[Span] = []
+    position = 0
+    for match in INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            spans.append((text[position:match.start()], bold, italic, False))
+        group = match.lastgroup
+        if group == 'bold_italic':
+            spans.extend(parse_inline(match.group(group), True, True))
+        elif group in ('bold', 'bold_alt'):
+            spans.extend(parse_inline(match.group(group), True, italic))
+        elif group in ('italic', 'italic_alt'):
+            spans.extend(parse_inline(match.group(group), bold, True))
+        elif group == 'code':
+            spans.append((match.group('code'), bold, italic, True))
+        else:
+            spans.extend(parse_inline(match.group('link_text'), bold, italic))
+            spans.append((f" ({match.group('link_url')})", bold, italic, False))
+        position = match.end()
+    if position < len(text):
+        spans.append((text[position:], bold, italic, False))
+    return spans
+
+
+def _split_table_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    return [cell.strip().replace('\\|', '|') for cell in TABLE_CELL_PATTERN.split(line)]
+
+
+def parse_markdown(content: str) -> List[Dict]:
+    """Blocchi del markdown in un solo passaggio: heading, paragraph, bullet, number, quote, table"""
+    blocks: List[Dict] = []
+    lines = content.split('\n')
+    in_code = False
+    index = 0
+    while index < len(lines):
+        raw = lines[index].rstrip()
+        line = raw.strip()
+        index += 1
+        if line.startswith('```'):
+            in_code = not in_code
+            continue
+        if not line:
+            continue
+        if in_code:
+            blocks.append({'type': 'code', 'text': raw})
+            continue
+
+        # Tabella: riga con pipe seguita dalla riga separatore |---|---|
+        if '|' in line and index < len(lines) and TABLE_SEPARATOR_PATTERN.match(lines[index].strip()) \
+                and '-' in lines[index]:
+            rows = [_split_table_row(line)]
+            index += 1
+            while index < len(lines) and '|' in lines[index] and lines[index].strip():
+                rows.append(_split_table_row(lines[index]))
+                index += 1
+            blocks.append({'type': 'table', 'rows': rows})
+            continue
+
+        match = HEADING_PATTERN.match(line)
+        if match:
+            blocks.append({'type': 'heading', 'level': len(match.group(1)), 'text': match.group(2)})
+            continue
+        if RULE_PATTERN.match(line):
+            continue
+        match = BULLET_PATTERN.match(raw) or NUMBERED_PATTERN.match(raw)
+        if match:
+            indent = len(match.group(1).expandtabs(4))
+            blocks.append({'type': 'bullet' if match.re is BULLET_PATTERN else 'number',
+                           'level': min(indent // 2, 2), 'text': match.group(2).strip()})
+            continue
+        match = QUOTE_PATTERN.match(line)
+        if match:
+            blocks.append({'type': 'quote', 'text': match.group(1)})
+            continue
+        blocks.append({'type': 'paragraph', 'text': line})
+    return blocks
+
+
+def build_template() -> bytes:
+    """Template di default: margini di un pollice e stili Figtree per titoli, testo, elenchi e tabelle"""
+    doc = Document()
+    for section in doc.sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+
+    for name, size in TEMPLATE_STYLES.items():
+        style = doc.styles[name]
+        style.font.name = FONT_NAME
+        # rFonts completo: altrimenti Word usa il font del tema per i caratteri non latini
+        style.element.get_or_add_rPr().get_or_add_rFonts().set(qn('w:eastAsia'), FONT_NAME)
+        if size is not None:
+            style.font.size = Pt(size)
+    subtitle = doc.styles['Subtitle'].font
+    subtitle.bold = True
+    subtitle.italic = False
+    subtitle.color.rgb = None
+
+    code = doc.styles.add_style(CODE_STYLE, WD_STYLE_TYPE.CHARACTER)
+    code.base_style = doc.styles['Default Paragraph Font']
+    code.font.name = CODE_FONT_NAME
+    code.font.size = Pt(10)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _load_template() -> Tuple[bytes, Dict[str, str], Optional[int]]:
+    """Byte del template, id degli stili e numerazione di 'List Number', risolti una volta per processo"""
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                if DOCX_TEMPLATE_PATH:
+                    with open(DOCX_TEMPLATE_PATH, 'rb') as f:
+                        template_bytes = f.read()
+                else:
+                    template_bytes = build_template()
+                doc = Document(io.BytesIO(template_bytes))
+                style_ids = {name: doc.styles[name].style_id for name in [*TEMPLATE_STYLES, CODE_STYLE]}
+                num_pr = doc.styles['List Number'].element.pPr.numPr
+                number_num_id = num_pr.numId.val if num_pr is not None and num_pr.numId is not None else None
+                _template = (template_bytes, style_ids, number_num_id)
+    return _template
+
+
+class _BriefWriter:
+    """Aggiunge i blocchi al documento scrivendo direttamente gli elementi w:p / w:r con gli id di stile.
+
+    Gli elementi sono creati già nell'ordine dello schema: i proxy di python-docx (Paragraph.style,
+    Run.bold, add_run) cercano a ogni chiamata la posizione del figlio e dominano il tempo di rendering.
+    """
+
+    def __init__(self, doc, style_ids: Dict[str, str], number_num_id: Optional[int]):
+        self.doc = doc
+        self.body = doc.element.body
+        # Il corpo termina con sectPr: i paragrafi vanno inseriti prima
+        self.section_properties = self.body.sectPr
+        self.style_ids = style_ids
+        self.number_num_id = number_num_id
+        self.current_num_id: Optional[int] = None
+
+    def paragraph(self, style: Optional[str], spans: List[Span], num_id: Optional[int] = None):
+        p = self.body.makeelement(W_P)
+        if style or num_id is not None:
+            p_pr = etree.SubElement(p, W_PPR)
+            if style:
+                etree.SubElement(p_pr, W_PSTYLE).set(W_VAL, self.style_ids[style])
+            if num_id is not None:
+                num_pr = etree.SubElement(p_pr, W_NUMPR)
+                etree.SubElement(num_pr, W_ILVL).set(W_VAL, '0')
+                etree.SubElement(num_pr, W_NUMID).set(W_VAL, str(num_id))
+        self.runs(p, spans)
+        if self.section_properties is not None:
+            self.section_properties.addprevious(p)
+        else:
+            self.body.append(p)
+        return p
+
+    def runs(self, p, spans: List[Span]):
+        for text, bold, italic, code in spans:
+            r = etree.SubElement(p, W_R)
+            if bold or italic or code:
+                r_pr = etree.SubElement(r, W_RPR)
+                if code:
+                    etree.SubElement(r_pr, W_RSTYLE).set(W_VAL, self.style_ids[CODE_STYLE])
+                if bold:
+                    etree.SubElement(r_pr, W_B)
+                if italic:
+                    etree.SubElement(r_pr, W_I)
+            t = etree.SubElement(r, W_T)
+            t.text = text
+            if text != text.strip():
+                t.set(XML_SPACE, 'preserve')
+
+    def restart_numbering(self) -> Optional[int]:
+        """Nuova istanza della numerazione di 'List Number', così ogni elenco riparte da 1"""
+        if self.number_num_id is None:
+            return None
+        numbering = self.doc.part.numbering_part.element
+        abstract_id = numbering.num_having_numId(self.number_num_id).abstractNumId.val
+        num = numbering.add_num(abstract_id)
+        num.add_lvlOverride(ilvl=0).add_startOverride(1)
+        return num.numId
+
+    def table(self, rows: List[List[str]]):
+        columns = max(len(row) for row in rows)
+        table = self.doc.add_table(rows=len(rows), cols=columns)
+        table._tbl.tblPr.style = self.style_ids['Table Grid']
+        for row_index, (row, cells) in enumerate(zip(rows, table.rows)):
+            for text, cell in zip(row, cells.cells):
+                self.runs(cell._tc.p_lst[0], parse_inline(text, bold=row_index == 0))
+
+    def write(self, blocks: List[Dict]):
+        for block in blocks:
+            kind = block['type']
+            if kind not in ('number', 'bullet'):
+                # Qualsiasi altro blocco chiude l'elenco numerato in corso
+                self.current_num_id = None
+            if kind == 'heading':
+                self.paragraph(f"Heading {block['level']}", parse_inline(block['text']))
+            elif kind == 'bullet':
+                self.paragraph(('List Bullet', 'List Bullet 2', 'List Bullet 3')[block['level']],
+                               parse_inline(block['text']))
+            elif kind == 'number':
+                if block['level'] == 0:
+                    if self.current_num_id is None:
+                        self.current_num_id = self.restart_numbering()
+                    self.paragraph('List Number', parse_inline(block['text']), self.current_num_id)
+                else:
+                    self.paragraph(('List Number 2', 'List Number 3')[block['level'] - 1],
+                                   parse_inline(block['text']))
+            elif kind == 'quote':
+                self.paragraph('Quote', parse_inline(block['text']))
+            elif kind == 'code':
+                self.paragraph(None, [(block['text'].expandtabs(4), False, False, True)])
+            elif kind == 'table':
+                self.table(block['rows'])
+            else:
+                self.paragraph(None, parse_inline(block['text']))
+
+
+def render_docx(content: str, brand: str, topic: str) -> bytes:
+    """Documento DOCX del content brief: titolo, brand e markdown renderizzato con gli stili del template"""
+    template_bytes, style_ids, number_num_id = _load_template()
+    doc = Document(io.BytesIO(template_bytes))
+    writer = _BriefWriter(doc, style_ids, number_num_id)
+    writer.paragraph('Title', [(f'Content brief SEO data-driven - {topic}', False, False, False)])
+    writer.paragraph('Subtitle', [(f'Brand: {brand}', False, False, False)])
+    writer.paragraph(None, [])
+    writer.write(parse_markdown(content))
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
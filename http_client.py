@@ -0,0 +1,82 @@
+import random
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Metodi che possono essere ripetuti senza effetti collaterali
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# Endpoint POST di sola lettura (ricerca Serper) che è sicuro ripetere
+READ_ONLY_POST_PREFIXES = ('https://google.serper.dev/',)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class JitterRetry(Retry):
+    """Retry urllib3 con backoff esponenziale e jitter, con tetto al Retry-After"""
+
+    MAX_RETRY_AFTER = 30
+
+    def get_backoff_time(self) -> float:
+        base = super().get_backoff_time() or self.backoff_factor
+        return base / 2 + random.uniform(0, base / 2)
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.MAX_RETRY_AFTER)
+
+
+def build_retry(allowed_methods=IDEMPOTENT_METHODS, total: int = 3, backoff_factor: float = 0.5) -> JitterRetry:
+    """Crea la politica di retry per errori di rete e risposte 429/5xx"""
+    return JitterRetry(
+        total=total,
+        connect=total,
+        read=total,
+        status=total,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=allowed_methods,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+def create_session(pool_connections: int = 10, pool_maxsize: int = 10) -> requests.Session:
+    """Crea una sessione keep-alive con pool di connessioni limitato per host e retry"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=True,
+        max_retries=build_retry()
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    read_only_post_adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_maxsize,
+        pool_block=True,
+        max_retries=build_retry(allowed_methods=IDEMPOTENT_METHODS | {'POST'})
+    )
+    for prefix in READ_ONLY_POST_PREFIXES:
+        session.mount(prefix, read_only_post_adapter)
+    return session
+
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Restituisce la sessione HTTP condivisa dal processo, creandola al primo uso"""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
@@ -0,0 +1,100 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+# Lessici per lingua: per ogni classificatore, categorie in ordine di priorità.
+# Un pattern che termina con '*' corrisponde a qualsiasi parola con quel prefisso.
+LEXICONS: Dict[str, Dict[str, List[Tuple[str, List[str]]]]] = {
+    'it': {
+        'keyword_intent': [
+            ('informational', ['come', 'cosa', 'quando', 'dove', 'perché', 'guida', 'tutorial', 'cos è', "cos'è", 'significa']),
+            ('transactional', ['acquista', 'compra', 'prezzo', 'costo', 'offerta', 'sconto', 'migliore', 'recensioni']),
+            ('commercial', ['confronto', 'vs', 'alternative', 'migliori', 'top', 'classifica', 'recensione']),
+            ('navigational', ['sito', 'ufficiale', 'login', 'accesso', 'brand']),
+        ],
+        'paa_intent': [
+            ('informational', ['come', 'cosa', 'quando', 'dove', 'perché']),
+            ('commercial', ['migliore', 'confronto', 'differenza', 'vs']),
+            ('transactional', ['prezzo', 'costo', 'acquista', 'dove comprare']),
+        ],
+        'heading_pattern': [
+            ('how_to', ['come']),
+            ('what_is', ['cosa']),
+            ('why', ['perché']),
+            ('best_list', ['migliori', 'top']),
+            ('comparison', ['confronto', 'vs']),
+        ],
+    }
+}
+
+
+class IntentMatcher:
+    """Classificatore a singola regex compilata con confini di parola e categorie a priorità"""
+
+    def __init__(self, categories: List[Tuple[str, List[str]]]):
+        self.categories = [category for category, _ in categories]
+        # Per ogni frase (o prefisso) il rango della categoria più prioritaria che la contiene
+        self._exact: Dict[str, int] = {}
+        self._prefixes: Dict[str, int] = {}
+
+        for rank, (_, patterns) in enumerate(categories):
+            for pattern in patterns:
+                pattern = ' '.join(pattern.lower().split())
+                if pattern.endswith('*'):
+                    self._prefixes.setdefault(pattern[:-1], rank)
+                else:
+                    self._exact.setdefault(pattern, rank)
+
+        alternatives = [(phrase, self._to_regex(phrase)) for phrase in self._exact]
+        alternatives += [(prefix, self._to_regex(prefix) + r'\w*') for prefix in self._prefixes]
+        # Le frasi più lunghe prima, così 'dove comprare' prevale su 'dove'
+        alternatives.sort(key=lambda item: len(item[0]), reverse=True)
+        self._pattern = re.compile(r'(?<!\w)(?:' + '|'.join(regex for _, regex in alternatives) + r')(?!\w)')
+
+    @staticmethod
+    def _to_regex(phrase: str) -> str:
+        return r'\s+'.join(re.escape(word) for word in phrase.split(' '))
+
+    def _rank_for(self, matched: str) -> Optional[int]:
+        rank = self._exact.get(matched)
+        if rank is not None:
+            return rank
+        if ' ' in matched or '\t' in matched or '\n' in matched:
+            rank = self._exact.get(' '.join(matched.split()))
+            if rank is not None:
+                return rank
+        for prefix, prefix_rank in self._prefixes.items():
+            if matched.startswith(prefix):
+                return prefix_rank
+        return None
+
+    def match_all(self, text: str) -> Set[str]:
+        """Tutte le categorie presenti nel testo, in un'unica scansione"""
+        found = set()
+        for matched in self._pattern.findall(text.lower()):
+            rank = self._rank_for(matched)
+            if rank is not None:
+                found.add(self.categories[rank])
+        return found
+
+    def classify(self, text: str, default: Optional[str] = None) -> Optional[str]:
+        """Categoria a priorità più alta presente nel testo, oppure `default`"""
+        best = None
+        for matched in self._pattern.findall(text.lower()):
+            rank = self._rank_for(matched)
+            if rank is not None and (best is None or rank < best):
+                best = rank
+                if best == 0:
+                    break
+        return self.categories[best] if best is not None else default
+
+
+_matchers: Dict[Tuple[str, str], IntentMatcher] = {}
+
+
+def get_matcher(name: str, language: str = 'it') -> IntentMatcher:
+    """Restituisce (compilandolo una sola volta) il classificatore per lessico e lingua"""
+    key = (name, language)
+    if key not in _matchers:
+        lexicon = LEXICONS.get(language) or LEXICONS['it']
+        _matchers[key] = IntentMatcher(lexicon[name])
+    return _matchers[key]
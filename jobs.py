@@ -0,0 +1,158 @@
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+# Limiti globali sui job conclusi (tutti gli utenti): i visitatori anonimi non tornano a rimuoverli
+FINISHED_JOB_TTL = 6 * 3600
+MAX_FINISHED_JOBS = 200
+
+# Job in esecuzione e relativo registro: una ContextVar, così tracing.bind_context la porta anche
+# nei thread secondari (chiamate API parallele) e gli avvisi emessi lì arrivano al job
+_current: contextvars.ContextVar[Optional[Tuple[Dict, 'JobRegistry']]] = contextvars.ContextVar(
+    'current_job', default=None
+)
+
+
+class JobRegistry:
+    """Registro in memoria di job eseguiti in background da un pool di worker condiviso"""
+
+    def __init__(self, max_workers: int = 4, max_jobs_per_owner: int = 20,
+                 finished_ttl: float = FINISHED_JOB_TTL, max_finished_jobs: int = MAX_FINISHED_JOBS):
+        self.max_jobs_per_owner = max_jobs_per_owner
+        self.finished_ttl = finished_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='brief-job')
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, label: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """Accoda un job e ne restituisce l'id; lo stato parte da 'queued'"""
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'owner': owner,
+            'label': label,
+            'status': 'queued',
+            'progress': 0,
+            'message': "In coda",
+            'chunks': [],
+            'warnings': [],
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._prune(owner)
+            self._expire()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job['id']
+
+    def _run(self, job: Dict, fn: Callable[..., Any], args: tuple, kwargs: Dict):
+        self._update(job, status='running', started_at=time.time(), message="Avviato")
+        token = _current.set((job, self))
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logger.exception("Job %s fallito", job['id'])
+            self._update(job, status='failed', error=str(e), finished_at=time.time())
+        else:
+            self._update(job, status='done', result=result, progress=100, message="Completato",
+                         finished_at=time.time())
+        finally:
+            _current.reset(token)
+
+    def _update(self, job: Dict, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _prune(self, owner: str):
+        """Oltre il limite per utente rimuove i job conclusi più vecchi"""
+        owned = sorted((j for j in self._jobs.values() if j['owner'] == owner), key=lambda j: j['created_at'])
+        excess = len(owned) - self.max_jobs_per_owner
+        for job in owned:
+            if excess <= 0:
+                break
+            if job['status'] not in ACTIVE_STATUSES:
+                del self._jobs[job['id']]
+                excess -= 1
+
+    def _expire(self):
+        """Rimuove i job conclusi da più di `finished_ttl` secondi e, oltre `max_finished_jobs`, i più vecchi"""
+        cutoff = time.time() - self.finished_ttl
+        finished = sorted((j for j in self._jobs.values() if j['status'] not in ACTIVE_STATUSES),
+                          key=lambda j: j['finished_at'] or j['created_at'])
+        excess = len(finished) - self.max_finished_jobs
+        for job in finished:
+            if excess > 0 or (job['finished_at'] or job['created_at']) < cutoff:
+                del self._jobs[job['id']]
+                excess -= 1
+
+    def _snapshot(self, job: Dict) -> Dict:
+        snapshot = {key: value for key, value in job.items() if key != 'chunks'}
+        snapshot['partial'] = ''.join(job['chunks'])
+        snapshot['warnings'] = list(job['warnings'])
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Copia dello stato attuale di un job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def list_jobs(self, owner: str) -> List[Dict]:
+        """Job di un utente, dal più recente"""
+        with self._lock:
+            self._expire()
+            owned = [self._snapshot(job) for job in self._jobs.values() if job['owner'] == owner]
+        return sorted(owned, key=lambda job: job['created_at'], reverse=True)
+
+    def remove(self, job_id: str) -> bool:
+        """Elimina un job concluso dal registro"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in ACTIVE_STATUSES:
+                return False
+            del self._jobs[job_id]
+            return True
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def in_job() -> bool:
+    """True se il thread corrente sta eseguendo un job del registro"""
+    return _current.get() is not None
+
+
+def report_progress(progress: int, message: str):
+    """Aggiorna avanzamento e fase del job in esecuzione nel thread corrente"""
+    if in_job():
+        job, registry = _current.get()
+        registry._update(job, progress=progress, message=message)
+
+
+def append_output(text: str):
+    """Aggiunge un frammento di output parziale (es. streaming LLM) al job corrente"""
+    if in_job():
+        job, registry = _current.get()
+        with registry._lock:
+            job['chunks'].append(text)
+
+
+def add_warning(message: str) -> bool:
+    """Registra un avviso sul job corrente; False se il thread non esegue un job"""
+    if not in_job():
+        return False
+    job, registry = _current.get()
+    with registry._lock:
+        job['warnings'].append(message)
+    return True
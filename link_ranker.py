@@ -0,0 +1,140 @@
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+# Equivalente rapido di urlparse(url).path: schema e dominio vengono scartati
+URL_PATH_PATTERN = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]*:)?(?://[^/?#]*)?([^?#]*)')
+
+# Parole vuote italiane e segmenti di URL privi di significato tematico
+STOPWORDS = frozenset({
+    'il', 'lo', 'la', 'i', 'gli', 'le', 'un', 'uno', 'una', 'di', 'del', 'della', 'dei', 'degli', 'delle',
+    'da', 'dal', 'dalla', 'in', 'nel', 'nella', 'con', 'su', 'sul', 'sulla', 'per', 'tra', 'fra', 'e', 'ed',
+    'o', 'a', 'al', 'alla', 'ai', 'agli', 'alle', 'che', 'come', 'cosa', 'quando', 'dove', 'perché', 'non',
+    'www', 'http', 'https', 'html', 'htm', 'php', 'asp', 'aspx', 'it', 'en', 'amp', 'page', 'index'
+})
+
+
+def normalize_token(token: str) -> str:
+    """Stemming leggero: rimuove la vocale finale così che singolare e plurale coincidano"""
+    if len(token) > 4 and token[-1] in 'aeiouàèéìòù':
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Divide un testo in token normalizzati escludendo le parole vuote"""
+    return [
+        normalize_token(token)
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def url_tokens(url: str) -> List[str]:
+    """Estrae i token da path (directory e slug) di una URL, ignorando il dominio"""
+    path = URL_PATH_PATTERN.match(url).group(1)
+    if '%' in path:
+        path = unquote(path)
+    return tokenize(path)
+
+
+class LinkIndex:
+    """Indice invertito BM25 sui token dei path delle URL interne"""
+
+    def __init__(self, urls: Iterable[str], titles: Optional[Dict[str, str]] = None,
+                 k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.urls: List[str] = []
+        doc_lengths: List[int] = []
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+
+        titles = titles or {}
+        for url in urls:
+            tokens = url_tokens(url)
+            if url in titles:
+                tokens.extend(tokenize(titles[url]))
+            doc_id = len(self.urls)
+            self.urls.append(url)
+            doc_lengths.append(len(tokens))
+
+            term_frequencies: Dict[str, int] = {}
+            for token in tokens:
+                term_frequencies[token] = term_frequencies.get(token, 0) + 1
+            for token, tf in term_frequencies.items():
+                doc_ids, tfs = postings.setdefault(token, ([], []))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.urls else 0.0
+        # Parte del denominatore BM25 che dipende solo dal documento: la calcoliamo una volta
+        self.length_norm = k1 * (1 - b + b * self.doc_lengths / (self.avg_doc_length or 1.0))
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            token: (np.asarray(doc_ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for token, (doc_ids, tfs) in postings.items()
+        }
+
+    def idf(self, token: str) -> float:
+        """IDF BM25 (sempre positivo) di un token"""
+        n = len(self.urls)
+        df = len(self.postings[token][0]) if token in self.postings else 0
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query_weights: Dict[str, float], top_n: int = 30) -> List[Tuple[str, float]]:
+        """Restituisce le top-N URL con punteggio BM25 positivo per i termini pesati della query"""
+        if not self.urls:
+            return []
+        scores = np.zeros(len(self.urls), dtype=np.float32)
+        k1 = self.k1
+
+        for token, weight in query_weights.items():
+            if token not in self.postings:
+                continue
+            doc_ids, tfs = self.postings[token]
+            # Ogni documento compare una sola volta per token: l'indicizzazione con += è sicura
+            scores[doc_ids] += self.idf(token) * weight * tfs * (k1 + 1) / (tfs + self.length_norm[doc_ids])
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_n:
+            candidates = candidates[np.argpartition(-scores[candidates], top_n - 1)[:top_n]]
+        # A parità di punteggio preferiamo l'URL scoperta prima (ordine stabile)
+        ordered = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [(self.urls[doc_id], float(scores[doc_id])) for doc_id in ordered]
+
+
+def build_query(main_keyword: str, keywords: Iterable[str] = (), topic: str = '',
+                related_keywords: Iterable[Dict] = (), related_limit: int = 20) -> Dict[str, float]:
+    """Costruisce i pesi della query: keyword principale > keyword utente > argomento > correlate"""
+    weights: Dict[str, float] = {}
+
+    def add(text: str, weight: float):
+        for token in tokenize(text):
+            weights[token] = max(weights.get(token, 0.0), weight)
+
+    top_related = sorted(related_keywords, key=lambda kw: kw.get('search_volume', 0), reverse=True)[:related_limit]
+    for kw in top_related:
+        add(kw['keyword'], 0.5)
+    add(topic, 0.75)
+    for keyword in keywords:
+        add(keyword, 1.0)
+    add(main_keyword, 2.0)
+    return weights
+
+
+def rank_internal_links(urls: List[str], main_keyword: str, keywords: Iterable[str] = (), topic: str = '',
+                        related_keywords: Iterable[Dict] = (), top_n: int = 30,
+                        titles: Optional[Dict[str, str]] = None, index: Optional[LinkIndex] = None) -> List[str]:
+    """Ordina le URL interne per pertinenza rispetto a keyword e argomento del brief"""
+    if not urls:
+        return []
+    index = index or LinkIndex(urls, titles=titles)
+    query = build_query(main_keyword, keywords, topic, related_keywords)
+    ranked = [url for url, _ in index.search(query, top_n=top_n)]
+    # Nessuna URL pertinente: manteniamo il comportamento precedente
+    return ranked or urls[:top_n]
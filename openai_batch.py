@@ -0,0 +1,279 @@
+"""Generazione offline di content brief tramite il formato file della OpenAI Batch API.
+
+Flusso tipico:
+    python openai_batch.py prepare piano.csv --requests richieste.jsonl
+    python openai_batch.py submit richieste.jsonl
+    python openai_batch.py fetch <batch_id> --results risultati.jsonl
+    python openai_batch.py ingest risultati.jsonl --jobs richieste.jobs.json --output briefs.zip
+
+Per provare tutto offline, `simulate` sostituisce submit/fetch leggendo il file
+delle richieste e scrivendo un file risultati nello stesso formato della Batch API.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import openai
+
+from batch import docx_filename, load_jobs, prepare_job
+from cache import DiskCache
+from content_brief import (
+    BRIEF_MAX_TOKENS,
+    BRIEF_MODEL,
+    BRIEF_TEMPERATURE,
+    ContentBriefGenerator,
+    SEODataEnhancer,
+    create_docx
+)
+from sitemap import SitemapStore
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+
+def jobs_path_for(requests_path: str) -> str:
+    """Percorso del file con i metadati dei job associato a un file di richieste"""
+    base, _ = os.path.splitext(requests_path)
+    return f"{base}.jobs.json"
+
+
+def build_request_line(custom_id: str, messages: List[Dict]) -> Dict:
+    """Riga del file di richieste Batch API per una chat completion"""
+    return {
+        'custom_id': custom_id,
+        'method': 'POST',
+        'url': BATCH_ENDPOINT,
+        'body': {
+            'model': BRIEF_MODEL,
+            'messages': messages,
+            'max_tokens': BRIEF_MAX_TOKENS,
+            'temperature': BRIEF_TEMPERATURE
+        }
+    }
+
+
+def prepare_requests(jobs: List[Dict], generator: ContentBriefGenerator, use_apis: bool,
+                     requests_path: str, workers: int = 4) -> List[Dict]:
+    """Esegue le fasi pre-LLM di ogni job e scrive il JSONL di richieste più i metadati dei job"""
+    ids = [job['id'] for job in jobs]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Gli id dei job devono essere univoci: sono usati come custom_id")
+
+    def prepare(job: Dict) -> Dict:
+        try:
+            data, keyword_analysis = prepare_job(job, generator, use_apis)
+            return {'messages': generator.build_brief_messages(data, keyword_analysis, deduplicate=False)}
+        except Exception as e:
+            return {'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        prepared = list(executor.map(prepare, jobs))
+
+    job_entries = []
+    with open(requests_path, 'w', encoding='utf-8') as f:
+        for job, result in zip(jobs, prepared):
+            entry = {'id': job['id'], 'brand': job['brand'], 'topic': job['topic']}
+            if 'error' in result:
+                entry.update({'status': 'failed', 'error': result['error']})
+                logger.error("Job %s non preparato: %s", job['id'], result['error'])
+            else:
+                f.write(json.dumps(build_request_line(job['id'], result['messages']), ensure_ascii=False) + '\n')
+                entry['status'] = 'queued'
+            job_entries.append(entry)
+
+    with open(jobs_path_for(requests_path), 'w', encoding='utf-8') as f:
+        json.dump(job_entries, f, ensure_ascii=False, indent=2)
+    return job_entries
+
+
+def _placeholder_brief(body: Dict) -> str:
+    """Risposta fittizia deterministica: riassume il prompt ricevuto"""
+    prompt = body['messages'][-1]['content']
+    preview = [line.strip() for line in prompt.splitlines() if line.strip().startswith('- ')][:5]
+    return "# Content brief (simulato)\n\n## Dati ricevuti\n" + '\n'.join(preview) + "\n"
+
+
+def simulate_batch(requests_path: str, results_path: str,
+                   responder: Optional[Callable[[Dict], str]] = None) -> int:
+    """Sostituto locale della Batch API: legge le richieste e scrive i risultati nello stesso formato"""
+    responder = responder or _placeholder_brief
+    count = 0
+    with open(requests_path, encoding='utf-8') as requests_file, \
+            open(results_path, 'w', encoding='utf-8') as results_file:
+        for number, line in enumerate(requests_file, start=1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            try:
+                content = responder(request['body'])
+                result = {
+                    'id': f"batch_req_{number}",
+                    'custom_id': request['custom_id'],
+                    'response': {
+                        'status_code': 200,
+                        'request_id': f"req_{number}",
+                        'body': {
+                            'object': 'chat.completion',
+                            'model': request['body']['model'],
+                            'choices': [{
+                                'index': 0,
+                                'message': {'role': 'assistant', 'content': content},
+                                'finish_reason': 'stop'
+                            }]
+                        }
+                    },
+                    'error': None
+                }
+            except Exception as e:
+                result = {
+                    'id': f"batch_req_{number}",
+                    'custom_id': request['custom_id'],
+                    'response': None,
+                    'error': {'code': 'simulated_error', 'message': str(e)}
+                }
+            results_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def _result_content(result: Dict) -> str:
+    """Estrae il testo del brief da una riga di risultati, sollevando un errore se assente"""
+    if result.get('error'):
+        raise RuntimeError(result['error'].get('message') or str(result['error']))
+    response = result.get('response') or {}
+    if response.get('status_code') != 200:
+        error = (response.get('body') or {}).get('error') or {}
+        raise RuntimeError(f"Risposta HTTP {response.get('status_code')}: {error.get('message') or 'errore sconosciuto'}")
+    return response['body']['choices'][0]['message']['content']
+
+
+def ingest_results(results_path: str, jobs_path: str, output_path: str) -> List[Dict]:
+    """Converte i risultati Batch API in DOCX, abbinandoli ai job tramite custom_id"""
+    with open(jobs_path, encoding='utf-8') as f:
+        job_entries = json.load(f)
+    jobs_by_id = {entry['id']: entry for entry in job_entries}
+
+    manifest = {entry['id']: dict(entry) for entry in job_entries}
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with open(results_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                job = jobs_by_id.get(result.get('custom_id'))
+                if job is None:
+                    logger.warning("Risultato con custom_id sconosciuto: %s", result.get('custom_id'))
+                    continue
+                entry = manifest[job['id']]
+                try:
+                    content = _result_content(result)
+                    filename = docx_filename(job)
+                    archive.writestr(filename, create_docx(content, job['brand'], job['topic']).getvalue())
+                    entry.update({'status': 'done', 'file': filename})
+                except Exception as e:
+                    entry.update({'status': 'failed', 'error': str(e)})
+
+        for entry in manifest.values():
+            if entry['status'] == 'queued':
+                entry.update({'status': 'missing', 'error': "Nessun risultato per questo custom_id"})
+
+        ordered = [manifest[entry['id']] for entry in job_entries]
+        archive.writestr('manifest.json', json.dumps(ordered, ensure_ascii=False, indent=2))
+    return ordered
+
+
+def submit_batch(client: openai.OpenAI, requests_path: str) -> str:
+    """Carica il file di richieste e crea il batch, restituendone l'id"""
+    with open(requests_path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose='batch')
+    created = client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window='24h')
+    return created.id
+
+
+def fetch_results(client: openai.OpenAI, batch_id: str, results_path: str) -> str:
+    """Scarica i risultati di un batch completato; restituisce lo stato del batch.
+
+    Le richieste fallite stanno nel file di errori (stesso formato JSONL, con custom_id): viene accodato
+    ai risultati, così ingest le riporta nel manifest come 'failed' con il messaggio e non come 'missing'.
+    """
+    current = client.batches.retrieve(batch_id)
+    if current.status == 'completed':
+        with open(results_path, 'wb') as f:
+            for file_id in (current.output_file_id, current.error_file_id):
+                if file_id:
+                    content = client.files.content(file_id).content
+                    f.write(content if not content or content.endswith(b'\n') else content + b'\n')
+    return current.status
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Content brief in modalità OpenAI Batch API")
+    parser.add_argument('--openai-key', default=os.environ.get('OPENAI_API_KEY'))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    prepare_parser = commands.add_parser('prepare', help="Crea il JSONL di richieste dai job")
+    prepare_parser.add_argument('jobs')
+    prepare_parser.add_argument('--requests', default='batch_requests.jsonl')
+    prepare_parser.add_argument('--workers', type=int, default=4)
+    prepare_parser.add_argument('--semrush-key', default=os.environ.get('SEMRUSH_API_KEY'))
+    prepare_parser.add_argument('--serper-key', default=os.environ.get('SERPER_API_KEY'))
+
+    submit_parser = commands.add_parser('submit', help="Invia il file di richieste alla Batch API")
+    submit_parser.add_argument('requests')
+
+    fetch_parser = commands.add_parser('fetch', help="Scarica i risultati di un batch completato")
+    fetch_parser.add_argument('batch_id')
+    fetch_parser.add_argument('--results', default='batch_results.jsonl')
+
+    simulate_parser = commands.add_parser('simulate', help="Produce risultati simulati in locale, senza rete")
+    simulate_parser.add_argument('requests')
+    simulate_parser.add_argument('--results', default='batch_results.jsonl')
+
+    ingest_parser = commands.add_parser('ingest', help="Converte i risultati in DOCX")
+    ingest_parser.add_argument('results')
+    ingest_parser.add_argument('--jobs', required=True, help="File .jobs.json creato da prepare")
+    ingest_parser.add_argument('--output', default='content_briefs.zip')
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.command == 'prepare':
+        seo_enhancer = SEODataEnhancer(args.semrush_key, args.serper_key, cache=DiskCache())
+        # Il client OpenAI non viene usato in questa fase: basta una chiave segnaposto
+        generator = ContentBriefGenerator(args.openai_key or 'offline', seo_enhancer, sitemap_store=SitemapStore())
+        entries = prepare_requests(load_jobs(args.jobs), generator, bool(args.semrush_key or args.serper_key),
+                                   args.requests, args.workers)
+        queued = sum(1 for entry in entries if entry['status'] == 'queued')
+        logger.info("%d richieste scritte in %s (metadati in %s)", queued, args.requests, jobs_path_for(args.requests))
+        return 0 if queued == len(entries) else 1
+
+    if args.command == 'simulate':
+        count = simulate_batch(args.requests, args.results)
+        logger.info("%d risultati simulati scritti in %s", count, args.results)
+        return 0
+
+    if args.command == 'ingest':
+        manifest = ingest_results(args.results, args.jobs, args.output)
+        done = sum(1 for entry in manifest if entry['status'] == 'done')
+        logger.info("%d/%d brief convertiti in DOCX -> %s", done, len(manifest), args.output)
+        return 0 if done == len(manifest) else 1
+
+    if not args.openai_key:
+        parser.error("OpenAI API key mancante (--openai-key o OPENAI_API_KEY)")
+    client = openai.OpenAI(api_key=args.openai_key)
+    if args.command == 'submit':
+        logger.info("Batch creato: %s", submit_batch(client, args.requests))
+        return 0
+    status = fetch_results(client, args.batch_id, args.results)
+    logger.info("Stato batch %s: %s", args.batch_id, status)
+    return 0 if status == 'completed' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
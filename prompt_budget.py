@@ -0,0 +1,139 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding('o200k_base')
+except Exception:
+    _ENCODING = None
+
+# Stima usata quando tiktoken non è installato: circa 4 caratteri per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Stima il numero di token di un testo (esatto se tiktoken è disponibile)"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Tronca un testo a circa `max_tokens` token, preferibilmente a fine parola"""
+    if max_tokens <= 0:
+        return ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        truncated = _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        truncated = text[:max_tokens * CHARS_PER_TOKEN]
+    cut = truncated.rfind(' ')
+    return truncated[:cut] if cut > len(truncated) * 0.8 else truncated
+
+
+class PromptSection:
+    """Sezione del prompt composta da elementi riducibili.
+
+    kind='lines': gli elementi sono righe in ordine di importanza, si eliminano dal fondo.
+    kind='texts': gli elementi sono testi lunghi che si troncano in modo equo.
+    """
+
+    def __init__(self, name: str, items: List[str], priority: int, kind: str = 'lines',
+                 min_items: int = 0, min_item_tokens: int = 0, max_item_tokens: Optional[int] = None):
+        self.name = name
+        self.items = list(items)
+        self.priority = priority
+        self.kind = kind
+        self.min_items = min_items
+        self.min_item_tokens = min_item_tokens
+        self.max_item_tokens = max_item_tokens
+
+
+def _water_level(sizes: List[int], target: int, floor: int) -> int:
+    """Tetto per elemento tale che sum(min(size, tetto)) <= target, senza scendere sotto floor"""
+    level = max(sizes) if sizes else 0
+    low, high = floor, level
+    while low < high:
+        middle = (low + high + 1) // 2
+        if sum(min(size, middle) for size in sizes) <= target:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _is_header(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and stripped.endswith(':') and not stripped.startswith('-')
+
+
+def fit_sections(sections: List[PromptSection], budget: int, fixed_tokens: int = 0,
+                 estimator: Callable[[str], int] = estimate_tokens) -> Tuple[Dict[str, List[str]], List[Dict]]:
+    """Riduce le sezioni partendo da quelle a priorità più bassa finché il prompt rientra nel budget"""
+    kept: Dict[str, List[str]] = {}
+    sizes: Dict[str, List[int]] = {}
+    original: Dict[str, int] = {}
+
+    for section in sections:
+        items = section.items
+        if section.kind == 'texts' and section.max_item_tokens:
+            items = [truncate_to_tokens(item, section.max_item_tokens) for item in items]
+        kept[section.name] = items
+        sizes[section.name] = [estimator(item) for item in items]
+        original[section.name] = sum(estimator(item) for item in section.items)
+
+    excess = fixed_tokens + sum(sum(s) for s in sizes.values()) - budget
+    for section in sorted(sections, key=lambda s: s.priority):
+        if excess <= 0:
+            break
+        items = kept[section.name]
+        item_sizes = sizes[section.name]
+        current = sum(item_sizes)
+
+        if section.kind == 'texts':
+            floor = min([section.min_item_tokens] + item_sizes) if item_sizes else 0
+            level = _water_level(item_sizes, max(0, current - excess), floor)
+            items = [truncate_to_tokens(item, level) if size > level else item
+                     for item, size in zip(items, item_sizes)]
+        else:
+            remaining = current
+            while len(items) > section.min_items and current - remaining < excess:
+                remaining -= item_sizes[len(items) - 1]
+                items = items[:-1]
+            # Non lasciamo titoli di gruppo senza elementi in coda
+            while len(items) > section.min_items and _is_header(items[-1]):
+                items = items[:-1]
+
+        kept[section.name] = items
+        sizes[section.name] = [estimator(item) for item in items]
+        excess -= current - sum(sizes[section.name])
+
+    report = []
+    for section in sections:
+        kept_tokens = sum(sizes[section.name])
+        if kept_tokens < original[section.name]:
+            report.append({
+                'section': section.name,
+                'original_tokens': original[section.name],
+                'kept_tokens': kept_tokens,
+                'dropped_items': len(section.items) - len(kept[section.name])
+            })
+    return kept, report
+
+
+def log_budget_report(report: List[Dict], total_tokens: int, budget: int):
+    """Registra nel log cosa è stato tagliato per rientrare nel budget"""
+    if not report:
+        logger.info("Prompt di %d token entro il budget di %d: nessun taglio", total_tokens, budget)
+        return
+    details = ', '.join(
+        f"{entry['section']}: {entry['original_tokens']}->{entry['kept_tokens']} token"
+        + (f" ({entry['dropped_items']} elementi rimossi)" if entry['dropped_items'] else '')
+        for entry in report
+    )
+    logger.info("Prompt ridotto a %d token (budget %d). Tagli: %s", total_tokens, budget, details)
@@ -0,0 +1,293 @@
+"""Registrazione e riproduzione (cassette) del traffico HTTP verso SEMrush, Serper, sitemap e OpenAI.
+
+Le risposte reali vengono salvate una volta in un file JSON e poi riprodotte senza rete,
+con latenza ed errori iniettabili tramite un profilo per host. Modalità:
+    record  -> chiama sempre la rete e registra le risposte
+    replay  -> usa solo la cassette; una richiesta non registrata è un errore
+    once    -> riproduce se presente, altrimenti chiama la rete e registra
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3 import HTTPResponse
+
+try:
+    # Le versioni recenti dell'SDK OpenAI usano il fork httpx2, le precedenti httpx
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+CASSETTE_MODES = ('record', 'replay', 'once')
+
+# Parametri e header con credenziali: mai salvati né usati per abbinare le richieste
+SECRET_PARAMS = frozenset({'key', 'api_key', 'apikey'})
+# Header di risposta conservati nella cassette (gli altri possono contenere id di account)
+KEPT_RESPONSE_HEADERS = ('content-type', 'etag', 'last-modified', 'retry-after')
+
+
+class CassetteMissError(Exception):
+    """Richiesta non presente nella cassette in modalità replay"""
+
+
+class FaultProfile:
+    """Latenza ed errori iniettati in riproduzione, per host, con generatore casuale a seme fisso.
+
+    Esempio di profilo JSON:
+        {"seed": 42,
+         "default": {"latency": 0.05},
+         "hosts": {"api.semrush.com": {"latency": 0.8, "jitter": 0.4, "error_rate": 0.1,
+                                       "error_status": 503, "timeout_rate": 0.05}}}
+    """
+
+    def __init__(self, default: Optional[Dict] = None, hosts: Optional[Dict[str, Dict]] = None, seed: int = 0):
+        self.default = default or {}
+        self.hosts = hosts or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'FaultProfile':
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('default'), config.get('hosts'), config.get('seed', 0))
+
+    def decide(self, host: str, timeout: Optional[float]) -> Tuple[float, Optional[str], int]:
+        """Restituisce (attesa in secondi, esito 'error'/'timeout'/None, status dell'errore)"""
+        rule = {**self.default, **self.hosts.get(host, {})}
+        with self._lock:
+            delay = max(0.0, rule.get('latency', 0.0) + self._random.uniform(0, rule.get('jitter', 0.0)))
+            draw = self._random.random()
+        outcome = None
+        if draw < rule.get('timeout_rate', 0.0):
+            outcome = 'timeout'
+        elif draw < rule.get('timeout_rate', 0.0) + rule.get('error_rate', 0.0):
+            outcome = 'error'
+        if timeout is not None and delay >= timeout:
+            delay, outcome = timeout, 'timeout'
+        return delay, outcome, rule.get('error_status', 503)
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+def _body_digest(body: Optional[bytes]) -> str:
+    if not body:
+        return ''
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode('utf-8')
+    except ValueError:
+        pass
+    return hashlib.sha256(body).hexdigest()
+
+
+class Cassette:
+    """File JSON di interazioni HTTP registrate, condiviso da tutti i trasporti che lo usano"""
+
+    def __init__(self, path: str, mode: str = 'once', faults: Optional[FaultProfile] = None):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Modalità cassette non valida: {mode}")
+        self.path = path
+        self.mode = mode
+        self.faults = faults
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, list] = {}
+        self._replayed: Dict[str, int] = {}
+        if os.path.exists(path) and mode != 'record':
+            with open(path, encoding='utf-8') as f:
+                for interaction in json.load(f).get('interactions', []):
+                    self._interactions.setdefault(interaction['key'], []).append(interaction)
+
+    @staticmethod
+    def make_key(method: str, url: str, body: Optional[bytes]) -> str:
+        return f"{method.upper()} {_normalize_url(url)} {_body_digest(body)}".rstrip()
+
+    def lookup(self, method: str, url: str, body: Optional[bytes]) -> Optional[Dict]:
+        """Risposta registrata per la richiesta; richieste ripetute riproducono le registrazioni in ordine"""
+        if self.mode == 'record':
+            return None
+        key = self.make_key(method, url, body)
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                if self.mode == 'replay':
+                    raise CassetteMissError(f"Richiesta non registrata nella cassette {self.path}: {key}")
+                return None
+            position = self._replayed.get(key, 0)
+            self._replayed[key] = position + 1
+            return recorded[min(position, len(recorded) - 1)]['response']
+
+    def record(self, method: str, url: str, body: Optional[bytes], status: int, headers, content: bytes):
+        """Aggiunge un'interazione e riscrive la cassette su disco"""
+        key = self.make_key(method, url, body)
+        try:
+            stored_body, encoding = content.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            stored_body, encoding = base64.b64encode(content).decode('ascii'), 'base64'
+        interaction = {
+            'key': key,
+            'request': {'method': method.upper(), 'url': _normalize_url(url)},
+            'response': {
+                'status': status,
+                'headers': {name: value for name, value in headers.items() if name.lower() in KEPT_RESPONSE_HEADERS},
+                'body': stored_body,
+                'encoding': encoding
+            }
+        }
+        with self._lock:
+            self._interactions.setdefault(key, []).append(interaction)
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        interactions = [item for items in self._interactions.values() for item in items]
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'interactions': interactions}, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+    def inject_faults(self, url: str, timeout: Optional[float]) -> Optional[int]:
+        """Applica la latenza del profilo; restituisce lo status d'errore da simulare o solleva TimeoutError"""
+        if self.faults is None:
+            return None
+        delay, outcome, error_status = self.faults.decide(urlsplit(url).hostname or '', timeout)
+        if delay:
+            time.sleep(delay)
+        if outcome == 'timeout':
+            raise TimeoutError(f"Timeout simulato dopo {delay:.2f}s")
+        return error_status if outcome == 'error' else None
+
+
+def _response_content(response: Dict) -> bytes:
+    if response.get('encoding') == 'base64':
+        return base64.b64decode(response['body'])
+    return response['body'].encode('utf-8')
+
+
+def _fault_response(status: int) -> Dict:
+    return {'status': status, 'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'error': 'Errore simulato dal profilo di fault'}), 'encoding': 'utf-8'}
+
+
+class CassetteAdapter(BaseAdapter):
+    """Adapter requests che registra o riproduce le risposte, delegando la rete all'adapter originale"""
+
+    def __init__(self, cassette: Cassette, inner: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+        recorded = self.cassette.lookup(request.method, request.url, body)
+        if recorded is None:
+            response = self.inner.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+            content = response.content
+            self.cassette.record(request.method, request.url, body, response.status_code, response.headers, content)
+            recorded = {'status': response.status_code, 'headers': dict(response.headers),
+                        'body': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'}
+        else:
+            read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+            try:
+                error_status = self.cassette.inject_faults(request.url, read_timeout)
+            except TimeoutError as e:
+                raise requests.exceptions.ReadTimeout(str(e), request=request)
+            if error_status:
+                recorded = _fault_response(error_status)
+        return self._build_response(request, recorded)
+
+    def _build_response(self, request, recorded: Dict) -> requests.Response:
+        content = _response_content(recorded)
+        headers = {name: value for name, value in recorded['headers'].items()
+                   if name.lower() in KEPT_RESPONSE_HEADERS}
+        headers['Content-Length'] = str(len(content))
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers = CaseInsensitiveDict(headers)
+        # raw compatibile con lo streaming (es. parsing incrementale delle sitemap)
+        response.raw = HTTPResponse(body=io.BytesIO(content), headers=headers, status=recorded['status'],
+                                    preload_content=False, decode_content=False)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """Trasporto httpx per il client OpenAI che registra o riproduce le risposte"""
+
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.BaseTransport] = None):
+        self.cassette = cassette
+        self.inner = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        body = request.read()
+        url = str(request.url)
+        recorded = self.cassette.lookup(request.method, url, body)
+        if recorded is None:
+            response = self.inner.handle_request(request)
+            try:
+                content = response.read()
+            finally:
+                response.close()
+            self.cassette.record(request.method, url, body, response.status_code, response.headers, content)
+            recorded = {'status': response.status_code, 'headers': dict(response.headers),
+                        'body': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'}
+        else:
+            read_timeout = (request.extensions.get('timeout') or {}).get('read')
+            try:
+                error_status = self.cassette.inject_faults(url, read_timeout)
+            except TimeoutError as e:
+                raise httpx.ReadTimeout(str(e), request=request)
+            if error_status:
+                recorded = _fault_response(error_status)
+        headers = {name: value for name, value in recorded['headers'].items()
+                   if name.lower() in KEPT_RESPONSE_HEADERS}
+        return httpx.Response(recorded['status'], headers=headers, content=_response_content(recorded),
+                              request=request)
+
+    def close(self):
+        self.inner.close()
+
+
+def install_cassette(session: requests.Session, cassette: Cassette) -> requests.Session:
+    """Inserisce la cassette sotto tutti gli adapter montati sulla sessione"""
+    for prefix, adapter in list(session.adapters.items()):
+        if not isinstance(adapter, CassetteAdapter):
+            session.mount(prefix, CassetteAdapter(cassette, adapter))
+    return session
+
+
+def cassette_http_client(cassette: Cassette):
+    """Client httpx da passare a openai.OpenAI(http_client=...)"""
+    return httpx.Client(transport=CassetteTransport(cassette))
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """Cassette configurata da CONTENT_BRIEF_CASSETTE, _CASSETTE_MODE e _FAULTS, se presente"""
+    path = os.environ.get('CONTENT_BRIEF_CASSETTE')
+    if not path:
+        return None
+    faults_path = os.environ.get('CONTENT_BRIEF_FAULTS')
+    faults = FaultProfile.load(faults_path) if faults_path else None
+    return Cassette(path, os.environ.get('CONTENT_BRIEF_CASSETTE_MODE', 'once'), faults)
@@ -0,0 +1,339 @@
+import gzip
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+from urllib.parse import urlparse
+
+from cache import DEFAULT_CACHE_DIR
+from http_client import get_session
+from tracing import bind_context, set_span_attributes, traced
+
+SITEMAP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; SEO-Tool/1.0; +http://www.example.com/bot)'
+}
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"\']+(?:/[^\s<>"\']*)?')
+
+# Quanti byte del body conservare per il fallback regex su XML non valido
+FALLBACK_BUFFER_BYTES = 1024 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+
+class _RecordingReader(io.RawIOBase):
+    """Wrapper di uno stream che conserva i primi byte letti per il fallback regex"""
+
+    def __init__(self, stream, limit: int = FALLBACK_BUFFER_BYTES):
+        self.stream = stream
+        self.limit = limit
+        self.buffer = bytearray()
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self.stream.read(len(b))
+        n = len(data)
+        b[:n] = data
+        self.bytes_read += n
+        if len(self.buffer) < self.limit:
+            self.buffer.extend(data[:self.limit - len(self.buffer)])
+        return n
+
+
+def open_sitemap_stream(raw) -> io.BufferedReader:
+    """Restituisce uno stream binario del body, decomprimendo in modo trasparente i .xml.gz"""
+    stream = raw if isinstance(raw, io.BufferedReader) else io.BufferedReader(raw)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        return io.BufferedReader(gzip.GzipFile(fileobj=stream))
+    return stream
+
+
+def iter_sitemap_entries(stream) -> Iterator[Dict]:
+    """Genera le voci <sitemap> e <url> (loc e lastmod) con iterparse a memoria costante.
+
+    Valgono solo loc e lastmod del namespace sitemap figli diretti della voce: i <loc> delle estensioni
+    (image:loc, video:content_loc, ...) annidati nella voce non sostituiscono l'URL della pagina.
+    """
+    root = None
+    depth = 0
+    loc = None
+    lastmod = None
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 2 and elem.tag == SITEMAP_NS + 'loc':
+            loc = (elem.text or '').strip()
+        elif depth == 2 and elem.tag == SITEMAP_NS + 'lastmod':
+            lastmod = (elem.text or '').strip() or None
+        elif depth == 1 and elem.tag in (SITEMAP_NS + 'url', SITEMAP_NS + 'sitemap'):
+            if loc:
+                yield {'type': elem.tag[len(SITEMAP_NS):], 'loc': loc, 'lastmod': lastmod}
+            loc = None
+            lastmod = None
+            # Libera gli elementi già elaborati così l'albero non cresce
+            elem.clear()
+            root.clear()
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[str], List[str]]:
+    """Restituisce (sitemap figlie, URL pagine) contenute in una sitemap XML, anche gzip"""
+    child_sitemaps = []
+    page_urls = []
+    for entry in iter_sitemap_entries(open_sitemap_stream(io.BytesIO(content))):
+        if entry['type'] == 'sitemap':
+            child_sitemaps.append(entry['loc'])
+        else:
+            page_urls.append(entry['loc'])
+    if child_sitemaps:
+        return child_sitemaps, []
+    return [], page_urls
+
+
+class SitemapStore:
+    """Archivio persistente su SQLite delle sitemap già visitate per sito, con validatori HTTP"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, 'sitemaps.sqlite')
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sitemaps (
+                    site TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    index_lastmod TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (site, url)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    site TEXT NOT NULL,
+                    sitemap_url TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    loc TEXT NOT NULL,
+                    lastmod TEXT,
+                    PRIMARY KEY (site, sitemap_url, loc)
+                )"""
+            )
+            self._conn.commit()
+
+    def get_sitemap(self, site: str, url: str) -> Optional[Dict]:
+        """Restituisce validatori e lastmod salvati per una sitemap"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, index_lastmod FROM sitemaps WHERE site = ? AND url = ?",
+                (site, url)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'index_lastmod': row[2]}
+
+    def get_entries(self, site: str, url: str) -> Tuple[List[Dict], List[str]]:
+        """Restituisce (sitemap figlie, URL pagine) salvate per una sitemap"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT type, loc, lastmod FROM entries WHERE site = ? AND sitemap_url = ? ORDER BY rowid",
+                (site, url)
+            ).fetchall()
+        child_sitemaps = [{'loc': loc, 'lastmod': lastmod} for kind, loc, lastmod in rows if kind == 'sitemap']
+        page_urls = [loc for kind, loc, _ in rows if kind == 'url']
+        return child_sitemaps, page_urls
+
+    def save_sitemap(self, site: str, url: str, etag: Optional[str], last_modified: Optional[str],
+                     index_lastmod: Optional[str], entries: List[Dict]) -> Dict:
+        """Aggiorna una sitemap applicando solo le differenze rispetto alle voci salvate"""
+        new_entries = {entry['loc']: entry for entry in entries}
+        with self._lock:
+            existing = {
+                loc: lastmod for loc, lastmod in self._conn.execute(
+                    "SELECT loc, lastmod FROM entries WHERE site = ? AND sitemap_url = ?", (site, url)
+                )
+            }
+            removed = [(site, url, loc) for loc in existing if loc not in new_entries]
+            upserts = [
+                (site, url, entry['type'], loc, entry.get('lastmod'))
+                for loc, entry in new_entries.items()
+                if loc not in existing or existing[loc] != entry.get('lastmod')
+            ]
+            self._conn.executemany(
+                "DELETE FROM entries WHERE site = ? AND sitemap_url = ? AND loc = ?", removed
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (site, sitemap_url, type, loc, lastmod) VALUES (?, ?, ?, ?, ?)",
+                upserts
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sitemaps (site, url, etag, last_modified, index_lastmod, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (site, url, etag, last_modified, index_lastmod, time.time())
+            )
+            self._conn.commit()
+        return {'added': len([u for u in upserts if u[3] not in existing]), 'removed': len(removed)}
+
+    def touch(self, site: str, url: str, index_lastmod: Optional[str]):
+        """Registra una verifica senza modifiche (304 o lastmod invariato)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sitemaps SET fetched_at = ?, index_lastmod = COALESCE(?, index_lastmod) WHERE site = ? AND url = ?",
+                (time.time(), index_lastmod, site, url)
+            )
+            self._conn.commit()
+
+
+class SitemapCrawler:
+    """Crawler concorrente di sitemap e sitemap index con limiti di concorrenza, URL e tempo"""
+
+    def __init__(self, session: Optional[requests.Session] = None, max_workers: int = 8,
+                 max_urls: int = 5000, deadline: float = 30.0, timeout: float = 15.0,
+                 store: Optional[SitemapStore] = None):
+        self.session = session or get_session()
+        self.max_workers = max_workers
+        self.max_urls = max_urls
+        self.deadline = deadline
+        self.timeout = timeout
+        self.store = store
+        self.errors: List[Dict] = []
+        self.stats = {'fetched': 0, 'not_modified': 0, 'skipped_unchanged': 0, 'added': 0, 'removed': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    @traced('sitemap.fetch')
+    def _fetch_and_parse(self, url: str, index_lastmod: Optional[str] = None) -> Tuple[List[Dict], List[str]]:
+        """Scarica in streaming una sitemap e ne estrae il contenuto riusando il body in caso di XML non valido"""
+        site = urlparse(url).netloc
+        set_span_attributes(url=url)
+        headers = dict(SITEMAP_HEADERS)
+        known = self.store.get_sitemap(site, url) if self.store else None
+        if known:
+            # La sitemap index dichiara la figlia invariata: nessuna richiesta
+            if index_lastmod and known['index_lastmod'] == index_lastmod:
+                self._count('skipped_unchanged')
+                set_span_attributes(result='skipped_unchanged')
+                return self.store.get_entries(site, url)
+            if known['etag']:
+                headers['If-None-Match'] = known['etag']
+            if known['last_modified']:
+                headers['If-Modified-Since'] = known['last_modified']
+
+        child_sitemaps = []
+        page_urls = []
+        complete = True
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        try:
+            if response.status_code == 304 and known:
+                self._count('not_modified')
+                set_span_attributes(result='not_modified', http_status=304)
+                self.store.touch(site, url, index_lastmod)
+                return self.store.get_entries(site, url)
+
+            response.raise_for_status()
+            self._count('fetched')
+            response.raw.decode_content = True
+            recorder = _RecordingReader(response.raw)
+            try:
+                for entry in iter_sitemap_entries(open_sitemap_stream(recorder)):
+                    if entry['type'] == 'sitemap':
+                        child_sitemaps.append(entry)
+                    elif not child_sitemaps:
+                        page_urls.append(entry)
+                        if len(page_urls) >= self.max_urls:
+                            complete = False
+                            break
+            except (ET.ParseError, OSError, EOFError):
+                complete = False
+                body = bytes(recorder.buffer)
+                if body[:2] == GZIP_MAGIC:
+                    # Il buffer può essere troncato: decompressione parziale
+                    body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body)
+                text = body.decode(response.encoding or 'utf-8', errors='replace')
+                page_urls.extend({'type': 'url', 'loc': loc, 'lastmod': None} for loc in URL_PATTERN.findall(text)[:50])
+        finally:
+            response.close()
+        set_span_attributes(result='fetched', http_status=response.status_code, bytes=recorder.bytes_read,
+                            complete=complete)
+
+        # Salviamo solo sitemap lette per intero, altrimenti il diff cancellerebbe URL valide
+        if self.store and complete:
+            changes = self.store.save_sitemap(
+                site, url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                index_lastmod, child_sitemaps or page_urls
+            )
+            self._count('added', changes['added'])
+            self._count('removed', changes['removed'])
+
+        if child_sitemaps:
+            return [{'loc': c['loc'], 'lastmod': c['lastmod']} for c in child_sitemaps], []
+        return [], [entry['loc'] for entry in page_urls]
+
+    def crawl(self, sitemap_url: str) -> List[str]:
+        """Visita la sitemap e tutte le sitemap figlie restituendo le URL uniche in ordine di scoperta"""
+        self.errors = []
+        self.stats = {key: 0 for key in self.stats}
+        started_at = time.monotonic()
+        seen_sitemaps = {sitemap_url}
+        seen_urls = set()
+        urls: List[str] = []
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = {executor.submit(bind_context(self._fetch_and_parse), sitemap_url): sitemap_url}
+        try:
+            while pending and len(urls) < self.max_urls:
+                remaining = self.deadline - (time.monotonic() - started_at)
+                if remaining <= 0:
+                    self.errors.append({'url': sitemap_url, 'error': f'Tempo massimo di {self.deadline}s superato'})
+                    break
+
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if len(urls) >= self.max_urls:
+                        break
+                    url = pending.pop(future)
+                    try:
+                        child_sitemaps, page_urls = future.result()
+                    except Exception as e:
+                        self.errors.append({'url': url, 'error': str(e)})
+                        continue
+
+                    for child in child_sitemaps:
+                        if child['loc'] not in seen_sitemaps:
+                            seen_sitemaps.add(child['loc'])
+                            pending[executor.submit(bind_context(self._fetch_and_parse), child['loc'], child['lastmod'])] = child['loc']
+
+                    for page_url in page_urls:
+                        if len(urls) >= self.max_urls:
+                            break
+                        if page_url not in seen_urls:
+                            seen_urls.add(page_url)
+                            urls.append(page_url)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        return urls
@@ -0,0 +1,92 @@
+import pytest
+
+import cache
+from cache import DiskCache
+
+
+class _Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache.time, 'time', clock)
+    return clock
+
+
+def test_ttl_per_endpoint_and_expiry(tmp_path, clock):
+    disk = DiskCache(str(tmp_path / 'api.sqlite'), ttls={'serper_search': 60})
+    disk.set('serper_search', 'q', {'organic': []})
+    disk.set('altro', 'x', 1)
+
+    clock.now += 59
+    assert disk.get('serper_search', 'q') == {'organic': []}
+    clock.now += 1
+    assert disk.get('serper_search', 'q') is None
+    # Gli endpoint senza TTL dedicato usano default_ttl (24 ore)
+    assert disk.get('altro', 'x') == 1
+    clock.now += 24 * 3600
+    assert disk.get('altro', 'x') is None
+    assert disk.stats()['entries'] == 0
+
+
+def test_explicit_ttl_overrides_endpoint_ttl(tmp_path, clock):
+    disk = DiskCache(str(tmp_path / 'api.sqlite'))
+    disk.set('semrush_phrase_organic', 'k', 'v', ttl=10)
+    clock.now += 10
+    assert disk.get('semrush_phrase_organic', 'k') is None
+
+
+def test_lru_eviction_removes_least_recently_read(tmp_path, clock):
+    value = 'x' * 100
+    entry_size = len(f'"{value}"')
+    disk = DiskCache(str(tmp_path / 'api.sqlite'), max_size_bytes=3 * entry_size)
+    for key in ('a', 'b', 'c'):
+        disk.set('ns', key, value)
+        clock.now += 1
+    # Leggere 'a' la rende la più recente: l'inserimento di 'd' deve togliere 'b'
+    assert disk.get('ns', 'a') == value
+    clock.now += 1
+    disk.set('ns', 'd', value)
+
+    assert disk.get('ns', 'b') is None
+    assert all(disk.get('ns', key) == value for key in ('a', 'c', 'd'))
+    assert disk.stats()['size_bytes'] == 3 * entry_size
+
+
+def test_values_larger_than_the_cache_are_not_stored(tmp_path, clock):
+    disk = DiskCache(str(tmp_path / 'api.sqlite'), max_size_bytes=10)
+    disk.set('ns', 'big', 'x' * 100)
+    assert disk.get('ns', 'big') is None
+
+
+def test_hit_and_miss_stats_by_endpoint(tmp_path, clock):
+    disk = DiskCache(str(tmp_path / 'api.sqlite'))
+    disk.set('serper_search', 'q', [1, 2])
+    disk.get('serper_search', 'q')
+    disk.get('serper_search', 'q')
+    disk.get('serper_search', 'nuova')
+    disk.get('semrush_phrase_related', 'k')
+
+    stats = disk.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 2
+    assert stats['hits_by_endpoint'] == {'serper_search': 2}
+    assert stats['misses_by_endpoint'] == {'serper_search': 1, 'semrush_phrase_related': 1}
+    assert stats['entries'] == 1
+
+
+def test_entries_survive_reopening(tmp_path, clock):
+    path = str(tmp_path / 'api.sqlite')
+    DiskCache(path).set('serper_search', 'q', {'a': 1})
+    assert DiskCache(path).get('serper_search', 'q') == {'a': 1}
+
+
+def test_make_key_ignores_parameter_order():
+    assert DiskCache.make_key('ns', a=1, b='x') == DiskCache.make_key('ns', b='x', a=1)
+    assert DiskCache.make_key('ns', a=1) != DiskCache.make_key('ns', a=2)
+    assert DiskCache.make_key('ns', a=1).startswith('ns:')
@@ -0,0 +1,15 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from competitor_fetcher import FETCH_USER_AGENT, CompetitorFetcher
+
+
+@pytest.mark.parametrize('status, allowed', [(200, True), (404, True), (401, False), (403, False),
+                                             (500, False), (503, False)])
+def test_robots_status_codes(status, allowed):
+    session = MagicMock()
+    session.get.return_value.status_code = status
+    session.get.return_value.iter_content.return_value = [b"User-agent: *\nDisallow: /privato\n"]
+    robots = CompetitorFetcher(session=session)._robots_for('https', 'example.it')
+    assert (robots is None or robots.can_fetch(FETCH_USER_AGENT, 'https://example.it/guida')) is allowed
@@ -0,0 +1,75 @@
+from competitor_parser import parse_competitor_content, parse_html, parse_text
+
+PAGE = b"""<!DOCTYPE html>
+<html><head><title>Mutuo prima casa | Banca</title>
+<meta name="description" content="Guida al mutuo   prima casa"></head>
+<body>
+<nav><a href="/">Home</a> <a href="/mutui">Mutui</a></nav>
+<h1>Mutuo prima casa</h1>
+<p>Il mutuo prima casa <strong>finanzia</strong> l'acquisto dell'abitazione principale.</p>
+<h2>Requisiti</h2>
+<ul><li>Residenza nel comune</li><li>Nessun altro immobile<ul><li>nemmeno in comproprieta</li></ul></li></ul>
+<table><tr><th>Durata</th><th>Tasso</th></tr><tr><td>20 anni</td><td>3,1%</td></tr></table>
+<footer>Copyright Banca S.p.A. P.IVA 01234567890</footer>
+</body></html>"""
+
+
+def test_parse_html_extracts_structure_and_strips_navigation():
+    structure = parse_html(PAGE)
+    assert structure['title'] == 'Mutuo prima casa | Banca'
+    assert structure['meta_description'] == 'Guida al mutuo prima casa'
+    assert structure['headings'] == [(1, 'Mutuo prima casa'), (2, 'Requisiti')]
+    assert structure['paragraphs'] == ["Il mutuo prima casa finanzia l'acquisto dell'abitazione principale."]
+    assert structure['lists'] == [['Residenza nel comune', 'Nessun altro immobile'], ['nemmeno in comproprieta']]
+    assert structure['tables'] == [[['Durata', 'Tasso'], ['20 anni', '3,1%']]]
+    assert 'Home' not in structure['text']
+    assert 'Copyright' not in structure['text']
+
+
+def test_parse_html_charset_from_meta_and_from_header():
+    body = '<html><head><meta charset="iso-8859-1"></head><body><p>Perché è già così</p></body></html>'
+    assert parse_html(body.encode('iso-8859-1'))['paragraphs'] == ['Perché è già così']
+    without_meta = '<html><body><p>Perché è già così</p></body></html>'.encode('cp1252')
+    assert parse_html(without_meta, encoding='cp1252')['paragraphs'] == ['Perché è già così']
+    assert parse_html('<p>Perché è già così</p>')['paragraphs'] == ['Perché è già così']
+
+
+def test_page_wrapped_in_a_form_keeps_its_content():
+    page = b"""<html><body><form method="post" action="./Default.aspx" id="form1">
+    <input type="hidden" name="__VIEWSTATE" value="abc">
+    <h1>Tassi dei mutui</h1><p>I tassi fissi sono scesi per il terzo mese consecutivo.</p>
+    <form><input name="q"> Cerca nel sito</form>
+    </form><form><input name="email"> Iscriviti</form></body></html>"""
+    structure = parse_competitor_content(page)
+    assert structure['format'] == 'html'
+    assert structure['headings'] == [(1, 'Tassi dei mutui')]
+    assert structure['paragraphs'] == ['I tassi fissi sono scesi per il terzo mese consecutivo.']
+    assert 'Cerca' not in structure['text'] and 'Iscriviti' not in structure['text']
+
+
+def test_parse_text_headings_lists_and_paragraphs():
+    structure = parse_text(
+        "# Mutuo prima casa #\n"
+        "Il mutuo finanzia l'acquisto\n"
+        "dell'abitazione principale.\n"
+        "\n"
+        "QUALI SONO I REQUISITI\n"
+        "- Residenza nel comune\n"
+        "\n"
+        "- Nessun altro immobile\n"
+        "1. Richiedi la perizia\n"
+        "2) Firma dal notaio\n"
+        "Quanto costa un mutuo oggi?\n"
+    )
+    assert structure['format'] == 'text'
+    assert structure['headings'] == [(1, 'Mutuo prima casa'), (2, 'QUALI SONO I REQUISITI'),
+                                     (2, 'Quanto costa un mutuo oggi?')]
+    assert structure['paragraphs'] == ["Il mutuo finanzia l'acquisto dell'abitazione principale."]
+    assert structure['lists'] == [['Residenza nel comune', 'Nessun altro immobile'],
+                                  ['Richiedi la perizia', 'Firma dal notaio']]
+
+
+def test_plain_text_bytes_are_decoded_with_the_given_encoding():
+    structure = parse_competitor_content('Perché il tasso è più alto'.encode('cp1252'), encoding='cp1252')
+    assert structure['format'] == 'text'
+    assert structure['paragraphs'] == ['Perché il tasso è più alto']
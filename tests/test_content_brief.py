@@ -0,0 +1,99 @@
+import cache
+import content_brief
+from cache import DEFAULT_TTLS, DiskCache
+from content_brief import ContentBriefGenerator, process_competitor_content
+
+PAGES = [
+    "Il tasso fisso è importante per chi vuole stabilità nel mutuo prima casa.\n"
+    "Il mutuo prima casa richiede anticipo, reddito stabile e perizia dell'immobile.",
+    "Scegliere la durata è fondamentale: il mutuo prima casa costa meno con la surroga.\n"
+    "La detrazione degli interessi passivi riguarda il mutuo prima casa e l'agevolazione fiscale.\n"
+    "Agevolazione fiscale per under 36: garanzia Consap e agevolazione fiscale sull'imposta di registro.",
+]
+
+
+def _competitors():
+    return [process_competitor_content(text, f"https://competitor{number}.it", competitor_number=number)
+            for number, text in enumerate(PAGES, start=1)]
+
+
+def test_analysis_keeps_trigger_topics_and_gaps_alongside_rankings():
+    analysis = ContentBriefGenerator('test').analyze_competitor_content(_competitors())
+
+    # Parole di almeno 5 lettere entro 3 posizioni da un trigger ('importante'), contate per competitor
+    assert analysis['common_topics'] == {'tasso': 1, 'fisso': 1, 'vuole': 1}
+    # Parole lunghe usate da un solo competitor, più frequenti prima
+    assert analysis['content_gaps'][0] == 'agevolazione'
+    assert [topic['topic'] for topic in analysis['consensus_topics']][0] == 'mutuo prima casa'
+    assert analysis['consensus_topics'][0]['competitors'] == [1, 2]
+    assert 'agevolazione fiscale' in [topic['topic'] for topic in analysis['distinctive_topics']]
+
+
+def test_brief_messages_without_competitors():
+    generator = ContentBriefGenerator('test')
+    data = {'brand': 'Brand', 'website': 'brand.it', 'topic': 'Mutuo prima casa', 'keywords': 'mutuo prima casa',
+            'faqs': '', 'tone_of_voice': '', 'competitors': [], 'sitemap_urls': [], 'manual_urls': ''}
+    keyword_analysis = generator.analyze_keywords_with_apis(data['keywords'])
+
+    messages = generator.build_brief_messages(data, keyword_analysis)
+
+    assert messages[-1]['role'] == 'user'
+    assert 'Profondità media contenuto: 0 parole' in messages[-1]['content']
+
+
+def _brief_request(generator):
+    data = {'brand': 'Brand', 'website': 'brand.it', 'topic': 'Mutuo prima casa', 'keywords': 'mutuo prima casa',
+            'faqs': '', 'tone_of_voice': '', 'competitors': _competitors(), 'sitemap_urls': [], 'manual_urls': ''}
+    return data, generator.analyze_keywords_with_apis(data['keywords'])
+
+
+def test_llm_cache_key_depends_on_messages_and_sampling(monkeypatch):
+    generator = ContentBriefGenerator('test')
+    messages = [{'role': 'user', 'content': 'brief'}]
+    key = generator._llm_cache_key(messages)
+
+    assert key.startswith('llm_brief:')
+    assert generator._llm_cache_key([{'role': 'user', 'content': 'brief'}]) == key
+    assert generator._llm_cache_key([{'role': 'user', 'content': 'brief 2'}]) != key
+    monkeypatch.setattr(content_brief, 'BRIEF_TEMPERATURE', 0.1)
+    assert generator._llm_cache_key(messages) != key
+
+
+def test_generation_is_cached_until_expiry_unless_forced(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    generator = ContentBriefGenerator('test', llm_cache=DiskCache(str(tmp_path / 'llm.sqlite')))
+    calls = []
+
+    def complete(data, keyword_analysis, messages, on_chunk=None):
+        calls.append(messages)
+        return f"brief {len(calls)}"
+
+    monkeypatch.setattr(generator, '_complete_brief', complete)
+    data, keyword_analysis = _brief_request(generator)
+
+    assert generator.generate_content_brief(data, keyword_analysis) == 'brief 1'
+    chunks = []
+    assert generator.generate_content_brief(data, keyword_analysis, on_chunk=chunks.append) == 'brief 1'
+    # Dalla cache il brief arriva in un unico frammento
+    assert chunks == ['brief 1'] and len(calls) == 1
+
+    assert generator.generate_content_brief(data, keyword_analysis, force_regenerate=True) == 'brief 2'
+    assert generator.generate_content_brief(data, keyword_analysis) == 'brief 2'
+
+    now[0] += DEFAULT_TTLS['llm_brief']
+    assert generator.generate_content_brief(data, keyword_analysis) == 'brief 3'
+    assert len(calls) == 3
+
+
+def test_brief_messages_reuse_precomputed_competitor_insights(monkeypatch):
+    generator = ContentBriefGenerator('test')
+    data, keyword_analysis = _brief_request(generator)
+    insights = generator.analyze_competitor_content(data['competitors'])
+    expected = generator.build_brief_messages(data, keyword_analysis)
+
+    def analyze(competitors):
+        raise AssertionError("analisi competitor ricalcolata")
+
+    monkeypatch.setattr(generator, 'analyze_competitor_content', analyze)
+    assert generator.build_brief_messages({**data, 'competitor_insights': insights}, keyword_analysis) == expected
@@ -0,0 +1,65 @@
+from content_dedup import deduplicate_competitors
+
+
+def _competitor(number, content):
+    return {'competitor_number': number, 'url': f'https://example{number}.it/', 'title': f'Competitor {number}',
+            'content': content, 'paragraphs': content.split('\n'), 'word_count': len(content.split())}
+
+
+ON_TOPIC = '\n'.join([
+    'Partita IVA forfettaria',
+    'Come aprire la partita IVA',
+    'Partita IVA: costi e adempimenti',
+    "Il regime forfettario conviene a chi fattura meno di 85.000 euro l'anno e ha poche spese deducibili.",
+    'Aprire la partita IVA forfettaria richiede il modello AA9/12 da inviare entro trenta giorni.',
+    'Leggi anche: la guida alla partita IVA per i giovani',
+])
+
+
+def test_on_topic_lines_are_kept():
+    cleaned, report = deduplicate_competitors([_competitor(1, ON_TOPIC)],
+                                              topic_terms=['partita IVA forfettaria', 'aprire partita iva'])
+    assert cleaned[0]['content'] == ON_TOPIC
+    assert report['boilerplate'] == 0
+    assert report['tokens_after'] == report['tokens_before']
+
+
+def test_phrase_inside_content_line_is_kept_without_topic():
+    line = 'Aprire la partita IVA forfettaria conviene a chi fattura poco e ha spese contenute ogni anno.'
+    cleaned, report = deduplicate_competitors([_competitor(1, line)])
+    assert cleaned[0]['content'] == line
+    assert report['boilerplate'] == 0
+
+
+def test_short_banner_lines_are_dropped():
+    content = '\n'.join([
+        'Cookie policy',
+        'Accetta tutti | Rifiuta tutti',
+        'Tutti i diritti riservati',
+        'La dichiarazione dei redditi va presentata ogni anno entro la scadenza fissata dal calendario fiscale.',
+    ])
+    cleaned, report = deduplicate_competitors([_competitor(1, content)], topic_terms=['dichiarazione dei redditi'])
+    assert cleaned[0]['content'] == content.split('\n')[-1]
+    assert report['boilerplate'] == 3
+
+
+def test_footer_repeated_across_pages_is_dropped():
+    footer = 'Studio Rossi commercialisti Milano, partita iva 01234567890, via Roma 1'
+    first = 'Il modello F24 si paga online tramite home banking oppure presso gli sportelli postali.\n' + footer
+    second = 'Le scadenze fiscali del mese cambiano in base al regime scelto dal contribuente.\n' + footer
+    cleaned, report = deduplicate_competitors([_competitor(1, first), _competitor(2, second)])
+    assert report['boilerplate'] == 2
+    assert footer not in cleaned[0]['content'] and footer not in cleaned[1]['content']
+
+
+def test_boilerplate_phrases_match_across_whitespace():
+    content = '\n'.join([
+        'Torna   su',
+        'Seguici su Facebook',
+        'Iscriviti alla\tnewsletter',
+        'Copyrighted',
+    ])
+    cleaned, report = deduplicate_competitors([_competitor(1, content)])
+    # 'Copyrighted' non è la frase 'copyright': i confini di parola la proteggono
+    assert cleaned[0]['content'] == 'Copyrighted'
+    assert report['boilerplate'] == 3
@@ -0,0 +1,86 @@
+import io
+
+from docx import Document
+
+from docx_renderer import parse_inline, parse_markdown, render_docx
+
+BRIEF = """# Mutuo prima casa
+
+Testo con **grassetto**, *corsivo*, `codice` e [link](https://brand.it).
+
+- Voce principale
+  - Voce annidata
+    - Terzo livello
+
+1. Primo passo
+2. Secondo passo
+
+| Sezione | Parole |
+|---|---:|
+| **Intro** | 150 |
+| Tasso a\\|b | 300 |
+
+> Citazione
+"""
+
+
+def test_parse_inline_formatting_and_links():
+    assert parse_inline('a **b _c_** `d` [e](https://x.it) _f_ snake_case') == [
+        ('a ', False, False, False),
+        ('b ', True, False, False),
+        ('c', True, True, False),
+        (' ', False, False, False),
+        ('d', False, False, True),
+        (' ', False, False, False),
+        ('e', False, False, False),
+        (' (https://x.it)', False, False, False),
+        (' ', False, False, False),
+        ('f', False, True, False),
+        (' snake_case', False, False, False),
+    ]
+    assert parse_inline('***tutto***') == [('tutto', True, True, False)]
+
+
+def test_parse_markdown_blocks():
+    blocks = parse_markdown(BRIEF)
+
+    assert [block['type'] for block in blocks] == [
+        'heading', 'paragraph', 'bullet', 'bullet', 'bullet', 'number', 'number', 'table', 'quote'
+    ]
+    assert [block['level'] for block in blocks[2:5]] == [0, 1, 2]
+    assert blocks[7]['rows'] == [['Sezione', 'Parole'], ['**Intro**', '150'], ['Tasso a|b', '300']]
+    assert parse_markdown('```\n# non è un titolo\n```') == [{'type': 'code', 'text': '# non è un titolo'}]
+
+
+def test_render_docx_styles_tables_and_runs():
+    doc = Document(io.BytesIO(render_docx(BRIEF, 'Brand', 'Mutuo')))
+    paragraphs = [(p.style.name, p.text) for p in doc.paragraphs if p.text]
+
+    assert paragraphs[:2] == [('Title', 'Content brief SEO data-driven - Mutuo'), ('Subtitle', 'Brand: Brand')]
+    assert ('Heading 1', 'Mutuo prima casa') in paragraphs
+    assert ('List Bullet', 'Voce principale') in paragraphs
+    assert ('List Bullet 2', 'Voce annidata') in paragraphs
+    assert ('List Bullet 3', 'Terzo livello') in paragraphs
+    assert ('List Number', 'Primo passo') in paragraphs
+    assert ('Quote', 'Citazione') in paragraphs
+
+    body = next(p for p in doc.paragraphs if p.text.startswith('Testo con'))
+    assert body.text == 'Testo con grassetto, corsivo, codice e link (https://brand.it).'
+    runs = {run.text: run for run in body.runs}
+    assert runs['grassetto'].bold and not runs['grassetto'].italic
+    assert runs['corsivo'].italic
+    assert runs['codice'].style.name == 'Brief Code'
+
+    table = doc.tables[0]
+    assert [[cell.text for cell in row.cells] for row in table.rows] == [
+        ['Sezione', 'Parole'], ['Intro', '150'], ['Tasso a|b', '300']
+    ]
+    # L'intestazione della tabella è in grassetto
+    assert all(run.bold for run in table.rows[0].cells[0].paragraphs[0].runs)
+
+
+def test_each_numbered_list_restarts():
+    doc = Document(io.BytesIO(render_docx('1. a\n2. b\n\nTesto\n\n1. c', 'Brand', 'Mutuo')))
+    num_ids = [p._p.pPr.numPr.numId.val for p in doc.paragraphs if p.style.name == 'List Number']
+
+    assert num_ids[0] == num_ids[1] != num_ids[2]
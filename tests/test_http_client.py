@@ -0,0 +1,80 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from urllib3.response import HTTPResponse
+
+from http_client import (IDEMPOTENT_METHODS, RETRY_STATUS_CODES, JitterRetry, build_retry, create_session,
+                         get_session)
+
+
+def test_retry_policy_configuration():
+    retry = build_retry()
+    assert isinstance(retry, JitterRetry)
+    assert (retry.total, retry.connect, retry.read, retry.status) == (3, 3, 3, 3)
+    assert retry.backoff_factor == 0.5
+    assert set(retry.status_forcelist) == set(RETRY_STATUS_CODES)
+    assert retry.allowed_methods == IDEMPOTENT_METHODS
+    assert retry.respect_retry_after_header and not retry.raise_on_status
+
+
+def test_backoff_is_exponential_with_jitter():
+    retry = build_retry(backoff_factor=1.0)
+    for attempt in range(1, 4):
+        retry = retry.increment(method='GET', url='/', error=ConnectionError())
+        base = 1.0 * 2 ** (attempt - 1)
+        for _ in range(50):
+            assert base / 2 <= retry.get_backoff_time() <= base
+
+
+def test_retry_after_is_capped():
+    retry = build_retry()
+    assert retry.get_retry_after(HTTPResponse(headers={'Retry-After': '3600'})) == JitterRetry.MAX_RETRY_AFTER
+    assert retry.get_retry_after(HTTPResponse(headers={'Retry-After': '2'})) == 2
+    assert retry.get_retry_after(HTTPResponse()) is None
+
+
+def test_session_retries_post_only_on_read_only_endpoints():
+    session = create_session()
+    serper = session.get_adapter('https://google.serper.dev/search').max_retries
+    semrush = session.get_adapter('https://api.semrush.com/').max_retries
+    assert 'POST' in serper.allowed_methods
+    assert 'POST' not in semrush.allowed_methods
+    assert 'GET' in semrush.allowed_methods
+
+
+def test_get_session_is_shared():
+    assert get_session() is get_session()
+
+
+@pytest.fixture
+def flaky_server():
+    """Server locale che risponde 503 alle prime due richieste e poi 200"""
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls.append(self.path)
+            status = 503 if len(calls) <= 2 else 200
+            self.send_response(status)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/", calls
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_retries_5xx_until_success(flaky_server):
+    url, calls = flaky_server
+    response = create_session().get(url, timeout=5)
+    assert response.status_code == 200
+    assert len(calls) == 3
@@ -0,0 +1,44 @@
+from intent_matcher import IntentMatcher, get_matcher
+
+
+def test_highest_priority_category_wins():
+    matcher = get_matcher('keyword_intent')
+    assert matcher.classify('migliori mutui prezzo') == 'transactional'
+    assert matcher.classify('come scegliere il mutuo migliore') == 'informational'
+    assert matcher.classify('mutuo prima casa') is None
+    assert matcher.classify('mutuo prima casa', default='informational') == 'informational'
+
+
+def test_longer_phrase_prevails_over_its_prefix_word():
+    matcher = get_matcher('paa_intent')
+    # 'dove comprare' è transazionale: prima valeva la sola 'dove' (informativa)
+    assert matcher.classify('Dove comprare casa a Milano?') == 'transactional'
+    assert matcher.classify('Dove si firma il mutuo?') == 'informational'
+    # Con un'altra parola informativa nel testo torna a prevalere la priorità della categoria
+    assert matcher.classify('come e dove comprare casa') == 'informational'
+
+
+def test_word_boundaries_avoid_substring_misfires():
+    matcher = get_matcher('keyword_intent')
+    assert matcher.classify('laptop gaming') is None
+    assert matcher.classify('brandy invecchiato') is None
+    assert matcher.classify('top 10 brandy') == 'commercial'
+
+
+def test_prefix_patterns_and_whitespace_in_phrases():
+    matcher = IntentMatcher([('finance', ['mutu*', 'tasso fisso']), ('home', ['casa'])])
+    assert matcher.classify('Mutuatario cercasi') == 'finance'
+    assert matcher.classify('tasso\n  fisso per la casa') == 'finance'
+    assert matcher.classify('casa al mare') == 'home'
+    assert matcher.classify('tassonomia') is None
+
+
+def test_match_all_returns_every_category():
+    matcher = get_matcher('heading_pattern')
+    assert matcher.match_all('Come scegliere: i migliori mutui a confronto') == {'how_to', 'best_list', 'comparison'}
+    assert matcher.match_all('Introduzione') == set()
+
+
+def test_matchers_are_compiled_once_and_unknown_language_falls_back():
+    assert get_matcher('paa_intent') is get_matcher('paa_intent', 'it')
+    assert get_matcher('paa_intent', 'xx').classify('quanto costo') == 'transactional'
@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import JobRegistry, add_warning
+from tracing import bind_context
+
+
+def _wait_finished(registry, job_ids):
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        if all((registry.get(job_id) or {'status': 'done'})['status'] == 'done' for job_id in job_ids):
+            return
+        time.sleep(0.01)
+    raise AssertionError("job non conclusi")
+
+
+def test_finished_jobs_are_capped_across_owners():
+    registry = JobRegistry(max_workers=2, max_finished_jobs=3)
+    try:
+        job_ids = [registry.submit(f'visitor-{number}', 'brief', lambda: 'ok') for number in range(5)]
+        _wait_finished(registry, job_ids)
+        registry.list_jobs('visitor-0')
+        assert sum(registry.get(job_id) is not None for job_id in job_ids) == 3
+        assert registry.get(job_ids[0]) is None
+        assert registry.get(job_ids[-1]) is not None
+    finally:
+        registry.shutdown()
+
+
+def test_finished_jobs_expire_after_ttl():
+    registry = JobRegistry(max_workers=1, finished_ttl=0.05)
+    try:
+        job_id = registry.submit('visitor', 'brief', lambda: 'ok')
+        _wait_finished(registry, [job_id])
+        time.sleep(0.1)
+        assert registry.list_jobs('someone-else') == []
+        assert registry.get(job_id) is None
+    finally:
+        registry.shutdown()
+
+
+def test_warnings_from_bound_worker_threads_reach_the_job():
+    def brief():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(bind_context(add_warning), "SEMrush: nessuna keyword correlata").result()
+
+    registry = JobRegistry(max_workers=1)
+    try:
+        job_id = registry.submit('editor', 'brief', brief)
+        _wait_finished(registry, [job_id])
+        job = registry.get(job_id)
+        assert job['result'] is True
+        assert job['warnings'] == ["SEMrush: nessuna keyword correlata"]
+    finally:
+        registry.shutdown()
@@ -0,0 +1,58 @@
+import math
+
+import pytest
+
+from link_ranker import LinkIndex, build_query, rank_internal_links, url_tokens
+
+
+def test_url_tokens_ignore_domain_stopwords_and_plural():
+    assert url_tokens('https://www.sito.it/mutui/il-mutuo-prima-casa.html?utm=1') == ['mutu', 'mutu', 'prim', 'casa']
+    assert url_tokens('/guida%20mutui') == ['guid', 'mutu']
+
+
+def test_bm25_scores_match_the_formula():
+    index = LinkIndex(['/mutuo-casa', '/prestiti-auto', '/mutuo-tasso-fisso-casa-giovani'])
+    # Token per documento: 2, 2 e 5 → lunghezza media 3; 'mutu' compare in 2 documenti su 3
+    idf = math.log(1 + (3 - 2 + 0.5) / (2 + 0.5))
+    assert index.idf('mutu') == pytest.approx(idf)
+
+    results = dict(index.search({'mutu': 2.0}))
+    short_norm = 1.2 * (1 - 0.75 + 0.75 * 2 / 3)
+    long_norm = 1.2 * (1 - 0.75 + 0.75 * 5 / 3)
+    assert results == {
+        '/mutuo-casa': pytest.approx(idf * 2.0 * 2.2 / (1 + short_norm), rel=1e-6),
+        '/mutuo-tasso-fisso-casa-giovani': pytest.approx(idf * 2.0 * 2.2 / (1 + long_norm), rel=1e-6),
+    }
+
+
+def test_search_orders_by_score_then_discovery_order():
+    urls = ['/blog/auto', '/mutuo-giovani', '/mutuo-casa', '/mutuo-prima-casa-giovani']
+    index = LinkIndex(urls)
+    ranked = [url for url, _ in index.search({'mutu': 1.0, 'giovan': 1.0})]
+    # L'URL con entrambi i termini batte quelle più corte che ne hanno uno solo
+    assert ranked[0] == '/mutuo-giovani'
+    assert ranked[1:] == ['/mutuo-prima-casa-giovani', '/mutuo-casa']
+    assert '/blog/auto' not in ranked
+
+    # A parità di punteggio resta l'ordine di scoperta
+    tied = LinkIndex(['/mutuo-a', '/mutuo-b', '/mutuo-c'])
+    assert [url for url, _ in tied.search({'mutu': 1.0}, top_n=2)] == ['/mutuo-a', '/mutuo-b']
+
+
+def test_titles_are_indexed_with_the_path():
+    index = LinkIndex(['/p/123', '/p/456'], titles={'/p/456': 'Guida al mutuo'})
+    assert [url for url, _ in index.search({'mutu': 1.0})] == ['/p/456']
+
+
+def test_build_query_keeps_the_highest_weight():
+    query = build_query('mutuo casa', keywords=['tasso fisso'], topic='mutuo giovani',
+                        related_keywords=[{'keyword': 'tasso variabile', 'search_volume': 10}])
+    assert query == {'mutu': 2.0, 'casa': 2.0, 'tass': 1.0, 'fiss': 1.0, 'giovan': 0.75, 'variabil': 0.5}
+
+
+def test_rank_internal_links_prefers_main_keyword_and_falls_back():
+    urls = ['/tasso-fisso', '/mutuo-casa', '/contatti']
+    assert rank_internal_links(urls, 'mutuo casa', keywords=['tasso fisso']) == ['/mutuo-casa', '/tasso-fisso']
+    # Nessuna URL pertinente: le prime top_n nell'ordine originale
+    assert rank_internal_links(urls, 'assicurazione', top_n=2) == ['/tasso-fisso', '/mutuo-casa']
+    assert rank_internal_links([], 'mutuo') == []
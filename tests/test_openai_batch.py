@@ -0,0 +1,35 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from openai_batch import fetch_results, ingest_results
+
+
+def _line(custom_id, status_code, body):
+    return json.dumps({'id': f'batch_req_{custom_id}', 'custom_id': custom_id,
+                       'response': {'status_code': status_code, 'body': body}, 'error': None}).encode()
+
+
+def test_failed_requests_from_error_file_reach_the_manifest(tmp_path):
+    output = _line('ok', 200, {'choices': [{'message': {'content': '# Brief\n\nTesto'}}]})
+    errors = _line('ko', 400, {'error': {'message': 'Contesto troppo lungo'}})
+    client = MagicMock()
+    client.batches.retrieve.return_value = SimpleNamespace(status='completed', output_file_id='file-out',
+                                                           error_file_id='file-err')
+    client.files.content.side_effect = lambda file_id: SimpleNamespace(
+        content=output if file_id == 'file-out' else errors)
+    results_path = tmp_path / 'results.jsonl'
+    jobs_path = tmp_path / 'requests.jobs.json'
+    jobs_path.write_text(json.dumps([
+        {'id': job_id, 'brand': 'Brand', 'topic': f'Argomento {job_id}', 'status': 'queued'}
+        for job_id in ('ok', 'ko', 'lost')
+    ]))
+
+    assert fetch_results(client, 'batch_1', str(results_path)) == 'completed'
+    manifest = {entry['id']: entry for entry in
+                ingest_results(str(results_path), str(jobs_path), str(tmp_path / 'briefs.zip'))}
+
+    assert manifest['ok']['status'] == 'done'
+    assert manifest['ko']['status'] == 'failed'
+    assert 'Contesto troppo lungo' in manifest['ko']['error']
+    assert manifest['lost']['status'] == 'missing'
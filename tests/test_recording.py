@@ -0,0 +1,89 @@
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from recording import (Cassette, CassetteMissError, CassetteTransport, cassette_http_client, httpx,
+                       install_cassette)
+
+SECRET = 'sk-segreto-123'
+
+
+class _FakeAdapter(BaseAdapter):
+    """Adapter di rete finto: risponde con un JSON e header che non devono finire nella cassette"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def send(self, request, **kwargs):
+        self.calls.append(request)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update({'Content-Type': 'application/json', 'Set-Cookie': f'session={SECRET}',
+                                 'X-Account-Id': SECRET, 'ETag': '"v1"'})
+        response._content = json.dumps({'keyword': 'mutuo', 'volume': 1000}).encode('utf-8')
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _session(cassette, inner):
+    session = requests.Session()
+    session.mount('https://', inner)
+    return install_cassette(session, cassette)
+
+
+def test_requests_record_then_replay_without_secrets(tmp_path):
+    path = str(tmp_path / 'cassette.json')
+    inner = _FakeAdapter()
+    session = _session(Cassette(path, 'record'), inner)
+    response = session.get('https://api.semrush.com/', params={'type': 'phrase_this', 'key': SECRET, 'phrase': 'mutuo'},
+                           headers={'Authorization': f'Bearer {SECRET}', 'X-API-KEY': SECRET})
+    assert response.json() == {'keyword': 'mutuo', 'volume': 1000}
+
+    stored = open(path, encoding='utf-8').read()
+    assert SECRET not in stored
+    assert 'Authorization' not in stored and 'Set-Cookie' not in stored
+    interaction = json.loads(stored)['interactions'][0]
+    assert set(interaction['response']['headers']) == {'Content-Type', 'ETag'}
+
+    # In replay la rete non viene toccata e una chiave diversa abbina comunque la stessa richiesta
+    replay_inner = _FakeAdapter()
+    replay = _session(Cassette(path, 'replay'), replay_inner)
+    response = replay.get('https://api.semrush.com/', params={'phrase': 'mutuo', 'key': 'altra', 'type': 'phrase_this'})
+    assert response.status_code == 200
+    assert response.json() == {'keyword': 'mutuo', 'volume': 1000}
+    assert response.headers['ETag'] == '"v1"'
+    assert replay_inner.calls == []
+
+    with pytest.raises(CassetteMissError):
+        replay.get('https://api.semrush.com/', params={'phrase': 'casa'})
+
+
+def test_httpx_transport_record_then_replay_without_secrets(tmp_path):
+    path = str(tmp_path / 'openai.json')
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        return httpx.Response(200, json={'choices': [{'message': {'content': '# Brief'}}]},
+                              headers={'openai-organization': 'org-segreta', 'x-request-id': SECRET})
+
+    body = {'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'brief'}]}
+    headers = {'Authorization': f'Bearer {SECRET}'}
+    client = httpx.Client(transport=CassetteTransport(Cassette(path, 'record'), httpx.MockTransport(handler)))
+    assert client.post('https://api.openai.com/v1/chat/completions', json=body, headers=headers).status_code == 200
+
+    stored = open(path, encoding='utf-8').read()
+    assert SECRET not in stored and 'org-segreta' not in stored
+    assert 'Authorization' not in stored
+
+    replay = cassette_http_client(Cassette(path, 'replay'))
+    response = replay.post('https://api.openai.com/v1/chat/completions', json=body)
+    assert response.json()['choices'][0]['message']['content'] == '# Brief'
+    assert len(requests_seen) == 1
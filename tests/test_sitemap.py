@@ -0,0 +1,137 @@
+import io
+import threading
+
+from sitemap import SitemapCrawler, SitemapStore, parse_sitemap
+
+URLSET = b'''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"
+        xmlns:video="http://www.google.com/schemas/sitemap-video/1.1">
+  <url>
+    <loc>https://example.it/guida-mutuo</loc>
+    <lastmod>2024-05-01</lastmod>
+    <image:image>
+      <image:loc>https://cdn.example.it/mutuo.jpg</image:loc>
+    </image:image>
+  </url>
+  <url>
+    <loc>https://example.it/video-mutuo</loc>
+    <video:video>
+      <video:thumbnail_loc>https://cdn.example.it/thumb.jpg</video:thumbnail_loc>
+      <video:content_loc>https://cdn.example.it/mutuo.mp4</video:content_loc>
+      <video:player_loc>https://example.it/player</video:player_loc>
+    </video:video>
+  </url>
+</urlset>'''
+
+INDEX = b'''<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.it/sitemap-post.xml</loc><lastmod>2024-05-01</lastmod></sitemap>
+  <sitemap><loc>https://example.it/sitemap-page.xml</loc></sitemap>
+</sitemapindex>'''
+
+
+def test_extension_locs_do_not_replace_page_url():
+    assert parse_sitemap(URLSET) == ([], ['https://example.it/guida-mutuo', 'https://example.it/video-mutuo'])
+
+
+def test_sitemap_index_returns_child_sitemaps():
+    assert parse_sitemap(INDEX) == (['https://example.it/sitemap-post.xml', 'https://example.it/sitemap-page.xml'], [])
+
+
+class _FakeCrawler(SitemapCrawler):
+    """Indice con quattro sitemap figlie da 10 URL che terminano insieme"""
+
+    def __init__(self, **kwargs):
+        super().__init__(session=object(), **kwargs)
+        self._barrier = threading.Barrier(4)
+
+    def _fetch_and_parse(self, url, index_lastmod=None):
+        if url.endswith('index.xml'):
+            return [{'loc': f'https://example.it/sitemap-{number}.xml', 'lastmod': None} for number in range(4)], []
+        self._barrier.wait(timeout=5)
+        return [], [f'{url}#{number}' for number in range(10)]
+
+
+def test_crawl_never_exceeds_max_urls():
+    for max_urls in (1, 5, 15, 25):
+        urls = _FakeCrawler(max_workers=4, max_urls=max_urls).crawl('https://example.it/index.xml')
+        assert len(urls) == max_urls
+        assert len(set(urls)) == max_urls
+
+
+def test_store_saves_only_differences(tmp_path):
+    store = SitemapStore(str(tmp_path / 'sitemaps.sqlite'))
+    entries = [{'type': 'sitemap', 'loc': 'https://example.it/sitemap-post.xml', 'lastmod': '2024-05-01'},
+               {'type': 'url', 'loc': 'https://example.it/a', 'lastmod': None},
+               {'type': 'url', 'loc': 'https://example.it/b', 'lastmod': None}]
+    assert store.get_sitemap('example.it', 'https://example.it/sitemap.xml') is None
+    assert store.save_sitemap('example.it', 'https://example.it/sitemap.xml', '"v1"', None, None,
+                              entries) == {'added': 3, 'removed': 0}
+
+    entries = entries[:2] + [{'type': 'url', 'loc': 'https://example.it/c', 'lastmod': None}]
+    assert store.save_sitemap('example.it', 'https://example.it/sitemap.xml', '"v2"', 'Wed, 01 May 2024', None,
+                              entries) == {'added': 1, 'removed': 1}
+    assert store.get_entries('example.it', 'https://example.it/sitemap.xml') == (
+        [{'loc': 'https://example.it/sitemap-post.xml', 'lastmod': '2024-05-01'}],
+        ['https://example.it/a', 'https://example.it/c']
+    )
+    assert store.get_sitemap('example.it', 'https://example.it/sitemap.xml') == {
+        'etag': '"v2"', 'last_modified': 'Wed, 01 May 2024', 'index_lastmod': None
+    }
+    # Le voci sono separate per sito
+    assert store.get_entries('altro.it', 'https://example.it/sitemap.xml') == ([], [])
+
+
+def test_store_touch_keeps_validators_and_updates_index_lastmod(tmp_path):
+    store = SitemapStore(str(tmp_path / 'sitemaps.sqlite'))
+    store.save_sitemap('example.it', 'https://example.it/s.xml', '"v1"', None, '2024-05-01', [])
+    store.touch('example.it', 'https://example.it/s.xml', None)
+    assert store.get_sitemap('example.it', 'https://example.it/s.xml')['index_lastmod'] == '2024-05-01'
+    store.touch('example.it', 'https://example.it/s.xml', '2024-06-01')
+    assert store.get_sitemap('example.it', 'https://example.it/s.xml') == {
+        'etag': '"v1"', 'last_modified': None, 'index_lastmod': '2024-06-01'
+    }
+
+
+class _Response:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.raw = io.BytesIO(body)
+        self.headers = headers or {}
+        self.encoding = 'utf-8'
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Session:
+    """Serve l'indice e le sitemap figlie; risponde 304 quando riceve If-None-Match"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, dict(headers or {})))
+        if 'If-None-Match' in (headers or {}):
+            return _Response(304)
+        body = INDEX if url.endswith('index.xml') else URLSET.replace(b'example.it/', f'example.it/{url[-8:-4]}/'.encode())
+        return _Response(200, body, {'ETag': '"v1"'})
+
+
+def test_crawl_with_store_uses_conditional_requests_and_index_lastmod(tmp_path):
+    store = SitemapStore(str(tmp_path / 'sitemaps.sqlite'))
+    first = SitemapCrawler(session=_Session(), max_workers=1, store=store).crawl('https://example.it/index.xml')
+
+    session = _Session()
+    crawler = SitemapCrawler(session=session, max_workers=1, store=store)
+    second = crawler.crawl('https://example.it/index.xml')
+
+    assert second == first and len(first) == 4
+    # sitemap-post ha lo stesso lastmod nell'indice: nessuna richiesta; le altre ricevono 304
+    assert [url for url, _ in session.requests] == ['https://example.it/index.xml', 'https://example.it/sitemap-page.xml']
+    assert all(headers['If-None-Match'] == '"v1"' for _, headers in session.requests)
+    assert crawler.stats['skipped_unchanged'] == 1 and crawler.stats['not_modified'] == 2
@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from text_analysis import ngram_tfidf, rank_topics, safe_max_n
+
+
+def _cells(matrix):
+    return {(int(row), matrix['terms'](int(col))): (int(count), float(weight))
+            for row, col, count, weight in zip(matrix['rows'], matrix['cols'], matrix['counts'], matrix['weights'])}
+
+
+def test_tfidf_weights_on_tiny_corpus():
+    matrix = ngram_tfidf(["mutuo casa mutuo", "mutuo tasso"], max_n=1)
+    cells = _cells(matrix)
+
+    rare_idf = math.log(3 / 2) + 1
+    # Documento 0: 'mutuo' due volte (idf 1, presente ovunque), 'casa' una volta
+    mutuo, casa = 1 + math.log(2), rare_idf
+    norm = math.hypot(mutuo, casa)
+    assert cells[(0, 'mutuo')] == (2, pytest.approx(mutuo / norm))
+    assert cells[(0, 'casa')] == (1, pytest.approx(casa / norm))
+    norm = math.hypot(1, rare_idf)
+    assert cells[(1, 'mutuo')] == (1, pytest.approx(1 / norm))
+    assert cells[(1, 'tasso')] == (1, pytest.approx(rare_idf / norm))
+    assert len(cells) == 4
+    assert sorted(matrix['document_frequency'].tolist()) == [1, 1, 2]
+
+
+def test_ngrams_stay_within_lines_and_skip_stopword_edges():
+    matrix = ngram_tfidf(["tasso fisso per il mutuo\nsurroga gratuita"], max_n=3)
+    terms = set(term for _, term in _cells(matrix))
+    assert {'tasso fisso', 'surroga gratuita', 'mutuo'} <= terms
+    # 'mutuo surroga' attraverserebbe la riga, 'fisso per' finisce con una parola vuota
+    assert 'mutuo surroga' not in terms
+    assert 'fisso per' not in terms
+    assert 'per il mutuo' not in terms
+    assert matrix['max_n'] == 3
+
+
+def test_overflow_guard_lowers_ngram_length():
+    assert safe_max_n(1_000, 10, 3) == 3
+    # (V + 1)^3 supera 2^62 ma (V + 1)^2 no: niente trigrammi
+    assert safe_max_n(2 ** 21, 1, 3) == 2
+    assert safe_max_n(2 ** 31, 4, 3) == 1
+    assert safe_max_n(2 ** 40, 1000, 1) == 1
+
+
+def test_empty_inputs():
+    assert rank_topics([]) == {'consensus': [], 'distinctive': []}
+    assert rank_topics(['', '']) == {'consensus': [], 'distinctive': []}
+    matrix = ngram_tfidf([])
+    assert len(matrix['cols']) == 0 and matrix['documents'] == 0
+
+
+def test_single_document_has_only_consensus_topics():
+    topics = rank_topics(["mutuo prima casa con tasso fisso\nmutuo prima casa e surroga"], limit=5)
+    assert topics['distinctive'] == []
+    assert topics['consensus'][0]['topic'] == 'mutuo prima casa'
+    assert topics['consensus'][0]['documents'] == [0]
+
+
+def test_consensus_and_distinctive_ordering():
+    documents = [
+        "tasso fisso conveniente\ntasso fisso stabile\nrata mensile\nsurroga gratuita\nsurroga gratuita",
+        "tasso fisso per tutti\nrata mensile\nperizia immobile\nperizia immobile\nperizia immobile",
+        "tasso fisso e variabile\nrata mensile",
+        "tasso fisso oggi",
+    ]
+    topics = rank_topics(documents, limit=5)
+
+    consensus = [topic['topic'] for topic in topics['consensus']]
+    assert consensus[:2] == ['tasso fisso', 'rata mensile']
+    assert topics['consensus'][0]['coverage'] == 4
+    assert topics['consensus'][1]['documents'] == [0, 1, 2]
+
+    distinctive = [topic['topic'] for topic in topics['distinctive']]
+    assert distinctive == ['perizia immobile', 'surroga gratuita']
+    assert [topic['documents'] for topic in topics['distinctive']] == [[1], [0]]
+    scores = [topic['score'] for topic in topics['distinctive']]
+    assert scores == sorted(scores, reverse=True)
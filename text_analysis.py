@@ -0,0 +1,239 @@
+import logging
+import math
+import re
+from collections import Counter
+from itertools import chain, count
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+# Parole che segnalano un topic importante nelle vicinanze
+DEFAULT_TOPIC_TRIGGERS = frozenset({'importante', 'fondamentale', 'essenziale', 'principale', 'primo', 'migliore'})
+
+# Parole vuote italiane: escluse dagli unigrammi e dai bordi di bigrammi e trigrammi
+STOPWORDS = frozenset({
+    'il', 'lo', 'la', 'i', 'gli', 'le', 'un', 'uno', 'una', 'di', 'del', 'dello', 'della', 'dei', 'degli', 'delle',
+    'da', 'dal', 'dallo', 'dalla', 'dai', 'dagli', 'dalle', 'in', 'nel', 'nello', 'nella', 'nei', 'negli', 'nelle',
+    'con', 'su', 'sul', 'sullo', 'sulla', 'sui', 'sugli', 'sulle', 'per', 'tra', 'fra', 'a', 'al', 'allo', 'alla',
+    'ai', 'agli', 'alle', 'e', 'ed', 'o', 'od', 'ma', 'se', 'che', 'chi', 'cui', 'non', 'come', 'cosa', 'quando',
+    'dove', 'perché', 'quanto', 'quale', 'quali', 'anche', 'più', 'meno', 'molto', 'molti', 'molte', 'tutto',
+    'tutti', 'tutte', 'ogni', 'questo', 'questa', 'questi', 'queste', 'quello', 'quella', 'quelli', 'quelle',
+    'suo', 'sua', 'suoi', 'sue', 'loro', 'nostro', 'nostra', 'vostro', 'vostra', 'mio', 'mia', 'tuo', 'tua',
+    'essere', 'è', 'sono', 'era', 'erano', 'sarà', 'sia', 'siano', 'stato', 'stata', 'avere', 'ha', 'hanno',
+    'ho', 'hai', 'abbiamo', 'può', 'possono', 'deve', 'devono', 'fare', 'fa', 'già', 'poi', 'così', 'quindi',
+    'però', 'infatti', 'inoltre', 'invece', 'ancora', 'sempre', 'solo', 'proprio', 'altro', 'altri', 'altra',
+    'altre', 'dopo', 'prima', 'mentre', 'oppure', 'ne', 'ci', 'si', 'vi', 'mi', 'ti', 'li', 'lei', 'lui', 'noi',
+    'voi', 'io', 'tu', 'qui', 'là', 'sì', 'no', 'the', 'and', 'of', 'to', 'for'
+})
+
+# Soglie di copertura (quota di competitor) per i topic di consenso e per quelli distintivi
+CONSENSUS_MIN_SHARE = 0.5
+DISTINCTIVE_MAX_SHARE = 0.25
+
+
+def tokenize_words(text: str) -> List[str]:
+    """Divide un testo in parole minuscole ignorando punteggiatura e numeri"""
+    return WORD_PATTERN.findall(text.lower())
+
+
+def topic_coverage(competitor_tokens: List[Counter], min_length: int = 1) -> Counter:
+    """Conta in quanti competitor compare ciascun token (document frequency)"""
+    coverage = Counter()
+    for tokens in competitor_tokens:
+        coverage.update(token for token in tokens if len(token) >= min_length)
+    return coverage
+
+
+def find_content_gaps(competitor_tokens: List[Counter], min_length: int = 7, limit: int = 10) -> List[str]:
+    """Token trattati da un solo competitor, ordinati per frequenza d'uso e poi alfabeticamente"""
+    coverage = topic_coverage(competitor_tokens, min_length)
+    gaps: Dict[str, int] = {}
+    for tokens in competitor_tokens:
+        for token, count in tokens.items():
+            if coverage.get(token) == 1:
+                gaps[token] = count
+    return [token for token, _ in sorted(gaps.items(), key=lambda item: (-item[1], item[0]))[:limit]]
+
+
+def find_trigger_context_words(words: List[str], triggers: Iterable[str] = DEFAULT_TOPIC_TRIGGERS,
+                               window: int = 3, min_length: int = 5) -> List[str]:
+    """Parole (in ordine di testo) che distano al massimo `window` posizioni da una parola trigger"""
+    trigger_set = triggers if isinstance(triggers, (set, frozenset)) else frozenset(triggers)
+    trigger_positions = [position for position, word in enumerate(words) if word in trigger_set]
+    if not trigger_positions:
+        return []
+
+    n = len(words)
+    marked = bytearray(n)
+    for position in trigger_positions:
+        # Vicini prima e dopo il trigger, escluso il trigger stesso
+        start = max(0, position - window)
+        end = min(n, position + window + 1)
+        marked[start:position] = b'\x01' * (position - start)
+        marked[position + 1:end] = b'\x01' * (end - position - 1)
+    return [word for word, flag in zip(words, marked) if flag and len(word) >= min_length]
+
+
+def safe_max_n(vocabulary_size: int, document_count: int, max_n: int) -> int:
+    """N-gramma più lungo i cui codici (tutti gli n-grammi più corti inclusi) x documenti stanno sotto 2^62"""
+    while max_n > 1 and (vocabulary_size + 1) ** max_n * max(document_count, 1) >= 2 ** 62:
+        max_n -= 1
+    return max_n
+
+
+def ngram_tfidf(documents: List[str], max_n: int = 3, min_length: int = 3) -> Dict:
+    """Matrice sparsa documento x n-gramma (1..max_n) con pesi TF-IDF, in formato coordinate (COO).
+
+    Gli n-grammi non attraversano le righe (paragrafi, titoli, voci) e non iniziano né finiscono con
+    una parola vuota o più corta di `min_length`. Restituisce gli array paralleli `rows` (documento),
+    `cols` (termine), `counts` e `weights` (tf sublineare x idf smussato, normalizzati L2 per documento),
+    la document frequency di ogni termine e `terms`, che traduce un indice di colonna nel testo.
+    `max_n` è la lunghezza effettiva degli n-grammi (ridotta da safe_max_n con vocabolari enormi).
+    """
+    lines = [line for document in documents for line in document.split('\n')]
+    line_documents = np.repeat(np.arange(len(documents)), [document.count('\n') + 1 for document in documents])
+    line_tokens = [tokenize_words(line) for line in lines]
+    lengths = np.fromiter(map(len, line_tokens), dtype=np.int64, count=len(line_tokens))
+
+    # Id delle parole in ordine di prima apparizione (ciclo in C), poi resi contigui da np.unique
+    vocabulary: Dict[str, int] = {}
+    first_positions = np.fromiter(map(vocabulary.setdefault, chain.from_iterable(line_tokens), count()),
+                                  dtype=np.int64, count=int(lengths.sum()))
+    _, word_ids = np.unique(first_positions, return_inverse=True)
+    words = list(vocabulary)
+    size = len(words)
+    weak = np.fromiter((word in STOPWORDS or len(word) < min_length for word in words), dtype=bool, count=size)
+    segments = np.repeat(np.arange(len(lines)), lengths)
+    token_documents = np.repeat(line_documents, lengths)
+
+    document_count = max(len(documents), 1)
+    # Codice univoco per n-gramma: unigrammi in [0, V), bigrammi in [V, V + V^2), trigrammi oltre.
+    # Con vocabolari enormi si rinuncia agli n-grammi più lunghi piuttosto che superare int64
+    requested_n, max_n = max_n, safe_max_n(size, document_count, max_n)
+    if max_n < requested_n:
+        logger.warning("Vocabolario di %d parole: n-grammi limitati a %d parole invece di %d", size, max_n, requested_n)
+    codes, code_documents = [], []
+    offset = 0
+    for n in range(1, max_n + 1):
+        total = len(word_ids) - n + 1
+        if total > 0:
+            first, last = word_ids[:total], word_ids[n - 1:]
+            valid = ~weak[first] & ~weak[last] & (segments[:total] == segments[n - 1:])
+            code = np.zeros(total, dtype=np.int64)
+            for position in range(n):
+                code = code * size + word_ids[position:position + total]
+            codes.append(code[valid] + offset)
+            code_documents.append(token_documents[:total][valid])
+        offset += size ** n
+
+    keys = np.concatenate(codes) * document_count + np.concatenate(code_documents) if codes else np.empty(0, np.int64)
+    # Ordinate per termine e poi per documento: le celle di ogni colonna sono contigue
+    keys, counts = np.unique(keys, return_counts=True)
+    term_codes, rows = np.divmod(keys, document_count)
+    new_term = np.empty(len(term_codes), dtype=bool)
+    new_term[:1] = True
+    np.not_equal(term_codes[1:], term_codes[:-1], out=new_term[1:])
+    cols = np.cumsum(new_term) - 1
+    codes_by_col = term_codes[new_term]
+
+    document_frequency = np.bincount(cols, minlength=len(codes_by_col))
+    idf = np.log((1 + document_count) / (1 + document_frequency)) + 1
+    weights = (1 + np.log(counts)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=document_count))
+    weights /= np.where(norms > 0, norms, 1)[rows]
+
+    def terms(col: int) -> str:
+        code = int(codes_by_col[col])
+        n = 1
+        while code >= size ** n:
+            code -= size ** n
+            n += 1
+        indices = []
+        for _ in range(n):
+            code, index = divmod(code, size)
+            indices.append(index)
+        return ' '.join(words[index] for index in reversed(indices))
+
+    return {
+        'rows': rows,
+        'cols': cols,
+        'counts': counts,
+        'weights': weights,
+        'document_frequency': document_frequency,
+        'occurrences': np.bincount(cols, weights=counts, minlength=len(codes_by_col)),
+        'column_starts': np.flatnonzero(new_term),
+        'terms': terms,
+        'documents': len(documents),
+        'max_n': max_n
+    }
+
+
+def _select_topics(matrix: Dict, candidates: np.ndarray, scores: np.ndarray, limit: int) -> List[Dict]:
+    """I `limit` termini con punteggio più alto, preferendo le frasi più lunghe alle parole che contengono.
+
+    Un termine viene saltato se è contenuto in uno già scelto, oppure in una frase più lunga della
+    shortlist che ne copre almeno metà delle occorrenze ('mutuo' dentro 'mutuo prima casa').
+    """
+    if not len(candidates) or not limit:
+        return []
+    shortlist = min(len(candidates), limit * 10)
+    top = np.argpartition(-scores[candidates], shortlist - 1)[:shortlist]
+    top = top[np.argsort(-scores[candidates][top], kind='stable')]
+    starts, rows, occurrences = matrix['column_starts'], matrix['rows'], matrix['occurrences']
+    shortlisted = [(col, matrix['terms'](col)) for col in candidates[top].tolist()]
+    phrases = [(f" {term} ", occurrences[col]) for col, term in shortlisted if ' ' in term]
+    selected, padded = [], []
+    for col, term in shortlisted:
+        padded_term = f" {term} "
+        if any(padded_term in other for other in padded):
+            continue
+        if any(padded_term in phrase and padded_term != phrase and 2 * phrase_occurrences >= occurrences[col]
+               for phrase, phrase_occurrences in phrases):
+            continue
+        end = starts[col + 1] if col + 1 < len(starts) else len(rows)
+        selected.append({
+            'topic': term,
+            'documents': rows[starts[col]:end].tolist(),
+            'coverage': int(matrix['document_frequency'][col]),
+            'score': round(float(scores[col]), 4)
+        })
+        padded.append(padded_term)
+        if len(selected) >= limit:
+            break
+    return selected
+
+
+def rank_topics(documents: List[str], limit: int = 15, max_n: int = 3) -> Dict[str, List[Dict]]:
+    """Topic di consenso (trattati da almeno metà dei documenti) e distintivi (da pochi) per peso TF-IDF.
+
+    Consenso: somma dei pesi sui documenti, quindi frequenza e copertura. Distintivi: peso massimo in
+    un documento, tra i termini di al massimo un quarto dei documenti usati più di una volta.
+    Ogni topic riporta gli indici dei documenti che lo trattano.
+    """
+    if not documents:
+        return {'consensus': [], 'distinctive': []}
+    matrix = ngram_tfidf(documents, max_n=max_n)
+    if not len(matrix['cols']):
+        return {'consensus': [], 'distinctive': []}
+    cols, weights, document_frequency = matrix['cols'], matrix['weights'], matrix['document_frequency']
+    total = len(documents)
+
+    consensus_scores = np.bincount(cols, weights=weights, minlength=len(document_frequency))
+    consensus_min = max(2, math.ceil(total * CONSENSUS_MIN_SHARE)) if total > 1 else 1
+    consensus = np.flatnonzero(document_frequency >= consensus_min)
+
+    distinctive = np.empty(0, dtype=np.int64)
+    distinctive_scores = np.zeros(len(document_frequency))
+    if total > 1:
+        distinctive_max = max(1, int(total * DISTINCTIVE_MAX_SHARE))
+        distinctive_scores = np.maximum.reduceat(weights, matrix['column_starts'])
+        distinctive = np.flatnonzero((document_frequency <= distinctive_max) & (matrix['occurrences'] >= 2))
+
+    return {
+        'consensus': _select_topics(matrix, consensus, consensus_scores, limit),
+        'distinctive': _select_topics(matrix, distinctive, distinctive_scores, limit)
+    }
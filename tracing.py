@@ -0,0 +1,236 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Ogni span concluso viene scritto su questo logger come una riga JSON
+span_logger = logging.getLogger('content_brief.trace')
+
+METRICS_PREFIX = 'content_brief'
+# Se impostato, il file in formato Prometheus viene riscritto alla fine di ogni trace (textfile collector)
+METRICS_FILE = os.environ.get('CONTENT_BRIEF_METRICS_FILE')
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('content_brief_span', default=None)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('content_brief_trace', default=None)
+
+
+class Span:
+    """Fase misurata: nome, attributi (byte, token, cache...) e durata"""
+
+    def __init__(self, name: str, attributes: Dict):
+        self.name = name
+        self.attributes = attributes
+        self.status = 'ok'
+        self.started = time.monotonic()
+        self.duration: Optional[float] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_record(self) -> Dict:
+        trace = _current_trace.get()
+        return {
+            'trace_id': trace.trace_id if trace else None,
+            'span': self.name,
+            'duration_ms': round((self.duration or 0) * 1000, 1),
+            'status': self.status,
+            **self.attributes
+        }
+
+
+class Trace:
+    """Insieme degli span di una singola generazione, condiviso anche dai thread figli"""
+
+    def __init__(self, name: str, attributes: Dict):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict):
+        with self._lock:
+            self.spans.append(record)
+
+
+class MetricsRegistry:
+    """Aggregati per span esportabili in formato testo Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, list] = {}
+        self.errors: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.tokens: Dict[str, int] = {}
+
+    def observe(self, span: Span):
+        with self._lock:
+            count_sum = self.durations.setdefault(span.name, [0, 0.0])
+            count_sum[0] += 1
+            count_sum[1] += span.duration or 0.0
+            if span.status != 'ok':
+                self.errors[span.name] = self.errors.get(span.name, 0) + 1
+            if isinstance(span.attributes.get('bytes'), int):
+                self.bytes[span.name] = self.bytes.get(span.name, 0) + span.attributes['bytes']
+            for kind in ('prompt_tokens', 'completion_tokens'):
+                if isinstance(span.attributes.get(kind), int):
+                    self.tokens[kind] = self.tokens.get(kind, 0) + span.attributes[kind]
+
+    def mean_duration(self, name: str) -> Optional[float]:
+        with self._lock:
+            count, total = self.durations.get(name, (0, 0.0))
+        return total / count if count else None
+
+    def render(self) -> str:
+        """Esporta le metriche nel formato testo di Prometheus"""
+        prefix = METRICS_PREFIX
+        lines = [
+            f"# HELP {prefix}_span_duration_seconds Durata delle fasi della pipeline",
+            f"# TYPE {prefix}_span_duration_seconds summary"
+        ]
+        with self._lock:
+            for name, (count, total) in sorted(self.durations.items()):
+                lines.append(f'{prefix}_span_duration_seconds_count{{span="{name}"}} {count}')
+                lines.append(f'{prefix}_span_duration_seconds_sum{{span="{name}"}} {total:.6f}')
+            lines += [f"# HELP {prefix}_span_errors_total Fasi terminate con errore",
+                      f"# TYPE {prefix}_span_errors_total counter"]
+            lines += [f'{prefix}_span_errors_total{{span="{name}"}} {value}' for name, value in sorted(self.errors.items())]
+            lines += [f"# HELP {prefix}_span_bytes_total Byte scaricati o prodotti per fase",
+                      f"# TYPE {prefix}_span_bytes_total counter"]
+            lines += [f'{prefix}_span_bytes_total{{span="{name}"}} {value}' for name, value in sorted(self.bytes.items())]
+            lines += [f"# HELP {prefix}_llm_tokens_total Token OpenAI consumati",
+                      f"# TYPE {prefix}_llm_tokens_total counter"]
+            lines += [f'{prefix}_llm_tokens_total{{type="{kind.split("_")[0]}"}} {value}'
+                      for kind, value in sorted(self.tokens.items())]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Scrive le metriche su file in modo atomico"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+
+METRICS = MetricsRegistry()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Misura un blocco di codice registrandone durata, esito e attributi"""
+    current = Span(name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.status = 'error'
+        current.attributes['error'] = str(e)
+        raise
+    finally:
+        current.duration = time.monotonic() - current.started
+        _current_span.reset(token)
+        METRICS.observe(current)
+        record = current.to_record()
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(record)
+        span_logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def traced(name: str) -> Callable:
+    """Decoratore: esegue la funzione dentro uno span con il nome indicato"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_span_attributes(**attributes):
+    """Aggiunge attributi allo span in corso nel contesto corrente, se presente"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Trace]:
+    """Raggruppa gli span di una generazione; alla fine registra il riepilogo e aggiorna il file metriche"""
+    current = Trace(name, attributes)
+    token = _current_trace.set(current)
+    started = time.monotonic()
+    try:
+        with span(name, **attributes):
+            yield current
+    finally:
+        _current_trace.reset(token)
+        span_logger.info(json.dumps({
+            'trace_id': current.trace_id,
+            'trace': name,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1),
+            'spans': len(current.spans),
+            **attributes
+        }, ensure_ascii=False, default=str))
+        if METRICS_FILE:
+            try:
+                METRICS.write(METRICS_FILE)
+            except OSError as e:
+                span_logger.warning("Impossibile scrivere le metriche in %s: %s", METRICS_FILE, e)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """Lega la funzione al contesto (trace e span) corrente, per eseguirla in un altro thread"""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+
+def progress_plan(stages: List[Tuple[str, float]]) -> Dict[str, Tuple[int, int]]:
+    """Intervallo percentuale (inizio, fine) di ogni fase, pesato sulle durate medie osservate.
+
+    `stages` è una lista ordinata di (nome span, durata stimata in secondi) usata finché
+    non ci sono misure reali per quella fase.
+    """
+    weights = [(name, METRICS.mean_duration(name) or default) for name, default in stages]
+    total = sum(weight for _, weight in weights) or 1.0
+    plan = {}
+    elapsed = 0.0
+    for name, weight in weights:
+        start = int(round(elapsed / total * 100))
+        elapsed += weight
+        plan[name] = (start, int(round(elapsed / total * 100)))
+    return plan
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Avvia in background un endpoint HTTP /metrics per Prometheus"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server